@@ -3,6 +3,12 @@ import requests
 import json
 import os
 import html
+import csv
+import hashlib
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from xml.etree import ElementTree
 from datetime import datetime
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTextEdit, QPushButton, 
                              QVBoxLayout, QHBoxLayout, QWidget, QSplitter, QLabel, 
@@ -12,6 +18,11 @@ from PyQt6.QtCore import Qt, QThread, pyqtSignal
 from PyQt6.QtGui import QFont, QSyntaxHighlighter, QTextCharFormat, QColor, QTextDocument, QTextCursor, QClipboard
 import markdown
 
+# Modules shared with the WPCV1 orchestrator
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "WPCV1"))
+from modules.providers.providers import is_timeout
+from modules.summary.summary import ExtractiveSummarizer
+
 # Try to import docx for Word document support
 try:
     import docx
@@ -19,6 +30,13 @@ try:
 except ImportError:
     HAVE_DOCX = False
 
+# Try to import pypdf (pure Python) for PDF support
+try:
+    import pypdf
+    HAVE_PYPDF = True
+except ImportError:
+    HAVE_PYPDF = False
+
 class DeepSeekWorker(QThread):
     response_received = pyqtSignal(str, str)  # response, conversation_id
     error_occurred = pyqtSignal(str)
@@ -57,7 +75,11 @@ class DeepSeekWorker(QThread):
                         self.error_occurred.emit(f"API Error: {response.status_code} - {response.text}")
                     continue
                     
-            except requests.exceptions.Timeout:
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                # A read timeout while the body is downloaded arrives as a ConnectionError
+                if not is_timeout(e):
+                    self.error_occurred.emit(f"Request failed: {str(e)}")
+                    return
                 if attempt == 2:  # Last attempt
                     self.error_occurred.emit("Request timed out after 3 attempts. Please check your internet connection.")
                 continue
@@ -66,26 +88,139 @@ class DeepSeekWorker(QThread):
                 self.error_occurred.emit(f"Request failed: {str(e)}")
                 return
 
+class UnsupportedDocument(Exception):
+    """No usable extractor for a document; the message says why"""
+
+class HTMLTextExtractor(HTMLParser):
+    """Collects the visible text of an HTML document, one line per block element"""
+    
+    SKIP_TAGS = {"script", "style", "head", "template", "noscript"}
+    BLOCK_TAGS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6",
+                  "pre", "section", "article", "header", "footer", "table", "ul", "ol"}
+    
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self.skip_depth = 0
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self.skip_depth:
+            self.skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+    
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+    
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)
+
 class DocumentProcessor:
-    """Class to handle various document formats including Word documents"""
+    """Class to handle various document formats including Word documents
+    
+    Extractors are registered per file extension with register(). Extracted
+    text is cached on disk keyed by path, modification time and size, so a
+    document is parsed again only after it changes; the least recently used
+    entries are removed once the cache exceeds its entry or size limit. ExtractionWorker runs
+    the parsing in a process pool to keep large documents off the GUI.
+    """
+    
+    EXTRACTORS = {}  # extension -> (extractor, available, install hint)
+    CACHE_DIR = os.path.join(os.path.expanduser("~"), ".deepseek_assistant", "extracted_text")
+    CACHE_MAX_ENTRIES = 500
+    CACHE_MAX_BYTES = 100 * 1024 * 1024
+    CSV_PREVIEW_ROWS = 20
+    _pool = None
+    
+    @classmethod
+    def register(cls, extensions, extractor, available=True, install_hint=""):
+        for ext in extensions:
+            cls.EXTRACTORS[ext] = (extractor, available, install_hint)
+    
+    @classmethod
+    def supported_extensions(cls):
+        return sorted(cls.EXTRACTORS)
+    
+    @classmethod
+    def pool(cls):
+        """Shared process pool for extraction, created on first use"""
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(max_workers=2)
+        return cls._pool
     
     @staticmethod
-    def extract_text_from_file(file_path):
-        """Extract text from various document formats"""
+    def extract_and_cache(file_path):
+        text = DocumentProcessor.extract_uncached(file_path)
+        DocumentProcessor.write_cache(file_path, text)
+        return text
+    
+    @staticmethod
+    def extract_uncached(file_path):
+        """Run the registered extractor; raises UnsupportedDocument when there is none"""
         ext = os.path.splitext(file_path)[1].lower()
-        
+        if ext not in DocumentProcessor.EXTRACTORS:
+            raise UnsupportedDocument(f"Unsupported file format: {ext}")
+        extractor, available, install_hint = DocumentProcessor.EXTRACTORS[ext]
+        if not available:
+            raise UnsupportedDocument(install_hint)
+        return extractor(file_path)
+    
+    @staticmethod
+    def cache_path(file_path):
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+        return os.path.join(DocumentProcessor.CACHE_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".txt")
+    
+    @staticmethod
+    def read_cache(file_path):
         try:
-            if ext in ['.txt', '.md', '.py', '.js', '.php', '.html', '.css']:
-                return DocumentProcessor._read_text_file(file_path)
-            elif ext == '.docx' and HAVE_DOCX:
-                return DocumentProcessor._read_docx(file_path)
-            elif ext == '.docx' and not HAVE_DOCX:
-                return "DOCX support requires: pip install python-docx"
-            else:
-                return f"Unsupported file format: {ext}"
-                       
-        except Exception as e:
-            return f"Error reading file: {str(e)}"
+            path = DocumentProcessor.cache_path(file_path)
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path)  # the modification time orders entries for eviction
+            return text
+        except OSError:
+            return None
+    
+    @staticmethod
+    def write_cache(file_path, text):
+        try:
+            path = DocumentProcessor.cache_path(file_path)
+            os.makedirs(DocumentProcessor.CACHE_DIR, exist_ok=True)
+            with open(path + ".tmp", 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(path + ".tmp", path)
+            DocumentProcessor.prune_cache()
+        except OSError:
+            pass  # caching is best effort
+    
+    @staticmethod
+    def prune_cache():
+        """Remove least recently used entries until the cache is within its limits"""
+        entries = []
+        with os.scandir(DocumentProcessor.CACHE_DIR) as it:
+            for entry in it:
+                if entry.name.endswith(".txt"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        while entries and (len(entries) > DocumentProcessor.CACHE_MAX_ENTRIES
+                           or total > DocumentProcessor.CACHE_MAX_BYTES):
+            _, size, path = entries.pop(0)
+            total -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already removed by another extraction process
     
     @staticmethod
     def _read_text_file(file_path):
@@ -101,6 +236,79 @@ class DocumentProcessor:
         for paragraph in doc.paragraphs:
             full_text.append(paragraph.text)
         return '\n'.join(full_text)
+    
+    @staticmethod
+    def _read_pdf(file_path):
+        """Read the text layer of PDF files"""
+        reader = pypdf.PdfReader(file_path)
+        return '\n\n'.join(page.extract_text() or "" for page in reader.pages)
+    
+    @staticmethod
+    def _read_html(file_path):
+        """Read the visible text of HTML files"""
+        parser = HTMLTextExtractor()
+        parser.feed(DocumentProcessor._read_text_file(file_path))
+        parser.close()
+        return parser.text()
+    
+    @staticmethod
+    def _read_odt(file_path):
+        """Read headings and paragraphs of OpenDocument text files"""
+        text_ns = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+        with zipfile.ZipFile(file_path) as archive:
+            root = ElementTree.fromstring(archive.read("content.xml"))
+        return '\n'.join(
+            "".join(element.itertext())
+            for element in root.iter()
+            if element.tag in (text_ns + "p", text_ns + "h")
+        )
+    
+    @staticmethod
+    def _read_csv(file_path):
+        """Summarise CSV files: columns, row count and the first rows"""
+        with open(file_path, 'r', encoding='utf-8', errors='ignore', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            preview = []
+            rows = 0
+            for row in reader:
+                rows += 1
+                if len(preview) < DocumentProcessor.CSV_PREVIEW_ROWS:
+                    preview.append(row)
+        lines = [f"CSV file with {rows} data rows and {len(header)} columns",
+                 f"Columns: {', '.join(header)}", "",
+                 f"First {len(preview)} rows:", " | ".join(header)]
+        lines.extend(" | ".join(row) for row in preview)
+        return '\n'.join(lines)
+
+DocumentProcessor.register(['.txt', '.md', '.py', '.js', '.php', '.css', '.json', '.xml'],
+                           DocumentProcessor._read_text_file)
+DocumentProcessor.register(['.html', '.htm'], DocumentProcessor._read_html)
+DocumentProcessor.register(['.docx'], DocumentProcessor._read_docx, HAVE_DOCX,
+                           "DOCX support requires: pip install python-docx")
+DocumentProcessor.register(['.pdf'], DocumentProcessor._read_pdf, HAVE_PYPDF,
+                           "PDF support requires: pip install pypdf")
+DocumentProcessor.register(['.odt'], DocumentProcessor._read_odt)
+DocumentProcessor.register(['.csv'], DocumentProcessor._read_csv)
+
+class ExtractionWorker(QThread):
+    """Extracts a document's text in the process pool unless it is already cached"""
+    text_extracted = pyqtSignal(str, str)  # file_path, text
+    
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
+    
+    def run(self):
+        text = DocumentProcessor.read_cache(self.file_path)
+        if text is None:
+            try:
+                text = DocumentProcessor.pool().submit(DocumentProcessor.extract_and_cache, self.file_path).result()
+            except UnsupportedDocument as e:
+                text = str(e)
+            except Exception as e:
+                text = f"Error reading file: {str(e)}"
+        self.text_extracted.emit(self.file_path, text)
 
 class LanguageHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None, language="python"):
@@ -239,8 +447,13 @@ class DeepSeekAssistant(QMainWindow):
         self.current_conversation_id = None
         self.conversation_context = {}  # Store conversation contexts
         
+        # History list shown in the response area and how many of its messages are rendered
+        self.displayed_history = None
+        self.displayed_count = 0
+        
         # Replace single document with multi-document support
         self.loaded_documents = {}  # Key: filename, Value: document content
+        self.extraction_workers = []
         self.current_project_context = ""  # Will hold a summary of the loaded project
         
         self.initUI()
@@ -506,6 +719,15 @@ class DeepSeekAssistant(QMainWindow):
         token_action = settings_menu.addAction("Set Token Limit")
         token_action.triggered.connect(self.set_token_limit)
         
+        self.summary_action = settings_menu.addAction("Summarise Trimmed History")
+        self.summary_action.setCheckable(True)
+        self.summary_action.setChecked(True)
+        self.summary_action.toggled.connect(self.set_summarize_history)
+        
+    def set_summarize_history(self, enabled):
+        self.settings["summarize_history"] = enabled
+        self.save_settings()
+        
     def set_token_limit(self):
         current_limit = self.settings.get("max_tokens", 4000)
         new_limit, ok = QInputDialog.getInt(
@@ -541,6 +763,8 @@ class DeepSeekAssistant(QMainWindow):
                 
             if "max_tokens" not in self.settings:
                 self.settings["max_tokens"] = 4000  # Default token limit
+            
+            self.summary_action.setChecked(self.settings.get("summarize_history", True))
                 
         except Exception as e:
             self.status_bar.showMessage(f"Error loading settings: {str(e)}")
@@ -555,25 +779,33 @@ class DeepSeekAssistant(QMainWindow):
     def load_document(self):
         file_path, _ = QFileDialog.getOpenFileName(
             self, "Open Document", "", 
-            "All Supported Files (*.txt *.py *.js *.php *.html *.css *.md *.docx);;Text Files (*.txt);;Python Files (*.py);;JavaScript Files (*.js);;PHP Files (*.php);;HTML Files (*.html);;CSS Files (*.css);;Markdown Files (*.md);;Word Documents (*.docx)"
+            "All Supported Files (*.txt *.py *.js *.php *.html *.htm *.css *.md *.json *.xml *.docx *.pdf *.odt *.csv);;Text Files (*.txt);;Python Files (*.py);;JavaScript Files (*.js);;PHP Files (*.php);;HTML Files (*.html *.htm);;CSS Files (*.css);;Markdown Files (*.md);;Word Documents (*.docx);;PDF Documents (*.pdf);;OpenDocument Text (*.odt);;CSV Files (*.csv)"
         )
         
         if file_path:
-            content = DocumentProcessor.extract_text_from_file(file_path)
-            filename = os.path.basename(file_path)
-            
-            # Store the document content
-            self.loaded_documents[filename] = content
-            
+            # Parsing large documents can take seconds; it runs in the extraction process pool
+            self.status_bar.showMessage(f"Extracting text from {os.path.basename(file_path)}...")
+            self.extraction_workers = [worker for worker in self.extraction_workers if not worker.isFinished()]
+            worker = ExtractionWorker(file_path)
+            worker.text_extracted.connect(self.add_loaded_document)
+            self.extraction_workers.append(worker)
+            worker.start()
+    
+    def add_loaded_document(self, file_path, content):
+        filename = os.path.basename(file_path)
+        
+        # Store the document content
+        if filename not in self.loaded_documents:
             # Add to list widget
             item = QListWidgetItem(filename)
             self.docsListWidget.addItem(item)
-            
-            # If it's the first document, show it
-            if len(self.loaded_documents) == 1:
-                self.show_document_content(filename)
-            
-            self.status_bar.showMessage(f"Loaded: {filename}")
+        self.loaded_documents[filename] = content
+        
+        # If it's the first document, show it
+        if len(self.loaded_documents) == 1:
+            self.show_document_content(filename)
+        
+        self.status_bar.showMessage(f"Loaded: {filename}")
     
     def show_selected_document(self, item):
         filename = item.text()
@@ -692,11 +924,16 @@ class DeepSeekAssistant(QMainWindow):
         self.status_bar.showMessage(f"Started new conversation: {self.current_conversation_id}")
     
     def display_conversation_history(self):
+        """Render the current conversation, appending only messages not yet shown"""
         if self.current_conversation_id in self.conversation_context:
             history = self.conversation_context[self.current_conversation_id]
-            formatted_history = ""
+            if history is not self.displayed_history or self.displayed_count > len(history):
+                self.response_output.clear()
+                self.displayed_history = history
+                self.displayed_count = 0
             
-            for message in history:
+            formatted_history = ""
+            for message in history[self.displayed_count:]:
                 role = message.get("role", "")
                 content = message.get("content", "")
                 
@@ -704,8 +941,12 @@ class DeepSeekAssistant(QMainWindow):
                     formatted_history += f"<b>You:</b><br/>{html.escape(content)}<br/><br/>"
                 elif role == "assistant":
                     formatted_history += f"<b>Assistant:</b><br/>{self.format_response(content)}<br/><br/>"
+            self.displayed_count = len(history)
             
-            self.response_output.setHtml(formatted_history)
+            if formatted_history:
+                cursor = self.response_output.textCursor()
+                cursor.movePosition(QTextCursor.MoveOperation.End)
+                cursor.insertHtml(formatted_history)
     
     def format_response(self, text):
         # Convert markdown to HTML
@@ -723,12 +964,14 @@ class DeepSeekAssistant(QMainWindow):
     
     def clear_response(self):
         self.response_output.clear()
+        self.displayed_history = None
         self.status_bar.showMessage("Response cleared")
     
     def clear_all(self):
         self.editor.clear()
         self.prompt_input.clear()
         self.response_output.clear()
+        self.displayed_history = None
         self.status_bar.showMessage("All content cleared")
     
     def save_conversation(self):
@@ -875,7 +1118,12 @@ class DeepSeekAssistant(QMainWindow):
         self.send_btn.setEnabled(True)
     
     def manage_conversation_tokens(self):
-        """Manage conversation tokens to prevent exceeding limits"""
+        """Manage conversation tokens to prevent exceeding limits.
+        
+        The oldest user/assistant pair is trimmed once the history reaches 80% of
+        the limit. Unless disabled in the settings, trimmed messages are folded
+        into a running summary system message instead of being dropped.
+        """
         if self.current_conversation_id not in self.conversation_context:
             return
             
@@ -888,26 +1136,46 @@ class DeepSeekAssistant(QMainWindow):
         
         # If we're approaching the limit, remove older messages
         if estimated_tokens > max_tokens * 0.8:  # Start trimming at 80% of limit
-            # Keep system message if exists and remove oldest user/assistant pairs
-            if len(history) > 2:
-                # Remove the second message (first user message after system if exists)
-                # or the first message if no system message
-                if history[0].get("role") == "system":
-                    # Keep system message and remove oldest user/assistant pair
-                    if len(history) > 3:
-                        del history[1:3]  # Remove user and assistant messages
-                    else:
-                        # If only system + one pair, remove just the user message
-                        if len(history) > 1:
-                            del history[1]
-                else:
-                    # No system message, remove the first user/assistant pair
-                    if len(history) >= 2:
-                        del history[0:2]
-                    else:
-                        del history[0]
-                
+            # Keep leading system messages (including the summary) and remove the oldest user/assistant pair
+            length = len(history)
+            start = 0
+            while start < len(history) and history[start].get("role") == "system":
+                start += 1
+            if len(history) - start > 2:
+                removed = history[start:start + 2]
+                del history[start:start + 2]
+            elif len(history) - start > 1:
+                # Only one pair left: remove just the user message
+                removed = history[start:start + 1]
+                del history[start]
+            else:
+                return
+            
+            if self.settings.get("summarize_history", True):
+                self.fold_into_summary(history, removed)
+                self.status_bar.showMessage("Summarised older conversation history to stay within token limits")
+            else:
                 self.status_bar.showMessage("Trimmed conversation history to stay within token limits")
+            
+            # Trimmed messages stay on screen; keep the rendered count aligned with the list
+            if history is self.displayed_history:
+                self.displayed_count = max(0, self.displayed_count + len(history) - length)
+    
+    def fold_into_summary(self, history, removed):
+        """Merge removed messages into the conversation's running summary message"""
+        # History is sent to the API as-is, so the summary is recognised by its header
+        summary = next((msg for msg in history if msg.get("role") == "system" and
+                        msg.get("content", "").startswith(ExtractiveSummarizer.HEADER)), None)
+        user = next((msg for msg in removed if msg.get("role") == "user"), {})
+        assistant = next((msg for msg in removed if msg.get("role") == "assistant"), {})
+        # The summary is kept to a fixed fraction of the limit so it never grows unbounded
+        max_summary_tokens = self.settings.get("max_tokens", 4000) // 10
+        content = ExtractiveSummarizer.summarize(
+            [(user, assistant)], summary["content"] if summary else "", max_summary_tokens)
+        if summary:
+            summary["content"] = content
+        else:
+            history.insert(0, {"role": "system", "content": content})
 
 def main():
     app = QApplication(sys.argv)
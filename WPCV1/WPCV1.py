@@ -1,11 +1,9 @@
 #!/usr/bin/env python3
 
-import os, json, datetime, requests, logging, argparse, re
-from modules.dispatcher import dispatcher as validation_dispatcher
-from modules.validator import cmd_validator
-from modules.logger.logger import log_conversation
-from modules.expectations.scaffold import scaffold_expectations
-from modules.revision.revision import save_revision
+import time
+startup_began = time.perf_counter()
+
+import os, sys, json, datetime, logging, argparse, re, importlib, atexit
 
 # === Setup Paths ===
 base_dir = os.path.dirname(os.path.realpath(__file__))
@@ -16,11 +14,37 @@ history_file = os.path.join(base_dir, 'conversation.txt')
 expectations_default = os.path.join(base_dir, "docs", "expectations.md")
 log_file = os.path.join(base_dir, 'logs', 'session.log')
 
-os.makedirs(response_dir, exist_ok=True)
-os.makedirs(os.path.dirname(log_file), exist_ok=True)
-
-logging.basicConfig(filename=log_file, level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s')
+# === Lazy Imports ===
+# The GUI launcher and the PHP backend start this script for every action, so
+# modules are loaded by the mode that needs them: validation never imports the
+# HTTP stack and prompt mode never imports the validators. --profile-startup
+# reports what each mode loaded and how long it took.
+import_times = []
+
+def load(module_name):
+    module = sys.modules.get(module_name)
+    if module is not None:
+        # import_module() waits while another thread is still running the module
+        return importlib.import_module(module_name)
+    began = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_times.append((module_name, time.perf_counter() - began))
+    return module
+
+def setup_logging():
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    logging.basicConfig(filename=log_file, level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(message)s')
+
+# On stderr, so the output parsed by the GUI launcher and PHP backend is unchanged
+def report_startup():
+    rows = [("standard library and paths", script_loaded - startup_began)]
+    rows += [(f"import {name}", seconds) for name, seconds in import_times]
+    rows.append(("total, including the mode's work", time.perf_counter() - startup_began))
+    width = max(len(label) for label, _ in rows)
+    print("\n⏱️ Startup profile (python -X importtime shows every module):", file=sys.stderr)
+    for label, seconds in rows:
+        print(f"  {label:<{width}}  {seconds * 1000:8.1f}ms", file=sys.stderr)
 
 # === Utility Functions ===
 def load_user_config():
@@ -41,6 +65,7 @@ def load_expectations(path):
         return ""
 
 def save_response(prompt, reply, revision_tag, timestamp):
+    os.makedirs(response_dir, exist_ok=True)
     response_file = os.path.join(response_dir, f'{timestamp}.txt')
     with open(response_file, 'w') as f:
         f.write(f'User: {prompt}\nAI: {reply}\nRevision: {revision_tag}\n')
@@ -68,13 +93,14 @@ def save_script_revision(timestamp):
     script_path = os.path.realpath(__file__)
     revision_copy = os.path.join(response_dir, f'{timestamp}_WPCV1.py')
     try:
+        os.makedirs(response_dir, exist_ok=True)
         with open(script_path, 'r') as src, open(revision_copy, 'w') as dst:
             dst.write(src.read())
         logging.info(f"Script revision saved to {revision_copy}")
     except Exception as e:
         logging.warning(f"Script revision save failed: {e}")
 
-def call_agent(agent_name, prompt, working_dir=None):
+def call_agent(agent_name, prompt, working_dir=None, use_cache=True, on_delta=None):
     if working_dir:
         prompt = f"You are working in the directory: {working_dir}\n\n{prompt}"
 
@@ -91,28 +117,40 @@ To modify a file, please format your response within a special block like this:
 
     agents_file = os.path.join(base_dir, 'config', 'agents.json')
     try:
+        # Inside the try, so a missing HTTP dependency is reported like any failed call
+        ResponseCache = load("modules.cache.response_cache").ResponseCache
+        router = load("modules.routing.router")
+        MetricsStore = load("modules.metrics.metrics").MetricsStore
+        RateLimiter = load("modules.ratelimit.ratelimit").RateLimiter
+
         with open(agents_file) as f:
             agents = json.load(f)
         agent = agents.get(agent_name)
         if not agent:
             return f"⚠️ Agent '{agent_name}' not found in config."
 
-        headers = {
-            'Authorization': f'Bearer {agent["api_key"]}',
-            'Content-Type': 'application/json'
-        }
-
-        if agent_name == "gemini":
-            data = { "contents": [{ "parts": [{ "text": prompt }] }] }
-        else:
-            data = { "model": agent["model"], "messages": [{ "role": "user", "content": prompt }] }
-
-        response = requests.post(agent["url"], headers=headers, json=data).json()
-
-        if agent_name == "gemini":
-            return response["candidates"][0]["content"]["parts"][0]["text"]
-        else:
-            return response["choices"][0]["message"]["content"]
+        # Caching is opted into per agent with "cache_ttl" (seconds) in agents.json
+        cache = None
+        cache_messages = [{ "role": "user", "content": prompt }]
+        if use_cache and agent.get("cache_ttl"):
+            cache = ResponseCache(ttl=agent["cache_ttl"], max_entries=agent.get("cache_max_entries", 500))
+            # Keyed by endpoint too: a local server and a hosted one may use the same model name
+            endpoint = load("modules.providers.providers").resolve(agent_name, agent).url
+            cached = cache.get(agent["model"], cache_messages, agent.get("temperature"), endpoint)
+            if cached is not None:
+                logging.info(f"{agent_name} response served from cache.")
+                return cached
+
+        # Failover chains, hedging and circuit breakers are configured per agent (see README)
+        reply, served_by = router.route(agent_name, agents, cache_messages,
+                                        metrics=MetricsStore(), limiter=RateLimiter(), on_delta=on_delta)
+        if served_by != agent_name:
+            logging.info(f"{agent_name} request answered by {served_by}.")
+
+        # Only cache what the requested agent said, so a fallback's answer doesn't stick
+        if cache and served_by == agent_name:
+            cache.put(agent["model"], cache_messages, agent.get("temperature"), reply, endpoint)
+        return reply
 
     except Exception as e:
         logging.error(f"{agent_name} API call failed: {e}")
@@ -123,7 +161,9 @@ def run_validation_pipeline(code_path, expectations_path):
         with open(code_path, 'r') as f:
             code_str = f.read()
 
-        results = validation_dispatcher.run_validation(code_str, expectations_path)
+        print(f"⏳ Validating {code_path}...", flush=True)
+        validation_dispatcher = load("modules.dispatcher.dispatcher")
+        results = validation_dispatcher.run_validation(code_str, expectations_path, code_path)
 
         print("\n🔍 Validation Results:")
         for key, value in results.items():
@@ -134,21 +174,38 @@ def run_validation_pipeline(code_path, expectations_path):
         logging.error(f"Validation pipeline failed: {e}")
         print(f"❌ Validation error: {e}")
 
+script_loaded = time.perf_counter()
+
 # === Main Entry Point ===
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="WPCV1 Orchestrator")
-    parser.add_argument("--mode", choices=["prompt", "validate", "scaffold"], help="Choose execution mode")
+    parser.add_argument("--mode", choices=["prompt", "validate", "scaffold", "stats"], help="Choose execution mode")
     parser.add_argument("--file", type=str, help="Path to code file for validation")
     parser.add_argument("--expect", type=str, help="Path to expectations file")
     parser.add_argument("--agent", choices=["deepseek", "openai", "grok", "gemini", "local"], help="Specify agent to route prompt to")
     parser.add_argument("--directory", type=str, help="Path to the working directory for the agent")
     parser.add_argument("--validate-only", action="store_true", help="Run CMD validator only and exit")
-    args = parser.parse_args()
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the response cache for this request")
+    parser.add_argument("--prompt", type=str, help="Prompt text for prompt mode, instead of asking for it")
+    parser.add_argument("--days", type=int, default=7, help="Days of agent calls covered by --mode stats")
+    parser.add_argument("--profile-startup", action="store_true", help="Report import and setup times on stderr")
+    parser.add_argument("--serve", action="store_true", help="Run commands sent as JSON lines on stdin (used by the GUI launcher)")
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        load("modules.worker.worker").serve(main)
+        return
+
+    if args.profile_startup:
+        atexit.register(report_startup)
+    setup_logging()
 
     username, revision_tag = load_user_config()
     timestamp = datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
 
     if args.validate_only:
+        cmd_validator = load("modules.validator.cmd_validator")
+        log_conversation = load("modules.logger.logger").log_conversation
         cmd_result = cmd_validator.validate_commands()
         log_conversation({
             "timestamp": cmd_result["timestamp"],
@@ -165,8 +222,15 @@ def main():
                 print(f"   ↪ Suggest: {info['suggest']}")
         return
 
+    if args.mode == "stats":
+        metrics = load("modules.metrics.metrics")
+        since = datetime.datetime.now() - datetime.timedelta(days=args.days)
+        print(f"📊 Agent calls in the last {args.days} days:\n")
+        print(metrics.format_report(metrics.MetricsStore().summary(since.timestamp())))
+        return
+
     if args.mode == "scaffold":
-        result = scaffold_expectations(base_dir)
+        result = load("modules.expectations.scaffold").scaffold_expectations(base_dir)
         if result:
             path, folder, agent, expectation_type, auto_validate = result
             print(f"\n✅ Expectations saved to: {path}")
@@ -181,8 +245,22 @@ def main():
         run_validation_pipeline(args.file, expectations_path)
 
     elif args.mode == 'prompt' and args.agent:
-        prompt_text = input(f'{username}, enter your prompt: ')
-        reply = call_agent(args.agent, prompt_text, args.directory)
+        prompt_text = args.prompt or input(f'{username}, enter your prompt: ')
+        print(f"\n🧠 AI Reply:\n{'-'*40}", flush=True)
+        last_agent = None
+
+        # Printed as it arrives; if the agent fails mid-reply, the fallback's reply follows
+        def print_delta(agent_name, text):
+            nonlocal last_agent
+            if last_agent not in (None, agent_name):
+                print(f"\n\n↪️ {agent_name} answered instead:\n")
+            last_agent = agent_name
+            print(text, end="", flush=True)
+
+        reply = call_agent(args.agent, prompt_text, args.directory, use_cache=not args.no_cache, on_delta=print_delta)
+        if last_agent is None:
+            print(reply, end="")  # served from the cache, or the call failed
+        print(f"\n{'-'*40}", flush=True)
 
         # Check for file modification block
         mod_match = re.search(r'<file_modification>(.*?)</file_modification>', reply, re.DOTALL)
@@ -198,6 +276,8 @@ def main():
 
                 print(f"\n✨ Agent has requested to modify the file: {file_path_relative}")
                 try:
+                    save_revision = load("modules.revision.revision").save_revision
+
                     # Read original content
                     original_content = ""
                     if os.path.exists(file_path_absolute):
@@ -217,11 +297,13 @@ def main():
                     print(f"✅ Successfully modified file and saved revisions.")
                     # Remove the modification block from the reply shown to the user
                     reply = re.sub(r'<file_modification>.*?</file_modification>', '', reply, flags=re.DOTALL).strip()
+                    # The block was already printed as the reply streamed in; repeat the rest without it
+                    if reply:
+                        print(f"\n🧠 AI Reply without the applied modification:\n{'-'*40}\n{reply}\n{'-'*40}")
 
                 except Exception as e:
                     print(f"❌ Error modifying file: {e}")
 
-        print(f"\n🧠 AI Reply:\n{'-'*40}\n{reply}\n{'-'*40}")
         print("\n🤔 Would you like to challenge that?")
         save_response(prompt_text, reply, revision_tag, timestamp)
         append_history(prompt_text, reply, revision_tag, timestamp)
@@ -5,7 +5,10 @@ if ($_SERVER['REQUEST_METHOD'] === 'POST') {
   $folder = escapeshellarg($_POST['folder']);
   $expectation = escapeshellarg($_POST['expectation']);
 
-  $cmd = "python3 $folder/WPCV1.py --mode $mode --agent $agent --folder $folder --expectation $expectation";
+  $cmd = "python3 $folder/WPCV1.py --mode $mode --agent $agent --expect $expectation";
+  if (!empty($_POST['prompt'])) {
+    $cmd .= " --prompt " . escapeshellarg($_POST['prompt']);
+  }
   $output = shell_exec($cmd);
   echo nl2br($output);
 }
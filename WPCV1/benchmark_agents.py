@@ -0,0 +1,218 @@
+"""
+benchmark_agents.py
+
+Drives the agent call paths against mock_agent_server.py and reports
+latency percentiles and throughput per path:
+
+    call_agent  WPCV1.call_agent in this process (routing, limits, metrics)
+    worker      DeepSeekWorker from the desktop assistant (needs PyQt6)
+    cli         `WPCV1.py --mode prompt` as a new process, as the GUI launcher runs it
+    php         api/orchestrator.php under `php -S` (needs php)
+
+Everything runs against a copy of WPCV1 in a temporary directory, with HOME
+pointed there too, so responses, history, metrics and cache state of the
+real installation are left alone.
+
+    python benchmark_agents.py --requests 100 --concurrency 8 --latency lognormal:0.3,0.6 --stream
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_agent_server import MockAgentServer, latency_sampler
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+ASSISTANT_PATH = os.path.join(os.path.dirname(BASE_DIR), "deepseek_docassistantV2.5.py")
+TARGETS = ("call_agent", "worker", "cli", "php")
+PROMPT = "Review this hook: add_action('init', 'register_my_post_type');"
+
+class Skip(Exception):
+    """A target cannot run in this environment; the message says why."""
+
+def make_sandbox(mock_url):
+    """
+    Copies WPCV1 (without its responses and logs) into a temporary
+    directory with a single "local" agent pointing at the mock server.
+
+    :return: The sandbox's WPCV1 directory.
+    """
+    root = tempfile.mkdtemp(prefix="wpcv1-bench-")
+    sandbox = os.path.join(root, "WPCV1")
+    shutil.copytree(BASE_DIR, sandbox, ignore=shutil.ignore_patterns(
+        "responses", "revisions", "logs", "archive", "__pycache__", "conversation.txt", "context.json"))
+    agents = {
+        "local": {
+            "api_key": "NA",
+            "model": "mock-model",
+            "url": f"{mock_url}/v1/chat/completions",
+            "provider": "local"
+        }
+    }
+    with open(os.path.join(sandbox, "config", "agents.json"), "w") as f:
+        json.dump(agents, f, indent=2)
+    # State under ~/.wpcv1 (cache, routing, metrics, rate limits) goes to the sandbox as well
+    os.environ["HOME"] = os.environ["USERPROFILE"] = root
+    return sandbox
+
+def call_agent_target(sandbox, mock_url, stream):
+    sys.path.insert(0, sandbox)
+    spec = importlib.util.spec_from_file_location("wpcv1_bench", os.path.join(sandbox, "WPCV1.py"))
+    wpcv1 = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(wpcv1)
+
+    def call():
+        reply = wpcv1.call_agent("local", PROMPT, use_cache=False)
+        if reply.startswith("⚠️"):
+            raise RuntimeError(reply)
+    return call
+
+def worker_target(sandbox, mock_url, stream):
+    try:
+        from PyQt6.QtCore import QCoreApplication
+    except ImportError:
+        raise Skip("PyQt6 is not installed")
+    spec = importlib.util.spec_from_file_location("assistant_bench", ASSISTANT_PATH)
+    assistant = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(assistant)
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv)
+    provider = assistant.PROVIDERS["local"].configure({ "url": f"{mock_url}/v1/chat/completions" })
+
+    def call():
+        worker = assistant.DeepSeekWorker("NA", [{ "role": "user", "content": PROMPT }], "mock-model",
+                                          stream=stream, provider=provider)
+        errors = []
+        worker.error_occurred.connect(errors.append)
+        worker.run()  # synchronously, in the calling benchmark thread
+        if errors:
+            raise RuntimeError(errors[0])
+    call.app = app
+    return call
+
+def cli_target(sandbox, mock_url, stream):
+    script = os.path.join(sandbox, "WPCV1.py")
+
+    def call():
+        result = subprocess.run([sys.executable, script, "--mode", "prompt", "--agent", "local", "--prompt", PROMPT],
+                                capture_output=True, text=True, cwd=sandbox)
+        if result.returncode != 0 or "⚠️ API call failed" in result.stdout:
+            raise RuntimeError(result.stderr.strip() or result.stdout.strip())
+    return call
+
+def php_target(sandbox, mock_url, stream):
+    php = shutil.which("php")
+    if not php:
+        raise Skip("php is not installed")
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen([php, "-S", f"127.0.0.1:{port}", "-t", os.path.join(sandbox, "api")],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    form = urllib.parse.urlencode({
+        "mode": "prompt", "agent": "local", "folder": sandbox, "prompt": PROMPT,
+        "expectation": os.path.join(sandbox, "docs", "expectations.md")
+    }).encode("utf-8")
+
+    def call():
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/orchestrator.php", data=form, timeout=300) as response:
+            body = response.read().decode("utf-8", "replace")
+        if "AI Reply" not in body:
+            raise RuntimeError(body.strip()[:200] or "empty response")
+    call.close = server.terminate
+    return call
+
+def run_target(name, call, requests, concurrency):
+    """
+    Calls a target requests times, concurrency at a time.
+
+    :return: Dict with latencies (seconds), errors and wall time.
+    """
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def one(_):
+        started = time.monotonic()
+        try:
+            call()
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        with lock:
+            latencies.append(time.monotonic() - started)
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return { "latencies": latencies, "errors": errors, "wall": time.monotonic() - started }
+
+def print_result(name, result):
+    # Imported here, after make_sandbox() moved HOME, like every other module under modules/
+    from modules.metrics.metrics import percentile
+    latencies = result["latencies"]
+    line = [f"{name:<11}", f"ok {len(latencies):>4}", f"errors {len(result['errors']):>3}"]
+    for pct in (50, 95, 99):
+        value = percentile(latencies, pct)
+        line.append(f"p{pct} {value:.3f}s" if value is not None else f"p{pct} -")
+    line.append(f"{len(latencies) / result['wall']:.1f} req/s")
+    print("  ".join(line))
+    if result["errors"]:
+        print(f"{'':<11}  first error: {result['errors'][0][:160]}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent call paths against the mock agent server")
+    parser.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated, from: {', '.join(TARGETS)}")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per target")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requests in flight per target")
+    parser.add_argument("--stream", action="store_true", help="Stream replies in the worker target; routed calls always stream")
+    parser.add_argument("--latency", default="fixed:0.2", help="Mock latency distribution (see mock_agent_server.py)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Mock seconds between streamed chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock fraction of injected errors")
+    parser.add_argument("--max-concurrency", type=int, help="Mock concurrency cap")
+    parser.add_argument("--rps", type=float, help="Mock requests-per-second cap")
+    args = parser.parse_args()
+
+    mock = MockAgentServer(("127.0.0.1", 0), latency_sampler(args.latency), args.token_delay,
+                           error_rate=args.error_rate, max_concurrency=args.max_concurrency, rps=args.rps)
+    threading.Thread(target=mock.serve_forever, daemon=True).start()
+    sandbox = make_sandbox(mock.url)
+    print(f"🧪 Mock server at {mock.url}, sandbox in {sandbox}")
+    print(f"   {args.requests} requests per target, {args.concurrency} concurrent, latency {args.latency}\n")
+
+    builders = { "call_agent": call_agent_target, "worker": worker_target, "cli": cli_target, "php": php_target }
+    try:
+        for name in args.targets.split(","):
+            name = name.strip()
+            if name not in builders:
+                print(f"{name:<11}  unknown target")
+                continue
+            try:
+                call = builders[name](sandbox, mock.url, args.stream)
+            except Skip as e:
+                print(f"{name:<11}  skipped: {e}")
+                continue
+            try:
+                print_result(name, run_target(name, call, args.requests, args.concurrency))
+            finally:
+                if hasattr(call, "close"):
+                    call.close()
+    finally:
+        mock.shutdown()
+        print(f"\nMock served {mock.served} requests, rejected {mock.rejected}.")
+        shutil.rmtree(os.path.dirname(sandbox), ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
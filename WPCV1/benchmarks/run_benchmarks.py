@@ -0,0 +1,277 @@
+"""
+run_benchmarks.py
+
+Benchmarks of the orchestrator's hot paths, compared against stored
+baselines so a change that makes the tool slower is caught:
+
+    startup             `WPCV1.py --help` in a new process (imports and setup)
+    validate_<size>     dispatcher.run_validation on synthetic PHP files, 1KB to 50MB
+    save_revision       revision.save_revision, per call
+    log_conversation    logger.log_conversation, per call
+    scan_project        the desktop assistant's project walk over a synthetic WordPress tree
+    chunk_index_sync    building the BM25 chunk index for the tree's PHP files
+    context_assembly    retrieving chunks for a query and packing a long conversation
+
+Every result is in seconds (lower is better). The first run, or one with
+--save-baseline, stores the results in baselines.json next to this file;
+later runs fail (exit code 1) when a benchmark is slower than its baseline
+by more than its threshold. Baselines are machine-specific, so record them
+on the machine that runs the comparison.
+
+    python benchmarks/run_benchmarks.py --only startup,validate_1MB
+    python benchmarks/run_benchmarks.py --scan-files 20000 --save-baseline
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.realpath(__file__))
+WPCV1_DIR = os.path.dirname(BENCH_DIR)
+ASSISTANT_PATH = os.path.join(os.path.dirname(WPCV1_DIR), "deepseek_docassistantV2.5.py")
+BASELINES_PATH = os.path.join(BENCH_DIR, "baselines.json")
+
+SIZES = { "1KB": 1024, "1MB": 1024 ** 2, "10MB": 10 * 1024 ** 2, "50MB": 50 * 1024 ** 2 }
+DEFAULT_THRESHOLD = 0.20
+# Process start and small-file I/O are noisier than CPU-bound work
+THRESHOLDS = { "startup": 0.30, "save_revision": 0.30, "log_conversation": 0.30 }
+
+PHP_SNIPPET = """<?php
+/**
+ * Registers the {name} post type.
+ */
+function {name}_register() {{
+    register_post_type( '{name}', array( 'public' => true, 'label' => __( '{name}', 'td' ) ) );
+}}
+add_action( 'init', '{name}_register' );
+add_filter( 'the_content', function ( $content ) {{ return esc_html( $content ); }} );
+"""
+
+class Skip(Exception):
+    """A benchmark cannot run in this environment; the message says why."""
+
+class Context:
+    """
+    Shared fixtures: a sandbox copy of WPCV1 (so revisions, logs and
+    conversation.txt of the installation are untouched), the synthetic
+    WordPress tree and the desktop assistant module, created on first use.
+    """
+
+    def __init__(self, scan_files):
+        self.root = tempfile.mkdtemp(prefix="wpcv1-benchmarks-")
+        self.sandbox = os.path.join(self.root, "WPCV1")
+        shutil.copytree(WPCV1_DIR, self.sandbox, ignore=shutil.ignore_patterns(
+            "responses", "revisions", "logs", "archive", "__pycache__", "benchmarks"))
+        os.environ["HOME"] = os.environ["USERPROFILE"] = self.root
+        sys.path.insert(0, self.sandbox)
+        self.scan_files = scan_files
+        self._tree = None
+        self._assistant = None
+
+    def close(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    @property
+    def assistant(self):
+        """The desktop assistant module, which holds the scanning and context code."""
+        if self._assistant is None:
+            try:
+                spec = importlib.util.spec_from_file_location("assistant_bench", ASSISTANT_PATH)
+                module = importlib.util.module_from_spec(spec)
+                spec.loader.exec_module(module)
+            except ImportError as e:
+                raise Skip(f"the desktop assistant cannot be imported ({e})")
+            self._assistant = module
+        return self._assistant
+
+    @property
+    def tree(self):
+        """A WordPress install with themes and plugins, scan_files files in total."""
+        if self._tree is None:
+            self._tree = os.path.join(self.root, "wordpress")
+            random.seed(1)
+            for name in ("wp-admin", "wp-includes", "wp-content/themes", "wp-content/plugins"):
+                os.makedirs(os.path.join(self._tree, name))
+            extensions = (".php", ".php", ".php", ".js", ".css", ".txt", ".json", ".png")
+            for i in range(self.scan_files):
+                top = random.choice(("wp-admin", "wp-includes", f"wp-content/themes/theme{i % 12}",
+                                     f"wp-content/plugins/plugin{i % 150}"))
+                folder = os.path.join(self._tree, top, f"dir{i % 40}")
+                os.makedirs(folder, exist_ok=True)
+                ext = random.choice(extensions)
+                with open(os.path.join(folder, f"file{i}{ext}"), "w") as f:
+                    f.write(PHP_SNIPPET.format(name=f"type{i}") if ext == ".php" else f"/* file {i} */\n")
+        return self._tree
+
+def timed(fn, repeat=3):
+    """Median wall time of fn() over repeat runs, in seconds."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+def bench_startup(ctx):
+    script = os.path.join(ctx.sandbox, "WPCV1.py")
+
+    def start():
+        result = subprocess.run([sys.executable, script, "--help"], capture_output=True, cwd=ctx.sandbox)
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.decode("utf-8", "replace").strip().splitlines()[-1])
+    start()  # warm the OS file cache and bytecode
+    return timed(start, repeat=5)
+
+def make_validate(size):
+    def bench(ctx):
+        from modules.dispatcher import dispatcher
+        snippet = PHP_SNIPPET.format(name="bench")
+        code = (snippet * (SIZES[size] // len(snippet) + 1))[:SIZES[size]]
+        expectations = os.path.join(ctx.sandbox, "docs", "expectations.md")
+        return timed(lambda: dispatcher.run_validation(code, expectations, "bench.php", ctx.root),
+                     repeat=1 if SIZES[size] > 10 * 1024 ** 2 else 3)
+    return bench
+
+def bench_save_revision(ctx, calls=500):
+    from modules.revision.revision import save_revision
+    content = PHP_SNIPPET.format(name="bench") * 10
+    return timed(lambda: [save_revision(ctx.root, f"file{i}.php", content) for i in range(calls)]) / calls
+
+def bench_log_conversation(ctx, calls=500):
+    from modules.logger import logger
+    # The assistant module puts the real WPCV1 first on sys.path; never log into its conversation.txt
+    logger.BASE_PATH = ctx.sandbox
+    entry = { "agent": "bench", "prompt": "Review this hook", "response": PHP_SNIPPET.format(name="bench") }
+    return timed(lambda: [logger.log_conversation(dict(entry, timestamp=f"bench-{i}")) for i in range(calls)]) / calls
+
+def bench_scan_project(ctx):
+    tree = ctx.tree
+    scan = ctx.assistant.WordPressAssistant.scan_project
+    scan(tree)  # warm the OS directory cache
+    return timed(lambda: scan(tree))
+
+def php_files(ctx, limit=2000):
+    tree = ctx.tree
+    index = ctx.assistant.WordPressAssistant.scan_project(tree)
+    return [(os.path.join(tree, rel_path), rel_path, "php") for rel_path in index["php"][:limit]]
+
+def bench_chunk_index_sync(ctx):
+    files = php_files(ctx)
+    return timed(lambda: ctx.assistant.BM25Index().sync(files))
+
+def bench_context_assembly(ctx):
+    assistant = ctx.assistant
+    index = assistant.BM25Index()
+    index.sync(php_files(ctx))
+    counter = assistant.TokenCounter()
+    packer = assistant.ContextPacker(counter)
+    for i in range(200):
+        packer.add_turn({ "role": "user", "content": f"How do I register post type {i}?" * 5 },
+                        { "role": "assistant", "content": PHP_SNIPPET.format(name=f"type{i}") })
+    count = lambda text: counter.count(text, remember=False)
+
+    def assemble():
+        chunks = index.select("which functions hook init and register_post_type", {"php"}, 6000, count)
+        context = "\n".join(chunk["text"] for chunk in chunks)
+        packer.pack([{ "role": "system", "content": context },
+                     { "role": "user", "content": "Refactor the init hooks" }], 12000, reserve=1000)
+    return timed(assemble, repeat=5)
+
+BENCHMARKS = { "startup": bench_startup }
+BENCHMARKS.update({ f"validate_{size}": make_validate(size) for size in SIZES })
+BENCHMARKS.update({
+    "save_revision": bench_save_revision,
+    "log_conversation": bench_log_conversation,
+    "scan_project": bench_scan_project,
+    "chunk_index_sync": bench_chunk_index_sync,
+    "context_assembly": bench_context_assembly,
+})
+
+def load_baselines():
+    try:
+        with open(BASELINES_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_baselines(results, previous):
+    baselines = previous or { "thresholds": {} }
+    baselines.update({
+        "machine": platform.node(),
+        "python": platform.python_version(),
+        "recorded": time.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    baselines.setdefault("results", {}).update(results)
+    with open(BASELINES_PATH, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+def format_seconds(value):
+    return f"{value * 1000:.2f}ms" if value < 1 else f"{value:.2f}s"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WPCV1 hot paths against stored baselines")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks, from: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--scan-files", type=int, default=100000, help="Files in the synthetic WordPress tree")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baselines")
+    parser.add_argument("--threshold", type=float, help="Allowed slowdown for every benchmark, e.g. 0.2 for 20%%")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(",")] if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    baselines = load_baselines()
+    ctx = Context(args.scan_files)
+    results = {}
+    regressions = []
+    failures = []
+    try:
+        for name in names:
+            try:
+                value = BENCHMARKS[name](ctx)
+            except Skip as e:
+                print(f"{name:<18} skipped: {e}")
+                continue
+            except Exception as e:
+                print(f"{name:<18} failed: {e}")
+                failures.append(name)
+                continue
+            results[name] = value
+            line = f"{name:<18} {format_seconds(value):>10}"
+            baseline = (baselines or {}).get("results", {}).get(name)
+            if baseline:
+                threshold = args.threshold
+                if threshold is None:
+                    threshold = baselines.get("thresholds", {}).get(name, THRESHOLDS.get(name, DEFAULT_THRESHOLD))
+                change = value / baseline - 1
+                line += f"   baseline {format_seconds(baseline):>10}  {change:+.1%}"
+                if change > threshold:
+                    line += f"  ❌ slower than the {threshold:.0%} threshold"
+                    regressions.append(name)
+            print(line)
+    finally:
+        ctx.close()
+
+    if failures:
+        # A partial run would leave the failed benchmarks without a baseline to compare against
+        print(f"\n{len(failures)} failure(s): {', '.join(failures)}; baselines not saved")
+    elif args.save_baseline or baselines is None:
+        save_baselines(results, baselines)
+        print(f"\nBaselines saved to {BASELINES_PATH}")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+    if failures or regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
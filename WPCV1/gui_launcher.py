@@ -1,7 +1,10 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import subprocess
+import queue
 import os
+import sys
+
+from modules.worker.worker import WorkerClient
 
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 AGENTS = ["deepseek", "openai", "grok", "gemini", "local"]
@@ -11,27 +14,25 @@ MODES = {
     "scaffold": "Generate expectations.md scaffold and optionally validate",
     "cmd-validate": "Check required CLI commands and paths"
 }
+POLL_MS = 50
+
+# One WPCV1.py process serves every click; it is started on the first run
+worker = WorkerClient([sys.executable, os.path.join(BASE_DIR, "WPCV1.py"), "--serve"], cwd=BASE_DIR)
 
-def run_script(mode, agent=None, file_path=None, expect_path=None, directory=None):
-    cmd = ["python3", os.path.join(BASE_DIR, "WPCV1.py"), "--mode", mode]
+def build_args(mode, agent=None, file_path=None, expect_path=None, directory=None):
+    args = ["--mode", mode]
 
     if mode == "prompt" and agent:
-        cmd += ["--agent", agent]
+        args += ["--agent", agent]
         if directory:
-            cmd += ["--directory", directory]
+            args += ["--directory", directory]
     if mode == "validate" and file_path:
-        cmd += ["--file", file_path]
+        args += ["--file", file_path]
         if expect_path:
-            cmd += ["--expect", expect_path]
+            args += ["--expect", expect_path]
     if mode == "cmd-validate":
-        cmd += ["--validate-only"]
-
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        output_text.delete("1.0", tk.END)
-        output_text.insert(tk.END, result.stdout)
-    except Exception as e:
-        messagebox.showerror("Execution Error", str(e))
+        args = ["--validate-only"]
+    return args
 
 def browse_file(entry_widget):
     path = filedialog.askopenfilename()
@@ -81,16 +82,85 @@ def launch_gui():
     dir_entry.pack()
     tk.Button(root, text="Browse", command=lambda: browse_file(dir_entry)).pack()
 
-    # === Run Button ===
-    tk.Button(root, text="Run", font=("Arial", 12, "bold"), bg="#4CAF50", fg="white",
-              command=lambda: run_script(mode_var.get(), agent_var.get(), file_entry.get(), expect_entry.get(), dir_entry.get())
-    ).pack(pady=10)
+    # === Run / Cancel Buttons ===
+    buttons = tk.Frame(root)
+    buttons.pack(pady=10)
+    run_button = tk.Button(buttons, text="Run", font=("Arial", 12, "bold"), bg="#4CAF50", fg="white",
+                           command=lambda: run_script(mode_var.get(), agent_var.get(), file_entry.get(),
+                                                      expect_entry.get(), dir_entry.get()))
+    run_button.pack(side="left", padx=5)
+    cancel_button = tk.Button(buttons, text="Cancel", font=("Arial", 12), state="disabled",
+                              command=lambda: cancel_script())
+    cancel_button.pack(side="left", padx=5)
 
     # === Output Display ===
     tk.Label(root, text="Output:", font=("Arial", 12)).pack(pady=5)
     output_text = tk.Text(root, wrap="word", height=20)
     output_text.pack(fill="both", expand=True)
 
+    # === Input (answers the running command's questions) ===
+    input_frame = tk.Frame(root)
+    input_frame.pack(fill="x", pady=5)
+    input_entry = tk.Entry(input_frame, state="disabled")
+    input_entry.pack(side="left", fill="x", expand=True, padx=5)
+    send_button = tk.Button(input_frame, text="Send", state="disabled", command=lambda: send_input())
+    send_button.pack(side="left", padx=5)
+    input_entry.bind("<Return>", lambda event: send_input())
+
+    def set_running(running):
+        run_button.config(state="disabled" if running else "normal")
+        cancel_button.config(state="normal" if running else "disabled")
+
+    def set_waiting_for_input(waiting):
+        input_entry.config(state="normal" if waiting else "disabled")
+        send_button.config(state="normal" if waiting else "disabled")
+        if waiting:
+            input_entry.focus_set()
+
+    def run_script(mode, agent, file_path, expect_path, directory):
+        output_text.delete("1.0", tk.END)
+        try:
+            worker.run(build_args(mode, agent, file_path, expect_path, directory))
+        except Exception as e:
+            messagebox.showerror("Execution Error", str(e))
+            return
+        set_running(True)
+
+    def cancel_script():
+        worker.cancel()
+        output_text.insert(tk.END, "\n⏹️ Cancelled.\n")
+
+    def send_input():
+        text = input_entry.get()
+        input_entry.delete(0, tk.END)
+        set_waiting_for_input(False)
+        output_text.insert(tk.END, text + "\n")
+        worker.send_input(text)
+
+    def poll_worker():
+        try:
+            while True:
+                message = worker.messages.get_nowait()
+                if message["type"] == "output":
+                    output_text.insert(tk.END, message["text"])
+                    output_text.see(tk.END)
+                elif message["type"] == "input":
+                    output_text.insert(tk.END, message["prompt"])
+                    output_text.see(tk.END)
+                    set_waiting_for_input(True)
+                elif message["type"] == "done":
+                    set_waiting_for_input(False)
+                    set_running(False)
+        except queue.Empty:
+            pass
+        root.after(POLL_MS, poll_worker)
+
+    def close():
+        worker.close()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", close)
+    root.after(POLL_MS, poll_worker)
     root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,249 @@
+"""
+mock_agent_server.py
+
+Stand-in for the agent APIs, for measuring latency and load offline. Serves
+the OpenAI chat completions schema (POST /v1/chat/completions, streamed or
+not) and Gemini generateContent (POST /v1beta/models/<model>:generateContent)
+with configurable latency, streaming speed, injected errors and throughput
+caps. Runs on the `local` agent's default address:
+
+    python mock_agent_server.py --latency lognormal:0.4,0.5 --error-rate 0.02 --rps 20
+"""
+
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("add_action", "wp_enqueue_script", "sanitize_text_field", "nonce", "query", "filter",
+         "template", "escape", "hook", "plugin", "theme", "cache", "option", "meta")
+
+def latency_sampler(spec):
+    """
+    Parses a latency distribution.
+
+    :param spec: "fixed:S", "uniform:MIN,MAX", "normal:MEAN,SD" or "lognormal:MEDIAN,SIGMA", in seconds.
+    :return: A function returning one non-negative sample per call.
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",")] if params else []
+    samplers = {
+        "fixed": lambda: values[0],
+        "uniform": lambda: random.uniform(values[0], values[1]),
+        "normal": lambda: random.gauss(values[0], values[1]),
+        "lognormal": lambda: random.lognormvariate(math.log(values[0]), values[1]),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution '{kind}'. Use one of: {', '.join(samplers)}")
+    sampler = samplers[kind]
+    sampler()  # fail now on missing parameters
+    return lambda: max(0.0, sampler())
+
+class MockAgentServer(ThreadingHTTPServer):
+    """
+    HTTP server holding the mock's behaviour; requests beyond max_concurrency
+    or rps are answered with 429, like a provider at its limit.
+
+    :param address: (host, port) to listen on; port 0 picks a free port.
+    :param latency: Sampler for the delay before the first byte, in seconds.
+    :param token_delay: Seconds between streamed chunks.
+    :param reply_tokens: Words in each reply.
+    :param error_rate: Fraction of requests answered with one of error_codes.
+    :param error_codes: HTTP statuses used for injected errors.
+    :param hang_rate: Fraction of requests that never answer (until hang_seconds), to exercise timeouts.
+    :param max_concurrency: Requests served at once, or None for no limit.
+    :param rps: Requests accepted per second, or None for no limit.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=lambda: 0.0, token_delay=0.0, reply_tokens=60, error_rate=0.0,
+                 error_codes=(500, 503), hang_rate=0.0, hang_seconds=600, max_concurrency=None, rps=None):
+        super().__init__(address, MockAgentHandler)
+        self.latency = latency
+        self.token_delay = token_delay
+        self.reply_tokens = reply_tokens
+        self.error_rate = error_rate
+        self.error_codes = error_codes
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        self.rps = rps
+        self.allowance = rps or 0
+        self.allowance_updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.served = 0
+        self.rejected = 0
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def admit(self):
+        """Takes one request from the per-second allowance; False if it is used up."""
+        if not self.rps:
+            return True
+        with self.lock:
+            now = time.monotonic()
+            self.allowance = min(self.rps, self.allowance + (now - self.allowance_updated) * self.rps)
+            self.allowance_updated = now
+            if self.allowance < 1:
+                return False
+            self.allowance -= 1
+            return True
+
+    def reply_words(self):
+        return [random.choice(WORDS) for _ in range(self.reply_tokens)]
+
+class MockAgentHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    GEMINI_PATH = re.compile(r"/v1beta/models/([^/:]+):generateContent")
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self.send_json(200, { "object": "list", "data": [{ "id": "mock-model", "object": "model" }] })
+        else:
+            self.send_json(404, { "error": { "message": "Not found" } })
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self.send_json(400, { "error": { "message": "Invalid JSON" } })
+            return
+
+        gemini = self.GEMINI_PATH.match(self.path)
+        if not gemini and self.path.rstrip("/") != "/v1/chat/completions":
+            self.send_json(404, { "error": { "message": "Not found" } })
+            return
+
+        if not server.admit() or (server.slots and not server.slots.acquire(blocking=False)):
+            with server.lock:
+                server.rejected += 1
+            self.send_json(429, { "error": { "message": "Rate limit reached" } }, { "Retry-After": "1" })
+            return
+        try:
+            roll = random.random()
+            if roll < server.hang_rate:
+                time.sleep(server.hang_seconds)
+                return
+            if roll < server.hang_rate + server.error_rate:
+                status = random.choice(server.error_codes)
+                self.send_json(status, { "error": { "message": f"Injected error {status}" } })
+                return
+
+            time.sleep(server.latency())
+            if gemini:
+                self.answer_gemini(request)
+            elif request.get("stream"):
+                self.stream_openai(request)
+            else:
+                self.answer_openai(request)
+            with server.lock:
+                server.served += 1
+        finally:
+            if server.slots:
+                server.slots.release()
+
+    @staticmethod
+    def prompt_tokens(texts):
+        return sum(len(text) for text in texts) // 4
+
+    def answer_openai(self, request):
+        words = self.server.reply_words()
+        prompt_tokens = self.prompt_tokens(m.get("content", "") for m in request.get("messages", []))
+        self.send_json(200, {
+            "id": "mock", "object": "chat.completion", "model": request.get("model", "mock-model"),
+            "choices": [{ "index": 0, "finish_reason": "stop",
+                          "message": { "role": "assistant", "content": " ".join(words) } }],
+            "usage": { "prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                       "total_tokens": prompt_tokens + len(words) }
+        })
+
+    def stream_openai(self, request):
+        words = self.server.reply_words()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")  # the end of the stream is the end of the body
+        self.end_headers()
+        self.close_connection = True
+
+        def event(body):
+            self.wfile.write(f"data: {json.dumps(body)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            for i, word in enumerate(words):
+                if i and self.server.token_delay:
+                    time.sleep(self.server.token_delay)
+                event({ "object": "chat.completion.chunk",
+                         "choices": [{ "index": 0, "delta": { "content": word if i == 0 else f" {word}" } }] })
+            if request.get("stream_options", {}).get("include_usage"):
+                prompt_tokens = self.prompt_tokens(m.get("content", "") for m in request.get("messages", []))
+                event({ "object": "chat.completion.chunk", "choices": [],
+                        "usage": { "prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                                   "total_tokens": prompt_tokens + len(words) } })
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client cancelled, e.g. a hedged request that lost
+
+    def answer_gemini(self, request):
+        words = self.server.reply_words()
+        texts = [part.get("text", "") for content in request.get("contents", []) for part in content.get("parts", [])]
+        self.send_json(200, {
+            "candidates": [{ "content": { "role": "model", "parts": [{ "text": " ".join(words) }] },
+                             "finishReason": "STOP" }],
+            "usageMetadata": { "promptTokenCount": self.prompt_tokens(texts), "candidatesTokenCount": len(words) }
+        })
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI/Gemini agent server for benchmarks")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=1234)
+    parser.add_argument("--latency", default="fixed:0.2",
+                        help="Delay before the first byte: fixed:S, uniform:MIN,MAX, normal:MEAN,SD or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed chunks")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="Words in each reply")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with an error")
+    parser.add_argument("--error-codes", default="500,503", help="Comma-separated statuses for injected errors")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fraction of requests that never answer")
+    parser.add_argument("--max-concurrency", type=int, help="Requests served at once; more get 429")
+    parser.add_argument("--rps", type=float, help="Requests accepted per second; more get 429")
+    args = parser.parse_args()
+
+    server = MockAgentServer(
+        (args.host, args.port), latency_sampler(args.latency), args.token_delay, args.reply_tokens,
+        args.error_rate, tuple(int(code) for code in args.error_codes.split(",")), args.hang_rate,
+        max_concurrency=args.max_concurrency, rps=args.rps
+    )
+    print(f"🧪 Mock agent server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\nServed {server.served} requests, rejected {server.rejected}.")
+
+if __name__ == "__main__":
+    main()
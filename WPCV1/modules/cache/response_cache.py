@@ -0,0 +1,114 @@
+"""
+response_cache.py
+
+Opt-in cache of chat completions, shared by WPCV1.call_agent and the
+desktop assistants. Entries are keyed by endpoint, model, normalized
+messages and temperature, expire after a TTL and are evicted least recently used first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".wpcv1", "response_cache.sqlite3")
+
+def normalize_messages(messages):
+    """
+    Reduces messages to role and content with line endings unified and outer
+    whitespace stripped, so that the same prompt typed on Windows and Linux
+    shares an entry. Indentation and line breaks inside are kept, as they
+    change the meaning of the code a prompt quotes.
+
+    :param messages: Chat messages as dicts with "role" and "content".
+    :return: A list of normalized message dicts.
+    """
+    return [
+        {
+            "role": str(message.get("role", "user")).strip().lower(),
+            "content": str(message.get("content", "")).replace("\r\n", "\n").strip()
+        }
+        for message in messages
+    ]
+
+def cache_key(model, messages, temperature=None, endpoint=None):
+    """
+    Hash identifying a request.
+
+    :param model: The model name the request is sent to.
+    :param messages: The chat messages of the request.
+    :param temperature: The sampling temperature, or None for the provider default.
+    :param endpoint: The URL the request is sent to, so servers sharing a model name don't share answers.
+    :return: A hex SHA-256 digest.
+    """
+    payload = json.dumps(
+        {"endpoint": endpoint, "model": model, "messages": normalize_messages(messages), "temperature": temperature},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """
+    SQLite-backed response cache. Every operation opens its own connection,
+    so one instance can be used from worker threads, and separate processes
+    (CLI runs, the desktop apps) share the same file.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=24 * 3600, max_entries=500):
+        """
+        :param path: The SQLite file holding the cache.
+        :param ttl: Seconds an entry stays valid.
+        :param max_entries: Entries kept before the least recently used are evicted.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL)"
+            )
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=5))
+
+    def get(self, model, messages, temperature=None, endpoint=None):
+        """
+        :return: The cached response text, or None on a miss or expired entry.
+        """
+        key = cache_key(model, messages, temperature, endpoint)
+        now = time.time()
+        with self._connect() as conn, conn:
+            row = conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def put(self, model, messages, temperature, response, endpoint=None):
+        """
+        Stores a response, dropping expired entries and any beyond max_entries.
+        """
+        key = cache_key(model, messages, temperature, endpoint)
+        now = time.time()
+        with self._connect() as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._connect() as conn, conn:
+            conn.execute("DELETE FROM responses")
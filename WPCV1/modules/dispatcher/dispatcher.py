@@ -4,22 +4,30 @@ dispatcher.py
 Routes validation tasks to appropriate modules.
 """
 
+import os
+
 from modules.validator import validator
 from modules.rewriter import rewriter
 from modules.revision import revision
 from modules.expectations import expectations
 
-def run_validation(code_str, expectations_path):
+BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+def run_validation(code_str, expectations_path, file_path="code", base_dir=None):
     """
     Runs full validation pipeline.
+
+    :param file_path: Path of the validated file, used to name its revisions.
+    :param base_dir: Directory whose revisions/ folder receives them; defaults to WPCV1.
     """
-    revision.save_revision(code_str, label="before")
+    base_dir = base_dir or BASE_PATH
+    revision.save_revision(base_dir, file_path, code_str, label="before")
     syntax_errors = validator.check_syntax(code_str)
     lint_warnings = validator.lint_code(code_str)
     expectations_list = expectations.load_expectations(expectations_path)
     expectation_mismatches = validator.match_expectations(code_str, expectations_list)
     rewritten_code, changes = rewriter.auto_rewrite(code_str)
-    revision.save_revision(rewritten_code, label="after")
+    revision.save_revision(base_dir, file_path, rewritten_code, label="after")
 
     return {
         "syntax": syntax_errors,
@@ -0,0 +1,137 @@
+"""
+metrics.py
+
+Per-call metrics for agent requests: queue time, time to first byte, total
+time, prompt/completion tokens, retries and HTTP status. Calls are stored
+as rows of a compact SQLite time series shared by every process, and
+summarized per agent and model with percentiles for `--mode stats`.
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+DEFAULT_METRICS_PATH = os.path.join(os.path.expanduser("~"), ".wpcv1", "metrics.sqlite3")
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile.
+
+    :param values: Numbers, in any order; None entries are ignored.
+    :param pct: The percentile, 0-100.
+    :return: The percentile, or None if there are no values.
+    """
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+class MetricsStore:
+    """
+    SQLite-backed store of call metrics. Like ResponseCache, every operation
+    opens its own connection, so one instance can be used from worker threads.
+    """
+
+    COLUMNS = ("ts", "agent", "model", "provider", "queue_ms", "ttfb_ms", "total_ms",
+               "prompt_tokens", "completion_tokens", "retries", "status", "error")
+
+    def __init__(self, path=DEFAULT_METRICS_PATH, retention_days=90):
+        """
+        :param path: The SQLite file holding the metrics.
+        :param retention_days: Calls older than this are dropped when the store is opened.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS calls ("
+                "ts REAL, agent TEXT, model TEXT, provider TEXT, queue_ms INTEGER, ttfb_ms INTEGER, "
+                "total_ms INTEGER, prompt_tokens INTEGER, completion_tokens INTEGER, retries INTEGER, "
+                "status INTEGER, error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS calls_ts ON calls (ts)")
+            conn.execute("DELETE FROM calls WHERE ts < ?", (time.time() - retention_days * 86400,))
+
+    def _connect(self):
+        return closing(sqlite3.connect(self.path, timeout=5))
+
+    def record(self, agent, model, provider, queue_ms=None, ttfb_ms=None, total_ms=None, prompt_tokens=None,
+               completion_tokens=None, retries=0, status=None, error=None):
+        """
+        Stores one call. Times are in milliseconds; status is the HTTP status,
+        or None if no response arrived (timeouts, connection errors).
+        """
+        row = (time.time(), agent, model, provider, queue_ms, ttfb_ms, total_ms, prompt_tokens,
+               completion_tokens, retries, status, error)
+        with self._connect() as conn, conn:
+            conn.execute(f"INSERT INTO calls ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(row))})", row)
+
+    def summary(self, since=None):
+        """
+        Percentiles of the calls since a time, per agent and model.
+
+        :param since: Unix time of the oldest call to include, or None for all.
+        :return: A list of dicts, one per agent and model, ordered by agent.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT agent, model, queue_ms, ttfb_ms, total_ms, prompt_tokens, completion_tokens, retries, status, error "
+                "FROM calls WHERE ts >= ? ORDER BY agent, model", (since or 0,)
+            ).fetchall()
+
+        groups = {}
+        for row in rows:
+            groups.setdefault((row[0], row[1]), []).append(row)
+
+        summary = []
+        for (agent, model), calls in groups.items():
+            column = lambda i: [call[i] for call in calls]
+            entry = {
+                "agent": agent,
+                "model": model,
+                "calls": len(calls),
+                # A stream that breaks after its 200 headers is stored with status 200 and an error
+                "errors": sum(1 for call in calls if call[9] is not None or call[8] != 200),
+                "retries": sum(column(7)),
+                "prompt_tokens": sum(v for v in column(5) if v),
+                "completion_tokens": sum(v for v in column(6) if v),
+            }
+            for name, i in (("queue_ms", 2), ("ttfb_ms", 3), ("total_ms", 4)):
+                for pct in (50, 95, 99):
+                    entry[f"{name}_p{pct}"] = percentile(column(i), pct)
+            summary.append(entry)
+        return summary
+
+def format_report(summary):
+    """
+    Renders summary() as a plain-text table.
+
+    :param summary: The result of MetricsStore.summary().
+    :return: The report text.
+    """
+    if not summary:
+        return "No agent calls recorded yet."
+
+    def ms(value):
+        return "-" if value is None else f"{value / 1000:.2f}s"
+
+    header = ("agent", "model", "calls", "errors", "retries", "ttfb p50/p95/p99", "total p50/p95/p99",
+              "queue p95", "tokens in/out")
+    rows = [header]
+    for entry in summary:
+        rows.append((
+            entry["agent"],
+            entry["model"] or "-",
+            str(entry["calls"]),
+            str(entry["errors"]),
+            str(entry["retries"]),
+            " / ".join(ms(entry[f"ttfb_ms_p{p}"]) for p in (50, 95, 99)),
+            " / ".join(ms(entry[f"total_ms_p{p}"]) for p in (50, 95, 99)),
+            ms(entry["queue_ms_p95"]),
+            f"{entry['prompt_tokens']}/{entry['completion_tokens']}",
+        ))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
@@ -0,0 +1,290 @@
+"""
+providers.py
+
+Adapters for the chat APIs used by WPCV1 and the desktop assistants. A
+provider pairs a request/response codec with capability flags (streaming,
+maximum context, tokenizer) and transport settings (timeouts and a pooled
+session per provider), so callers no longer special-case providers by name.
+"""
+
+import copy
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+
+class ProviderError(Exception):
+    """The provider answered with an error status or a body that could not be decoded."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status  # HTTP status, if the provider answered with an error
+
+def is_timeout(error):
+    """
+    Whether a requests exception is a timeout. A read timeout while the body
+    is read (a streamed reply, say) is raised as a ConnectionError wrapping
+    urllib3's ReadTimeoutError rather than as requests' Timeout.
+    """
+    if isinstance(error, requests.exceptions.Timeout):
+        return True
+    return (isinstance(error, requests.exceptions.ConnectionError) and bool(error.args)
+            and isinstance(error.args[0], ReadTimeoutError))
+
+class OpenAICodec:
+    """OpenAI chat completions schema, also spoken by DeepSeek, Grok and local servers."""
+
+    def encode(self, model, messages, temperature=None, max_tokens=None, stream=False):
+        payload = { "model": model, "messages": messages }
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if max_tokens is not None:
+            payload["max_tokens"] = max_tokens
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = { "include_usage": True }
+        return payload
+
+    def decode(self, body):
+        return body["choices"][0]["message"]["content"]
+
+    def decode_event(self, data):
+        """
+        Parses one server-sent event.
+
+        :param data: The event payload after "data:".
+        :return: The event body, or None at the end of the stream.
+        """
+        if data == "[DONE]":
+            return None
+        return json.loads(data)
+
+    def event_delta(self, event):
+        # The usage event that ends an OpenAI stream has no choices
+        choices = event.get("choices")
+        return (choices[0].get("delta", {}).get("content") or "") if choices else ""
+
+    def usage(self, body):
+        """
+        :return: (prompt tokens, completion tokens) reported in a response or event, or None.
+        """
+        usage = body.get("usage")
+        if not usage:
+            return None
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+class GeminiCodec:
+    """Gemini generateContent schema: "contents" with user/model roles and a separate system instruction."""
+
+    def encode(self, model, messages, temperature=None, max_tokens=None, stream=False):
+        system = [m["content"] for m in messages if m["role"] == "system"]
+        payload = {
+            "contents": [
+                { "role": "model" if m["role"] == "assistant" else "user", "parts": [{ "text": m["content"] }] }
+                for m in messages if m["role"] != "system"
+            ]
+        }
+        if system:
+            payload["systemInstruction"] = { "parts": [{ "text": "\n\n".join(system) }] }
+        config = {}
+        if temperature is not None:
+            config["temperature"] = temperature
+        if max_tokens is not None:
+            config["maxOutputTokens"] = max_tokens
+        if config:
+            payload["generationConfig"] = config
+        return payload
+
+    def decode(self, body):
+        return "".join(part.get("text", "") for part in body["candidates"][0]["content"]["parts"])
+
+    def decode_event(self, data):
+        raise ProviderError("Streaming is not supported for Gemini.")
+
+    def event_delta(self, event):
+        raise ProviderError("Streaming is not supported for Gemini.")
+
+    def usage(self, body):
+        usage = body.get("usageMetadata")
+        if not usage:
+            return None
+        return usage.get("promptTokenCount"), usage.get("candidatesTokenCount")
+
+class Provider:
+    """
+    One chat API: how to talk to it, what it can do and how to connect to it.
+
+    :param name: Provider name, as used for "provider" in agents.json.
+    :param codec: Encodes requests and decodes responses.
+    :param url: Default endpoint, where "{model}" stands for the model name; an agent's "url" takes precedence.
+    :param streaming: Whether responses can be streamed as server-sent events.
+    :param max_context: Context window of the provider's models, in tokens.
+    :param tokenizer: tiktoken encoding approximating the provider's tokenizer, or None.
+    :param connect_timeout: Seconds to wait for a connection.
+    :param read_timeout: Seconds to wait for data; while streaming, between chunks.
+    :param pool_size: Connections kept open to the provider.
+    """
+
+    TUNABLE = ("url", "max_context", "connect_timeout", "read_timeout", "pool_size")
+
+    def __init__(self, name, codec, url=None, streaming=True, max_context=8192, tokenizer="cl100k_base",
+                 connect_timeout=10, read_timeout=120, pool_size=4):
+        self.name = name
+        self.codec = codec
+        self.url = url
+        self.streaming = streaming
+        self.max_context = max_context
+        self.tokenizer = tokenizer
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def configure(self, agent):
+        """
+        Copy of the provider with an agent's overrides applied.
+
+        :param agent: Agent entry from agents.json; any of TUNABLE may be set.
+        :return: A Provider.
+        """
+        provider = copy.copy(self)
+        for field in self.TUNABLE:
+            if agent.get(field) is not None:
+                setattr(provider, field, agent[field])
+        return provider
+
+    def headers(self, api_key):
+        if isinstance(self.codec, GeminiCodec):
+            return { "x-goog-api-key": api_key, "Content-Type": "application/json" }
+        return { "Authorization": f"Bearer {api_key}", "Content-Type": "application/json" }
+
+    def session(self):
+        return shared_session(self.name, self.pool_size)
+
+    def post(self, api_key, model, payload, stream=False, session=None):
+        """
+        Sends an encoded request.
+
+        :param api_key: Key for the provider's API.
+        :param model: Model name, filled into URLs that name the model.
+        :param payload: Request body from the codec.
+        :param stream: Whether to read the response as a stream.
+        :param session: Session to send with; defaults to the provider's shared session.
+        :return: The requests.Response, already checked for an error status.
+        :raises ProviderError: If the provider answered with an error status.
+        """
+        response = (session or self.session()).post(
+            self.url.replace("{model}", model), headers=self.headers(api_key), json=payload, timeout=self.timeout, stream=stream)
+        if response.status_code != 200:
+            raise ProviderError(f"API Error: {response.status_code} - {response.text}", response.status_code)
+        return response
+
+    def complete(self, api_key, model, messages, temperature=None, max_tokens=None, session=None, usage=None):
+        """
+        One chat completion.
+
+        :param messages: Chat messages as dicts with "role" and "content".
+        :param usage: Dict that receives "prompt_tokens" and "completion_tokens" if the provider reports them.
+        :return: The reply text.
+        """
+        payload = self.codec.encode(model, messages, temperature, max_tokens)
+        response = self.post(api_key, model, payload, session=session)
+        try:
+            body = response.json()
+            self._record_usage(body, usage)
+            return self.codec.decode(body)
+        except (ValueError, KeyError, IndexError) as e:
+            raise ProviderError(f"Unexpected response from {self.name}: {e}", response.status_code)
+
+    def iter_deltas(self, response, usage=None):
+        """
+        Content deltas of a streamed response, in order.
+
+        :param response: A response returned by post(..., stream=True).
+        :param usage: Dict that receives "prompt_tokens" and "completion_tokens" if the stream reports them.
+        """
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            event = self.codec.decode_event(line[5:].strip())
+            if event is None:
+                return
+            self._record_usage(event, usage)
+            delta = self.codec.event_delta(event)
+            if delta:
+                yield delta
+
+    def _record_usage(self, body, usage):
+        if usage is None:
+            return
+        counts = self.codec.usage(body)
+        if counts:
+            usage["prompt_tokens"], usage["completion_tokens"] = counts
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+def shared_session(name, pool_size):
+    """
+    Session reused by every caller of a provider, so connections stay open
+    between requests and threads.
+
+    :param name: Provider name.
+    :param pool_size: Connections kept per host.
+    :return: A requests.Session.
+    """
+    with _sessions_lock:
+        session = _sessions.get((name, pool_size))
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[(name, pool_size)] = session
+        return session
+
+PROVIDERS = {
+    "openai": Provider("openai", OpenAICodec(), "https://api.openai.com/v1/chat/completions",
+                       max_context=128000, pool_size=8),
+    "deepseek": Provider("deepseek", OpenAICodec(), "https://api.deepseek.com/v1/chat/completions",
+                         max_context=64000, pool_size=8),
+    "grok": Provider("grok", OpenAICodec(), "https://api.x.ai/v1/chat/completions",
+                     max_context=128000),
+    # Streaming uses a different endpoint (streamGenerateContent), which is not wired up
+    "gemini": Provider("gemini", GeminiCodec(),
+                       "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent",
+                       streaming=False, max_context=1000000, tokenizer=None),
+    # Local servers are slow to answer but close by, and serve one request at a time
+    "local": Provider("local", OpenAICodec(), "http://localhost:1234/v1/chat/completions",
+                      max_context=8192, tokenizer=None, connect_timeout=3, read_timeout=600, pool_size=2),
+}
+
+def resolve(agent_name, agent):
+    """
+    Provider for an agent from agents.json. "provider" names it explicitly;
+    otherwise the agent name is tried, then the endpoint, then the OpenAI schema.
+
+    :param agent_name: The agent's key in agents.json.
+    :param agent: The agent's entry.
+    :return: A Provider with the agent's overrides applied.
+    """
+    name = agent.get("provider")
+    if name is None:
+        url = agent.get("url", "")
+        if agent_name in PROVIDERS:
+            name = agent_name
+        elif "generativelanguage.googleapis.com" in url:
+            name = "gemini"
+        elif "api.deepseek.com" in url:
+            name = "deepseek"
+        else:
+            name = "openai"
+    if name not in PROVIDERS:
+        raise ProviderError(f"Unknown provider '{name}'. Known providers: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name].configure(agent)
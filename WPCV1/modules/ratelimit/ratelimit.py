@@ -0,0 +1,143 @@
+"""
+ratelimit.py
+
+Client-side token buckets per agent, so batch runs stay under a provider's
+requests-per-minute ("rpm") and tokens-per-minute ("tpm") limits from
+agents.json instead of running into 429s and retrying. Bucket levels live
+in a small JSON file guarded by a lock file, so every thread and process
+on the machine draws from the same buckets. Callers over the limit wait
+for the bucket to refill rather than fail.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser("~"), ".wpcv1", "ratelimit.json")
+
+def estimate_tokens(messages):
+    """
+    Rough token count of chat messages (about four characters per token),
+    used to draw from the tokens bucket before the provider reports usage.
+    """
+    return sum(len(str(message.get("content", ""))) for message in messages) // 4 + 4 * len(messages)
+
+@contextmanager
+def file_lock(path):
+    """
+    Holds an exclusive lock on path, across processes.
+    """
+    with open(path, "a+") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after 10 seconds; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class RateLimiter:
+    """
+    Requests and tokens buckets per agent. Each bucket holds up to one
+    minute's allowance and refills continuously.
+
+    :param path: JSON file holding the bucket levels; "<path>.lock" guards it.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.thread_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    @contextmanager
+    def _buckets(self):
+        """Yields the bucket levels for modification and writes them back, under both locks."""
+        with self.thread_lock, file_lock(self.lock_path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    buckets = json.load(f)
+            except (OSError, ValueError):
+                buckets = {}
+            yield buckets
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(buckets, f)
+            os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _refill(bucket, rpm, tpm, now):
+        elapsed = max(0.0, now - bucket["updated"])
+        if rpm:
+            bucket["requests"] = min(rpm, bucket["requests"] + elapsed * rpm / 60)
+        if tpm:
+            bucket["tokens"] = min(tpm, bucket["tokens"] + elapsed * tpm / 60)
+        bucket["updated"] = now
+
+    def acquire(self, agent_name, rpm=None, tpm=None, tokens=0):
+        """
+        Waits until the agent's buckets allow one request of the given size,
+        then draws it from them.
+
+        :param agent_name: Name of the agent whose buckets are used.
+        :param rpm: Requests per minute, or None for no request limit.
+        :param tpm: Tokens per minute, or None for no token limit.
+        :param tokens: Estimated tokens of the request; a request larger than tpm waits for a full bucket.
+        :return: Seconds spent waiting.
+        """
+        if not rpm and not tpm:
+            return 0.0
+        tokens = min(tokens, tpm) if tpm else 0
+        started = time.monotonic()
+        while True:
+            now = time.time()
+            with self._buckets() as buckets:
+                bucket = buckets.setdefault(agent_name, { "requests": rpm or 0, "tokens": tpm or 0, "updated": now })
+                self._refill(bucket, rpm, tpm, now)
+                wait = 0.0
+                if rpm and bucket["requests"] < 1:
+                    wait = (1 - bucket["requests"]) * 60 / rpm
+                if tpm and bucket["tokens"] < tokens:
+                    wait = max(wait, (tokens - bucket["tokens"]) * 60 / tpm)
+                if wait == 0:
+                    if rpm:
+                        bucket["requests"] -= 1
+                    if tpm:
+                        bucket["tokens"] -= tokens
+                    return time.monotonic() - started
+            # Other callers may have drawn in the meantime, so check again after waiting
+            time.sleep(min(wait, 5.0))
+
+    def settle(self, agent_name, tpm, estimated, actual):
+        """
+        Corrects the tokens bucket once the provider has reported the real
+        usage. The bucket may go negative, making later callers wait longer.
+
+        :param estimated: Tokens drawn by acquire().
+        :param actual: Tokens the provider reported (prompt plus completion).
+        """
+        if not tpm or actual is None:
+            return
+        with self._buckets() as buckets:
+            bucket = buckets.get(agent_name)
+            if bucket is not None:
+                bucket["tokens"] = min(tpm, bucket["tokens"] + min(estimated, tpm) - actual)
@@ -0,0 +1,314 @@
+"""
+router.py
+
+Routes a prompt across agents from agents.json. An agent may name an
+ordered "failover" chain of other agents to try when it fails, and may be
+"hedge"d: if it has not produced its first token within a threshold taken
+from its recent time-to-first-token percentile, the next agent in the
+chain is started as well and whichever answers first wins. Every endpoint
+has a circuit breaker, so an agent that keeps failing is skipped until its
+cool-down has passed instead of costing every prompt a timeout.
+
+Latency samples and breaker state are kept in ~/.wpcv1/routing.json, as
+the orchestrator usually runs one prompt per process.
+"""
+
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+
+from modules.providers import providers
+from modules.ratelimit.ratelimit import estimate_tokens
+
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser("~"), ".wpcv1", "routing.json")
+
+LATENCY_SAMPLES = 50      # time-to-first-token samples kept per agent
+MIN_SAMPLES = 5           # below this, "hedge_after" is used instead of the percentile
+DEFAULT_HEDGE_AFTER = 10  # seconds
+DEFAULT_BREAKER_FAILURES = 3
+DEFAULT_BREAKER_RESET = 60  # seconds an open breaker stays open
+
+class RoutingError(Exception):
+    """No agent in the chain produced an answer."""
+
+class RoutingState:
+    """
+    Time-to-first-token samples per agent and circuit breakers per endpoint.
+
+    :param path: JSON file the state is loaded from and saved to.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.latency = {}   # agent name -> recent time-to-first-token samples, in seconds
+        self.breakers = {}  # endpoint -> {"failures": consecutive failures, "opened": time or None}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.latency = data.get("latency", {})
+            self.breakers = data.get("breakers", {})
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        # Under the lock and through a unique temp file, so threads of one process never share a write
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(self.path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({ "latency": self.latency, "breakers": self.breakers }, f)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+    def record_latency(self, agent_name, seconds):
+        with self.lock:
+            samples = self.latency.setdefault(agent_name, [])
+            samples.append(round(seconds, 3))
+            del samples[:-LATENCY_SAMPLES]
+
+    def percentile(self, agent_name, pct):
+        """
+        :return: The pct-th percentile of the agent's time to first token, or None without enough samples.
+        """
+        with self.lock:
+            samples = sorted(self.latency.get(agent_name, []))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+    def allow(self, endpoint, reset_after):
+        """
+        Whether a request may be sent to endpoint. An open breaker lets one
+        trial request through once reset_after seconds have passed.
+        """
+        with self.lock:
+            breaker = self.breakers.get(endpoint)
+            if not breaker or breaker["opened"] is None:
+                return True
+            if time.time() - breaker["opened"] >= reset_after:
+                breaker["opened"] = time.time()  # half-open: hold off other callers during the trial
+                return True
+            return False
+
+    def record_success(self, endpoint):
+        with self.lock:
+            self.breakers.pop(endpoint, None)
+
+    def record_failure(self, endpoint, threshold):
+        with self.lock:
+            breaker = self.breakers.setdefault(endpoint, { "failures": 0, "opened": None })
+            breaker["failures"] += 1
+            if breaker["failures"] >= threshold:
+                breaker["opened"] = time.time()
+
+class Attempt(threading.Thread):
+    """
+    One agent answering a prompt on a background thread. Reports
+    ("first", attempt, None) when the first token arrives, ("delta",
+    attempt, text) for every streamed piece of the reply, then
+    ("done", attempt, reply) or ("error", attempt, exception). Finished
+    attempts that were not cancelled are recorded in metrics, if given.
+    With a limiter, the attempt first waits for the agent's "rpm"/"tpm" budget.
+    """
+
+    def __init__(self, agent_name, agent, messages, events, queued_at=None, retries=0, metrics=None,
+                 limiter=None):
+        super().__init__(daemon=True)
+        self.agent_name = agent_name
+        self.agent = agent
+        self.messages = messages
+        self.events = events
+        self.provider = providers.resolve(agent_name, agent)
+        self.response = None
+        self.cancelled = False
+        self.endpoint = agent.get("url") or agent_name
+        self.started_at = time.monotonic()
+        self.queued_at = queued_at or self.started_at
+        self.retries = retries  # attempts started before this one for the same prompt
+        self.metrics = metrics
+        self.limiter = limiter
+
+    def cancel(self):
+        self.cancelled = True
+        if self.response is not None:
+            self.response.close()
+
+    def run(self):
+        sent_at = time.monotonic()
+        first_at = None
+        status = None
+        usage = {}
+        # Everything, the limiter included, inside the try: route() waits for an event from every attempt
+        try:
+            estimated = estimate_tokens(self.messages)
+            if self.limiter is not None:
+                self.limiter.acquire(self.agent_name, self.agent.get("rpm"), self.agent.get("tpm"), estimated)
+                if self.cancelled:
+                    return
+                sent_at = time.monotonic()
+            if self.provider.streaming:
+                payload = self.provider.codec.encode(
+                    self.agent["model"], self.messages, self.agent.get("temperature"), stream=True)
+                self.response = self.provider.post(self.agent["api_key"], self.agent["model"], payload, stream=True)
+                status = self.response.status_code
+                parts = []
+                for delta in self.provider.iter_deltas(self.response, usage):
+                    if self.cancelled:
+                        return
+                    if first_at is None:
+                        first_at = time.monotonic()
+                        self.events.put(("first", self, None))
+                    self.events.put(("delta", self, delta))
+                    parts.append(delta)
+                reply = "".join(parts)
+            else:
+                reply = self.provider.complete(self.agent["api_key"], self.agent["model"], self.messages,
+                                               self.agent.get("temperature"), usage=usage)
+                status = 200
+                first_at = time.monotonic()
+                self.events.put(("first", self, None))
+            if self.limiter is not None and usage:
+                self.limiter.settle(self.agent_name, self.agent.get("tpm"), estimated,
+                                    (usage["prompt_tokens"] or 0) + (usage["completion_tokens"] or 0))
+            outcome = ("done", self, reply)
+        except Exception as e:
+            status = getattr(e, "status", status)
+            outcome = ("error", self, e)
+        if self.cancelled:
+            return
+        # Recorded before the outcome is reported, as the process may exit right after
+        self.record(sent_at, first_at, status, usage, None if outcome[0] == "done" else str(outcome[2]))
+        self.events.put(outcome)
+
+    def record(self, sent_at, first_at, status, usage, error):
+        if self.metrics is None:
+            return
+        ms = lambda seconds: int(seconds * 1000)
+        try:
+            self.metrics.record(
+                self.agent_name, self.agent.get("model"), self.provider.name,
+                queue_ms=ms(sent_at - self.queued_at),
+                ttfb_ms=ms(first_at - sent_at) if first_at else None,
+                total_ms=ms(time.monotonic() - sent_at),
+                prompt_tokens=usage.get("prompt_tokens"),
+                completion_tokens=usage.get("completion_tokens"),
+                retries=self.retries, status=status, error=error and error[:500])
+        except Exception:
+            pass  # metrics must never fail a call
+
+def route(agent_name, agents, messages, state=None, metrics=None, limiter=None, on_delta=None):
+    """
+    Answers messages with agent_name, failing over along its "failover"
+    chain and hedging with the next agent in the chain when "hedge" is set.
+
+    :param agent_name: The agent the prompt was sent to.
+    :param agents: All agents from agents.json.
+    :param messages: Chat messages as dicts with "role" and "content".
+    :param state: RoutingState to use; loaded from and saved to the default path if None.
+    :param metrics: MetricsStore that every attempt is recorded in, or None.
+    :param limiter: RateLimiter that attempts wait on, or None for no client-side limits.
+    :param on_delta: Called as on_delta(agent name, text) with the reply as it arrives, from the
+        agent that answers first only. If it fails mid-reply, the next agent's reply follows in full.
+    :return: (reply, name of the agent that answered)
+    :raises RoutingError: If every agent in the chain failed or was skipped by its breaker.
+    """
+    queued_at = time.monotonic()
+    persist = state is None
+    state = state or RoutingState()
+    primary = agents[agent_name]
+    chain = [agent_name] + [name for name in primary.get("failover", []) if name in agents and name != agent_name]
+    failures = primary.get("breaker_failures", DEFAULT_BREAKER_FAILURES)
+    reset_after = primary.get("breaker_reset", DEFAULT_BREAKER_RESET)
+
+    hedge_after = None
+    if primary.get("hedge") and len(chain) > 1:
+        hedge_after = state.percentile(agent_name, primary.get("hedge_percentile", 95))
+        if hedge_after is None:
+            hedge_after = primary.get("hedge_after", DEFAULT_HEDGE_AFTER)
+
+    events = queue.Queue()
+    running = []
+    started = []
+    errors = []
+    winner = None
+    hedged = False
+    streamed = set()  # attempts whose reply went (partly) to on_delta
+
+    def start_next():
+        while chain:
+            name = chain.pop(0)
+            attempt = Attempt(name, agents[name], messages, events, queued_at, len(started), metrics, limiter)
+            if not state.allow(attempt.endpoint, reset_after):
+                errors.append(f"{name}: circuit open")
+                continue
+            running.append(attempt)
+            started.append(attempt)
+            attempt.start()
+            return True
+        return False
+
+    try:
+        start_next()
+        while running:
+            wait = None
+            if hedge_after is not None and not hedged and winner is None:
+                wait = max(0, hedge_after - (time.monotonic() - running[0].started_at))
+            try:
+                kind, attempt, result = events.get(timeout=wait)
+            except queue.Empty:
+                # Nothing yet from the first agent: race the next one against it
+                hedged = True
+                start_next()
+                continue
+
+            if attempt not in running:
+                continue  # a cancelled attempt that reported before it noticed
+            if kind == "first":
+                if winner is None:
+                    winner = attempt
+                    now = time.monotonic()
+                    state.record_latency(attempt.agent_name, now - attempt.started_at)
+                    for other in running:
+                        if other is not attempt:
+                            other.cancel()
+                            # Its wait so far is a lower bound on its time to first token; leaving
+                            # it out would drag down the percentile the hedge threshold comes from
+                            state.record_latency(other.agent_name, now - other.started_at)
+                    running[:] = [attempt]
+            elif kind == "delta":
+                if attempt is winner and on_delta is not None:
+                    streamed.add(attempt)
+                    on_delta(attempt.agent_name, result)
+            elif kind == "done":
+                if winner in (None, attempt):
+                    if on_delta is not None and attempt not in streamed:
+                        on_delta(attempt.agent_name, result)  # providers that don't stream
+                    state.record_success(attempt.endpoint)
+                    for other in running:
+                        if other is not attempt:
+                            other.cancel()
+                    return result, attempt.agent_name
+            elif kind == "error":
+                state.record_failure(attempt.endpoint, failures)
+                errors.append(f"{attempt.agent_name}: {result}")
+                running.remove(attempt)
+                if attempt is winner:
+                    winner = None
+                if not running:
+                    start_next()
+    finally:
+        if persist:
+            try:
+                state.save()
+            except OSError:
+                pass
+
+    raise RoutingError("; ".join(errors) or "no agents available")
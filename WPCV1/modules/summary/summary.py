@@ -0,0 +1,59 @@
+"""
+summary.py
+
+Extractive summaries of conversation turns, shared by the desktop
+assistants. Turns evicted from the context window are folded into a
+running summary without an API call: the sentences scoring highest on word
+frequency are kept, in their original order, up to a token budget.
+"""
+
+import math
+import re
+from collections import Counter
+
+class ExtractiveSummarizer:
+    """
+    Offline running summary of conversation turns built from their most
+    informative sentences.
+    """
+
+    HEADER = "Summary of earlier conversation:"
+    SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+    CODE_RE = re.compile(r"```.*?```", re.DOTALL)
+    WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+    @classmethod
+    def summarize(cls, turns, previous_summary="", max_tokens=400, count_tokens=None):
+        """Merge previous_summary with the (user, assistant) turns into at most max_tokens"""
+        count_tokens = count_tokens or (lambda text: len(text) // 4)
+        candidates = []  # (order, weight, line)
+        for line in previous_summary.split('\n'):
+            line = line.strip()
+            if line.startswith('- '):
+                candidates.append((len(candidates), 0.8, line[2:]))
+        for user, assistant in turns:
+            for role, message in (("User", user), ("Assistant", assistant)):
+                text = cls.CODE_RE.sub(" [code omitted] ", message.get("content", ""))
+                sentences = [part.strip() for part in cls.SENTENCE_RE.split(text) if len(part.strip()) > 20]
+                for position, sentence in enumerate(sentences):
+                    # The question itself and each answer's opening sentence matter most
+                    weight = 3.0 if role == "User" and position == 0 else 1.5 if position == 0 else 1.0
+                    candidates.append((len(candidates), weight, f"{role}: {sentence[:300]}"))
+
+        frequencies = Counter(word.lower() for _, _, line in candidates for word in cls.WORD_RE.findall(line))
+
+        def score(candidate):
+            words = {word.lower() for word in cls.WORD_RE.findall(candidate[2])}
+            if not words:
+                return 0
+            return candidate[1] * sum(frequencies[word] for word in words) / math.sqrt(len(words))
+
+        chosen = []
+        used = count_tokens(cls.HEADER)
+        for candidate in sorted(candidates, key=score, reverse=True):
+            tokens = count_tokens(candidate[2]) + 2
+            if used + tokens <= max_tokens:
+                chosen.append(candidate)
+                used += tokens
+        chosen.sort()
+        return "\n".join([cls.HEADER] + [f"- {line}" for _, _, line in chosen])
@@ -0,0 +1,186 @@
+"""
+worker.py
+
+Runs WPCV1.py commands in one long-lived process, so the GUI launcher pays
+for interpreter startup and module imports once instead of on every click.
+The launcher and the worker exchange JSON lines over the worker's stdin and
+stdout:
+
+    to the worker    {"type": "run", "argv": [...]}    run WPCV1.py with these arguments
+                     {"type": "input", "text": "..."}  answer the pending input request
+    from the worker  {"type": "ready"}                 waiting for a command
+                     {"type": "output", "stream": "stdout" or "stderr", "text": "..."}
+                     {"type": "input", "prompt": "..."} the command called input()
+                     {"type": "done", "status": 0}     the command finished
+
+Commands run one at a time. Cancelling kills the worker; the client starts
+a new one for the next command.
+"""
+
+import builtins
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import traceback
+
+class MessageStream:
+    """
+    File-like object standing in for sys.stdout or sys.stderr while a
+    command runs; every write is sent as an "output" message straight away.
+    """
+
+    def __init__(self, send, name):
+        self.send = send
+        self.name = name
+
+    def write(self, text):
+        if text:
+            self.send({ "type": "output", "stream": self.name, "text": text })
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+def serve(entry_point, stdin=None, stdout=None):
+    """
+    Reads commands until stdin is closed and runs each with entry_point.
+
+    :param entry_point: Function taking an argv list, like WPCV1.main.
+    :param stdin: Stream the commands are read from (defaults to sys.stdin).
+    :param stdout: Stream the messages are written to (defaults to sys.stdout).
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    lock = threading.Lock()  # agent threads may print while the command does
+
+    def send(message):
+        with lock:
+            stdout.write(json.dumps(message) + "\n")
+            stdout.flush()
+
+    def read():
+        line = stdin.readline()
+        if not line:
+            raise EOFError("The launcher closed the worker's input")
+        return json.loads(line)
+
+    def ask(prompt=""):
+        send({ "type": "input", "prompt": str(prompt) })
+        message = read()
+        if message.get("type") != "input":
+            raise RuntimeError(f"Expected an input reply, got '{message.get('type')}'")
+        return message.get("text", "")
+
+    saved = (sys.stdout, sys.stderr, builtins.input)
+    send({ "type": "ready" })
+    while True:
+        try:
+            message = read()
+        except EOFError:
+            return
+        if message.get("type") != "run":
+            continue
+
+        status = 0
+        sys.stdout = MessageStream(send, "stdout")
+        sys.stderr = MessageStream(send, "stderr")
+        builtins.input = ask
+        try:
+            entry_point(message.get("argv", []))
+        except SystemExit as e:  # argparse errors and --help
+            status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except EOFError:
+            return
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            sys.stdout, sys.stderr, builtins.input = saved
+        send({ "type": "done", "status": status })
+
+class WorkerClient:
+    """
+    Starts and talks to a worker process. Messages from the worker are put
+    on self.messages by a reader thread, for a GUI to poll without blocking.
+
+    :param command: Command line starting the worker, e.g. [python, "WPCV1.py", "--serve"].
+    :param cwd: Working directory of the worker.
+    """
+
+    def __init__(self, command, cwd=None):
+        self.command = command
+        self.cwd = cwd
+        self.messages = queue.Queue()
+        self.process = None
+        self.busy = False
+        self.run_id = 0  # id of the latest run; each worker process is tagged with the run it serves
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.process and self.process.poll() is None:
+            return
+        # Line-buffered UTF-8 both ways, whatever the platform's default encoding
+        self.process = subprocess.Popen(
+            self.command, cwd=self.cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            text=True, encoding="utf-8", bufsize=1, env=dict(os.environ, PYTHONIOENCODING="utf-8")
+        )
+        threading.Thread(target=self._read, args=(self.process,), daemon=True).start()
+
+    def _read(self, process):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                message = { "type": "output", "stream": "stdout", "text": line }
+            self._post(process, message)
+        # Killed by cancel() or crashed; the next run() starts a new worker
+        self._post(process, { "type": "done", "status": process.wait() })
+
+    def _post(self, process, message):
+        with self.lock:
+            # A cancelled worker can still report after the next run has started
+            if getattr(process, "run_id", None) != self.run_id:
+                return
+            if message.get("type") == "done":
+                if not self.busy:
+                    return  # the run already reported before its worker exited
+                self.busy = False
+            self.messages.put(message)
+
+    def _send(self, message):
+        self.process.stdin.write(json.dumps(message) + "\n")
+        self.process.stdin.flush()
+
+    def run(self, argv):
+        """Runs one WPCV1.py command; its output arrives on self.messages."""
+        with self.lock:
+            if self.busy:
+                raise RuntimeError("A command is already running")
+            self.start()
+            self.run_id += 1
+            self.process.run_id = self.run_id
+            self.busy = True
+        self._send({ "type": "run", "argv": argv })
+
+    def send_input(self, text):
+        """Answers the worker's latest "input" message."""
+        self._send({ "type": "input", "text": text })
+
+    def cancel(self):
+        """Stops the running command by killing the worker."""
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+
+    def close(self):
+        if self.process and self.process.poll() is None:
+            self.process.stdin.close()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
@@ -24,6 +24,7 @@ $agent = isset($_POST['agent']) ? escapeshellarg($_POST['agent']) : '';
 $file = isset($_POST['file']) ? escapeshellarg($_POST['file']) : '';
 $expectation = isset($_POST['expectation']) ? escapeshellarg($_POST['expectation']) : '';
 $directory = isset($_POST['directory']) ? escapeshellarg($_POST['directory']) : '';
+$prompt = isset($_POST['prompt']) ? escapeshellarg($_POST['prompt']) : '';
 
 if (empty($mode)) {
     http_response_code(400);
@@ -41,6 +42,9 @@ if ($mode_unquoted === 'prompt' && !empty($agent)) {
     if (!empty($directory)) {
         $cmd .= " --directory $directory";
     }
+    if (!empty($_POST['prompt'])) {
+        $cmd .= " --prompt $prompt";
+    }
 } elseif ($mode_unquoted === 'validate' && !empty($file)) {
     $cmd .= " --file $file";
     if (!empty($expectation)) {
@@ -52,17 +56,92 @@ if ($mode_unquoted === 'prompt' && !empty($agent)) {
 $cmd .= " 2>&1";
 
 // --- Execution ---
-$output = [];
-$return_var = -1;
+// Output is streamed to the browser as Server-Sent Events while the script runs:
+//   event: output  data: {"text": "..."}   the next piece of the script's output
+//   event: done    data: {"status": 0}     the script's exit code
+set_time_limit(0);
+ignore_user_abort(true); // notice the browser leaving, so the script can be stopped
+header('Content-Type: text/event-stream; charset=utf-8');
+header('Cache-Control: no-cache');
+header('X-Accel-Buffering: no'); // keep nginx from buffering the stream
+@ini_set('zlib.output_compression', '0');
+while (ob_get_level() > 0) {
+    ob_end_flush();
+}
 
-exec($cmd, $output, $return_var);
+function send_event($event, $data) {
+    echo "event: $event\n";
+    echo 'data: ' . json_encode($data, JSON_INVALID_UTF8_SUBSTITUTE) . "\n\n";
+    flush();
+}
 
-// --- Response ---
-if ($return_var !== 0) {
-    http_response_code(500);
-    echo "Error executing Python script (exit code: $return_var):\n";
+// Splits off a multi-byte character cut in half at the end of a chunk, to send with the next one
+function split_utf8($buffer) {
+    $length = strlen($buffer);
+    for ($i = 1; $i <= min(3, $length); $i++) {
+        $byte = ord($buffer[$length - $i]);
+        if (($byte & 0xC0) === 0x80) {
+            continue; // continuation byte
+        }
+        $needed = $byte >= 0xF0 ? 4 : ($byte >= 0xE0 ? 3 : ($byte >= 0xC0 ? 2 : 1));
+        if ($needed > $i) {
+            return [substr($buffer, 0, $length - $i), substr($buffer, $length - $i)];
+        }
+        break;
+    }
+    return [$buffer, ''];
+}
+
+$env = array_merge(getenv(), ['PYTHONUNBUFFERED' => '1', 'PYTHONIOENCODING' => 'utf-8']);
+$process = proc_open($cmd, [0 => ['pipe', 'r'], 1 => ['pipe', 'w']], $pipes, null, $env);
+if (!is_resource($process)) {
+    send_event('done', ['status' => -1, 'error' => 'Could not start the Python script']);
+    exit;
 }
+// Nothing can answer input() from here, so it fails at once instead of hanging
+fclose($pipes[0]);
 
-echo implode("\n", $output);
+// PHP only notices the browser leaving when it writes, so a script waiting on a slow agent
+// gets a keep-alive comment (ignored by the client) after this many quiet seconds
+$keep_alive_seconds = 10;
+// stream_select() fails on proc_open() pipes on Windows; reads block there instead
+$selectable = true;
+
+$pending = '';
+while (!feof($pipes[1])) {
+    if ($selectable) {
+        $read = [$pipes[1]];
+        $write = null;
+        $except = null;
+        $ready = stream_select($read, $write, $except, $keep_alive_seconds);
+        if ($ready === false) {
+            $selectable = false;
+        } elseif ($ready === 0) {
+            echo ": keep-alive\n\n";
+            flush();
+        }
+    }
+    if (!$selectable || !empty($read)) {
+        $chunk = fread($pipes[1], 8192);
+        if ($chunk !== false && $chunk !== '') {
+            list($text, $pending) = split_utf8($pending . $chunk);
+            if ($text !== '') {
+                send_event('output', ['text' => $text]);
+            }
+        }
+    }
+    if (connection_aborted()) {
+        proc_terminate($process);
+        break;
+    }
+}
+if ($pending !== '') {
+    send_event('output', ['text' => $pending]);
+}
+fclose($pipes[1]);
+$return_var = proc_close($process);
+
+// --- Response ---
+send_event('done', ['status' => $return_var]);
 
 ?>
@@ -4,64 +4,294 @@ import json
 import os
 import html
 import re
+import math
+import bisect
+import hashlib
+import sqlite3
+import threading
+import time
+import heapq
+import itertools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import tiktoken
+from collections import Counter
 from datetime import datetime
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QTextEdit, QPushButton, 
                              QVBoxLayout, QHBoxLayout, QWidget, QSplitter, QLabel, 
                              QFileDialog, QComboBox, QStatusBar, QMessageBox, QListWidget,
                              QTabWidget, QListWidgetItem, QCheckBox, QMenuBar, QMenu,
                              QTreeWidget, QTreeWidgetItem, QHeaderView, QInputDialog,
-                             QGroupBox, QScrollArea, QFrame)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+                             QGroupBox, QScrollArea, QFrame, QLineEdit, QListView, QProgressBar)
+from PyQt6.QtCore import (Qt, QThread, QObject, pyqtSignal, QFileSystemWatcher, QTimer,
+                          QAbstractListModel, QModelIndex)
 from PyQt6.QtGui import QFont, QSyntaxHighlighter, QTextCharFormat, QColor, QTextDocument, QTextCursor, QClipboard
 import markdown
 
+# Modules shared with the WPCV1 orchestrator
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "WPCV1"))
+from modules.cache.response_cache import ResponseCache
+from modules.providers.providers import PROVIDERS, ProviderError, is_timeout
+from modules.summary.summary import ExtractiveSummarizer
+
+# Per-user storage for indexes and other data that outlives a session
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".wp_assistant")
+SETTINGS_PATH = os.path.join(APP_DATA_DIR, "settings.json")
+CONVERSATIONS_DB_PATH = os.path.join(APP_DATA_DIR, "conversations.db")
+# Settings and history were kept together in the working directory before 2.5
+LEGACY_SETTINGS_PATH = "wp_assistant_settings.json"
+
 class DeepSeekWorker(QThread):
     response_received = pyqtSignal(str, str)
+    chunk_received = pyqtSignal(str, str)  # content delta while streaming
     error_occurred = pyqtSignal(str)
     
-    def __init__(self, api_key, messages, model="deepseek-chat", conversation_id=None):
+    def __init__(self, api_key, messages, model="deepseek-chat", conversation_id=None, max_tokens=4000,
+                 stream=False, cache=None, provider=None):
         super().__init__()
         self.api_key = api_key
         self.messages = messages
         self.model = model
         self.conversation_id = conversation_id
-        self.url = "https://api.deepseek.com/v1/chat/completions"
+        self.max_tokens = max_tokens
+        self.temperature = 0.7
+        self.stream = stream
+        self.cache = cache  # ResponseCache, or None to always call the API
+        self.provider = provider or PROVIDERS["deepseek"]
+        self.streamed = False
+        self.cancelled = False
+        # A session of its own rather than the provider's shared one, so cancel() can close it
+        self.session = requests.Session()
+        self.response = None
+        
+    def cancel(self):
+        """Abort the request from another thread; closing the connection ends a blocked read"""
+        self.cancelled = True
+        if self.response is not None:
+            self.response.close()
+        self.session.close()
         
     def run(self):
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        stream = self.stream and self.provider.streaming
+        payload = self.provider.codec.encode(self.model, self.messages, self.temperature, self.max_tokens, stream)
         
-        payload = {
-            "model": self.model,
-            "messages": self.messages,
-            "temperature": 0.7,
-            "max_tokens": 4000
-        }
+        if self.cache is not None:
+            cached = self.cache.get(self.model, self.messages, self.temperature, self.provider.url)
+            if cached is not None:
+                self.response_received.emit(cached, self.conversation_id)
+                return
         
         for attempt in range(3):
+            if self.cancelled:
+                return
             try:
-                response = requests.post(self.url, headers=headers, json=payload, timeout=60)
-                if response.status_code == 200:
-                    result = response.json()
-                    self.response_received.emit(result['choices'][0]['message']['content'], self.conversation_id)
-                    return
+                response = self.response = self.provider.post(self.api_key, self.model, payload, stream=stream,
+                                                              session=self.session)
+                if stream:
+                    content = self.read_stream(response)
                 else:
-                    if attempt == 2:
-                        self.error_occurred.emit(f"API Error: {response.status_code} - {response.text}")
-                    continue
+                    content = self.provider.codec.decode(response.json())
+                if not self.cancelled:
+                    if self.cache is not None:
+                        self.cache.put(self.model, self.messages, self.temperature, content, self.provider.url)
+                    self.response_received.emit(content, self.conversation_id)
+                return
                     
-            except requests.exceptions.Timeout:
+            except ProviderError as e:
+                if self.cancelled:
+                    return
                 if attempt == 2:
-                    self.error_occurred.emit("Request timed out after 3 attempts.")
+                    self.error_occurred.emit(str(e))
+                continue
+                    
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if self.cancelled:
+                    return
+                if not is_timeout(e):
+                    self.error_occurred.emit(f"Request failed: {str(e)}")
+                    return
+                # Retrying after part of the answer was streamed would repeat it
+                if attempt == 2 or self.streamed:
+                    self.error_occurred.emit("Request timed out after 3 attempts." if attempt == 2 else
+                                             "Request timed out while streaming the response.")
+                    return
                 continue
                 
             except Exception as e:
-                self.error_occurred.emit(f"Request failed: {str(e)}")
+                # A cancelled request fails on its closed connection; that is not an error
+                if not self.cancelled:
+                    self.error_occurred.emit(f"Request failed: {str(e)}")
                 return
 
+    def read_stream(self, response):
+        """Emit content deltas from a server-sent event stream; returns the full text"""
+        parts = []
+        for delta in self.provider.iter_deltas(response):
+            if self.cancelled:
+                break
+            parts.append(delta)
+            self.streamed = True
+            self.chunk_received.emit(delta, self.conversation_id)
+        return "".join(parts)
+
+class MarkdownWorker(QThread):
+    """Renders one markdown document off the GUI thread"""
+    rendered = pyqtSignal(str, str)  # cache key, html
+
+    def __init__(self, key, text):
+        super().__init__()
+        self.key = key
+        self.text = text
+
+    def run(self):
+        self.rendered.emit(self.key, markdown.markdown(self.text))
+
+class MarkdownCache:
+    """Rendered HTML of markdown text keyed by a hash of the text, least recently used evicted first.
+
+    Complete responses are rendered by MarkdownWorker threads. While a response
+    streams in, only its completed blocks (paragraphs, lists, closed code
+    fences) are rendered, each exactly once; the unfinished tail is shown as text.
+    """
+
+    MAX_ENTRIES = 256
+    FENCE_RE = re.compile(r"^\s*(```|~~~)")
+
+    def __init__(self):
+        self.entries = {}
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        rendered = self.entries.pop(key, None)
+        if rendered is not None:
+            self.entries[key] = rendered
+        return rendered
+
+    def put(self, key, rendered):
+        self.entries.pop(key, None)
+        if len(self.entries) >= self.MAX_ENTRIES:
+            self.entries.pop(next(iter(self.entries)))
+        self.entries[key] = rendered
+
+    def render(self, text):
+        """Render synchronously; meant for single blocks, which are small"""
+        key = self.key(text)
+        rendered = self.get(key)
+        if rendered is None:
+            rendered = markdown.markdown(text)
+            self.put(key, rendered)
+        return rendered
+
+    @classmethod
+    def split_blocks(cls, text):
+        """Completed blocks at the start of streamed text and the number of characters they span"""
+        blocks = []
+        start = offset = 0
+        in_fence = False
+        for line in text.splitlines(keepends=True):
+            if not line.endswith("\n"):
+                break  # the last line is still being streamed
+            offset += len(line)
+            if cls.FENCE_RE.match(line):
+                in_fence = not in_fence
+                if in_fence:
+                    continue
+            elif in_fence or line.strip():
+                continue
+            # A blank line or closing fence ends the current block
+            if text[start:offset].strip():
+                blocks.append(text[start:offset])
+            start = offset
+        return blocks, start
+
+class ChatRequest:
+    """A prompt for one conversation, queued or waiting for its response"""
+
+    def __init__(self, conversation_id, prompt, system_messages, include_history=True, priority=0,
+                 use_cache=False):
+        self.conversation_id = conversation_id
+        self.prompt = prompt
+        self.system_messages = system_messages
+        self.include_history = include_history
+        self.priority = priority
+        self.use_cache = use_cache
+        self.worker = None
+        self.cancelled = False
+        # Streamed response received so far and its rendered blocks
+        self.stream_text = ""
+        self.stream_offset = 0
+        self.stream_blocks = []
+
+class RequestScheduler(QObject):
+    """Runs chat requests, at most one at a time per conversation.
+
+    Requests for different conversations run in parallel up to max_running.
+    Queued requests start in priority order (lower first), then in submit
+    order. A follow-up to a busy conversation waits for the running request,
+    so it is packed with that response already in its history.
+    """
+    queue_changed = pyqtSignal()
+
+    PRIORITY_INTERACTIVE = 0
+    PRIORITY_BACKGROUND = 1
+
+    def __init__(self, start_request, max_running=3, parent=None):
+        super().__init__(parent)
+        self.start_request = start_request  # callable(request) returning its started worker
+        self.max_running = max_running
+        self.queue = []  # heap of (priority, sequence, request)
+        self.running = {}  # conversation_id -> request
+        self.sequence = itertools.count()
+        self.workers = []  # keep workers referenced until their threads finish
+
+    def submit(self, request):
+        heapq.heappush(self.queue, (request.priority, next(self.sequence), request))
+        self.dispatch()
+
+    def dispatch(self):
+        self.workers = [worker for worker in self.workers if not worker.isFinished()]
+        blocked = []
+        while self.queue and len(self.running) < self.max_running:
+            entry = heapq.heappop(self.queue)
+            request = entry[2]
+            if request.conversation_id in self.running:
+                blocked.append(entry)
+                continue
+            self.running[request.conversation_id] = request
+            request.worker = self.start_request(request)
+            self.workers.append(request.worker)
+        for entry in blocked:
+            heapq.heappush(self.queue, entry)
+        self.queue_changed.emit()
+
+    def finish(self, request):
+        if self.running.get(request.conversation_id) is request:
+            del self.running[request.conversation_id]
+        self.dispatch()
+
+    def cancel(self, conversation_id):
+        """Abort the conversation's running request and drop its queued ones; returns how many"""
+        cancelled = [entry[2] for entry in self.queue if entry[2].conversation_id == conversation_id]
+        self.queue = [entry for entry in self.queue if entry[2].conversation_id != conversation_id]
+        heapq.heapify(self.queue)
+        running = self.running.pop(conversation_id, None)
+        if running is not None:
+            running.worker.cancel()
+            cancelled.append(running)
+        for request in cancelled:
+            request.cancelled = True
+        self.dispatch()
+        return len(cancelled)
+
+    def is_busy(self, conversation_id):
+        return conversation_id in self.running
+
+    def queued(self, conversation_id=None):
+        return sum(1 for entry in self.queue
+                   if conversation_id is None or entry[2].conversation_id == conversation_id)
+
 class WordPressHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -163,20 +393,1300 @@ class ContextSelector(QWidget):
         
         self.setLayout(layout)
 
+    def selection_key(self):
+        """Tuple describing which context checkboxes are ticked"""
+        return (
+            self.project_structure_cb.isChecked(),
+            self.php_files_cb.isChecked(),
+            self.js_files_cb.isChecked(),
+            self.css_files_cb.isChecked(),
+            self.config_files_cb.isChecked(),
+            self.current_file_cb.isChecked(),
+        )
+
+class TokenCounter:
+    """Token counting with a lazily loaded encoder and cached results.
+
+    Counts for message dicts are stored on the message itself under "tokens"
+    so each message is encoded once; ContextPacker.api_messages() removes the
+    key again before messages are sent to the API. Free text (e.g. system
+    prompts that are rebuilt for every request) is memoized in a small LRU cache.
+    """
+
+    CACHE_SIZE = 256
+    MESSAGE_OVERHEAD = 4  # role and separator tokens added by the chat format
+
+    def __init__(self, encoding_name="cl100k_base"):
+        self.encoding_name = encoding_name
+        self._encoder = None
+        self.cache = {}
+
+    @property
+    def encoder(self):
+        if self._encoder is None:
+            try:
+                self._encoder = tiktoken.get_encoding(self.encoding_name)
+            except Exception:
+                # Encoding files could not be loaded (e.g. offline first run): approximate
+                self._encoder = False
+        return self._encoder
+
+    def count(self, text, remember=True):
+        if not text:
+            return 0
+        tokens = self.cache.pop(text, None)
+        if tokens is None:
+            encoder = self.encoder
+            tokens = len(encoder.encode(text)) if encoder else len(text) // 4
+            if not remember:
+                return tokens
+            if len(self.cache) >= self.CACHE_SIZE:
+                self.cache.pop(next(iter(self.cache)))
+        self.cache[text] = tokens
+        return tokens
+
+    def message_tokens(self, message):
+        """Token count of a chat message, computed once and kept on the message"""
+        tokens = message.get("tokens")
+        if tokens is None:
+            tokens = self.count(message.get("content", "")) + self.MESSAGE_OVERHEAD
+            message["tokens"] = tokens
+        return tokens
+
+class ContextPacker:
+    """Budget-aware assembly of the messages sent for one conversation turn.
+
+    Pinned system messages (such as the project context added when a project
+    is loaded) are kept apart from the turn history so they are never evicted.
+    History is stored as (user, assistant) pairs, so trimming can never break
+    role order, with prefix sums of their token counts: adding a turn is O(1)
+    and finding how many recent turns fit the budget is a binary search. An
+    optional summary message stands in for turns that no longer fit; its
+    "covers" field records how many leading turns it replaces.
+    """
+
+    def __init__(self, token_counter):
+        self.token_counter = token_counter
+        self.pinned = []
+        self.summary = None
+        self.turns = []
+        self.prefix = [0]  # prefix[i] = tokens of turns[:i]
+        self.first_included = 0
+
+    @classmethod
+    def from_messages(cls, messages, token_counter):
+        """Rebuild a packer from a stored conversation message list"""
+        packer = cls(token_counter)
+        pending_user = None
+        for message in messages:
+            role = message.get("role")
+            if role == "system":
+                if message.get("kind") == "summary":
+                    packer.summary = message
+                else:
+                    packer.pinned.append(message)
+            elif role == "user":
+                pending_user = message
+            elif role == "assistant" and pending_user is not None:
+                packer.add_turn(pending_user, message)
+                pending_user = None
+        return packer
+
+    def pin(self, message):
+        self.pinned.append(message)
+
+    def summarized_until(self):
+        return self.summary.get("covers", 0) if self.summary else 0
+
+    def unpin_kind(self, kind):
+        """Remove pinned messages of one kind; returns the removed messages"""
+        removed = [message for message in self.pinned if message.get("kind") == kind]
+        self.pinned = [message for message in self.pinned if message.get("kind") != kind]
+        return removed
+
+    def add_turn(self, user_message, assistant_message):
+        tokens = (self.token_counter.message_tokens(user_message) +
+                  self.token_counter.message_tokens(assistant_message))
+        self.turns.append((user_message, assistant_message))
+        self.prefix.append(self.prefix[-1] + tokens)
+        return tokens
+
+    def history_tokens(self, first=0):
+        return self.prefix[-1] - self.prefix[first]
+
+    def pack(self, request_messages, budget, reserve=0, include_history=True, exclude_kinds=()):
+        """Assemble system, pinned, summary, recent turns and the request messages.
+
+        request_messages are this request's system messages followed by the new
+        user message. The most recent turns that fit in budget - reserve are kept.
+        Returns (messages, tokens).
+        """
+        count = self.token_counter.message_tokens
+        pinned = [message for message in self.pinned if message.get("kind") not in exclude_kinds]
+        summary = self.summary if include_history else None
+        fixed = sum(count(message) for message in request_messages + pinned)
+        if summary:
+            fixed += count(summary)
+
+        first = len(self.turns)
+        available = budget - reserve - fixed
+        if include_history and available > 0:
+            first = bisect.bisect_left(self.prefix, self.prefix[-1] - available)
+        self.first_included = min(first, len(self.turns))
+        if summary:
+            # Turns folded into the summary are not repeated verbatim
+            first = max(self.first_included, self.summarized_until())
+        else:
+            first = self.first_included
+
+        system = [message for message in request_messages if message["role"] == "system"]
+        request = [message for message in request_messages if message["role"] != "system"]
+        history = [message for turn in self.turns[first:] for message in turn]
+        messages = system + pinned + ([summary] if summary else []) + history + request
+        return messages, fixed + self.history_tokens(first)
+
+    @staticmethod
+    def api_messages(messages):
+        """Copies of messages with only the fields the chat API accepts"""
+        return [{"role": message["role"], "content": message["content"]} for message in messages]
+
+class FileReader:
+    """Bounded, streaming reads of project files"""
+
+    SNIFF_BYTES = 8192
+    MAX_BYTES = 256 * 1024
+    COUNT_LINES_LIMIT = 8 * 1024 * 1024  # only count lines in files smaller than this
+
+    @staticmethod
+    def is_binary(file_path):
+        """Treat files containing NUL bytes in their first block as binary"""
+        with open(file_path, 'rb') as f:
+            return b'\0' in f.read(FileReader.SNIFF_BYTES)
+
+    @staticmethod
+    def read_head(file_path, max_lines=100, max_bytes=MAX_BYTES):
+        """Read at most max_lines lines / max_bytes bytes from the start of a file.
+
+        Returns (text, truncated). Long single lines such as minified JS are cut
+        at max_bytes instead of being read whole.
+        """
+        lines = []
+        remaining = max_bytes
+        truncated = False
+        with open(file_path, 'rb') as f:
+            while True:
+                if len(lines) >= max_lines or remaining <= 0:
+                    truncated = bool(f.read(1))
+                    break
+                line = f.readline(remaining)
+                if not line:
+                    break
+                remaining -= len(line)
+                lines.append(line)
+        text = b''.join(lines).decode('utf-8', errors='ignore')
+        return text.rstrip('\n') if truncated else text, truncated
+
+    @staticmethod
+    def count_lines(file_path):
+        """Count lines by scanning raw blocks; returns None for very large files"""
+        size = os.path.getsize(file_path)
+        if size > FileReader.COUNT_LINES_LIMIT:
+            return None
+        count = 0
+        last = b''
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                count += block.count(b'\n')
+                last = block
+        return count + (1 if last and not last.endswith(b'\n') else 0)
+
+class DocumentLoader(QThread):
+    """Reads selected documents on a thread pool.
+
+    Binary files are skipped and each file is capped at MAX_FILE_BYTES. The
+    whole selection must fit in byte_budget, which is reserved from the file
+    size before a file is read so large selections cannot balloon memory.
+    """
+    document_loaded = pyqtSignal(str, str, int)  # path, content, bytes reserved
+    document_skipped = pyqtSignal(str, str)  # path, reason
+    progress = pyqtSignal(int, int)  # done, total
+
+    MAX_FILE_BYTES = 2 * 1024 * 1024
+    MAX_WORKERS = 8
+
+    def __init__(self, file_paths, byte_budget):
+        super().__init__()
+        self.file_paths = file_paths
+        self.byte_budget = byte_budget
+        self.lock = threading.Lock()
+
+    def reserve(self, size):
+        with self.lock:
+            if size > self.byte_budget:
+                return False
+            self.byte_budget -= size
+            return True
+
+    def load(self, path):
+        if FileReader.is_binary(path):
+            return None, "binary file"
+        size = min(os.path.getsize(path), self.MAX_FILE_BYTES)
+        if not self.reserve(size):
+            return None, "memory limit for loaded files reached"
+        text, truncated = FileReader.read_head(path, max_lines=sys.maxsize, max_bytes=self.MAX_FILE_BYTES)
+        if truncated:
+            text += f"\n\n[Truncated at {self.MAX_FILE_BYTES // (1024 * 1024)} MB]"
+        return text, size
+
+    def run(self):
+        total = len(self.file_paths)
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, total)) as pool:
+            futures = {pool.submit(self.load, path): path for path in self.file_paths}
+            for done, future in enumerate(as_completed(futures), 1):
+                path = futures[future]
+                try:
+                    text, info = future.result()
+                except OSError as e:
+                    self.document_skipped.emit(path, str(e))
+                else:
+                    if text is None:
+                        self.document_skipped.emit(path, info)
+                    else:
+                        self.document_loaded.emit(path, text, info)
+                self.progress.emit(done, total)
+
+class ProjectContextCache:
+    """Memoizes rendered file sections and assembled project context prompts.
+
+    Sections are keyed by file path and render kind (the same file is shown
+    differently as the current file and in a category listing) and remember
+    the (mtime, size) signature they were rendered from. Assembled prompts are keyed by the checkbox
+    selection and remember which files they include, so a follow-up question
+    with an unchanged selection is served without touching the disk. Line
+    counts of truncated files are kept with their signature, so clicking a
+    large file again costs a stat instead of a scan. Entries
+    are dropped through invalidate() when the file watcher reports a change.
+    """
+
+    MAX_PROMPTS = 32
+    MAX_LINE_COUNTS = 4096
+
+    def __init__(self):
+        self.sections = {}  # path -> {render kind: (signature, rendered section)}
+        self.prompts = {}   # key -> (prompt, tokens, paths)
+        self.line_counts = {}  # path -> (signature, line count)
+
+    @staticmethod
+    def file_signature(path):
+        try:
+            stat = os.stat(path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def get_section(self, path, kind, render):
+        """Return the cached rendering of path as kind, rendering it on first use"""
+        renderings = self.sections.setdefault(path, {})
+        cached = renderings.get(kind)
+        if cached is None:
+            cached = (self.file_signature(path), render(path))
+            renderings[kind] = cached
+        return cached[1]
+
+    def signature(self, path):
+        """The signature path was rendered from, or None if nothing (or nothing consistent) is cached"""
+        signatures = {signature for signature, _ in self.sections.get(path, {}).values()}
+        return signatures.pop() if len(signatures) == 1 else None
+
+    def line_count(self, path):
+        """FileReader.count_lines, rescanning the file only after its signature changed"""
+        signature = self.file_signature(path)
+        cached = self.line_counts.get(path)
+        if cached is None or cached[0] != signature:
+            cached = (signature, FileReader.count_lines(path))
+            if path not in self.line_counts and len(self.line_counts) >= self.MAX_LINE_COUNTS:
+                self.line_counts.pop(next(iter(self.line_counts)))
+            self.line_counts[path] = cached
+        return cached[1]
+
+    def get_prompt(self, key):
+        return self.prompts.get(key)
+
+    def store_prompt(self, key, prompt, tokens, paths):
+        if len(self.prompts) >= self.MAX_PROMPTS:
+            self.prompts.pop(next(iter(self.prompts)))
+        self.prompts[key] = (prompt, tokens, frozenset(paths))
+
+    def invalidate(self, path=None):
+        """Drop cached data for one file, or everything when path is None"""
+        if path is None:
+            self.sections.clear()
+            self.prompts.clear()
+            self.line_counts.clear()
+            return
+        self.sections.pop(path, None)
+        self.line_counts.pop(path, None)
+        self.prompts = {key: value for key, value in self.prompts.items() if path not in value[2]}
+
+class SymbolChunker:
+    """Splits PHP and JavaScript files into functions, classes, hook call sites and templates.
+
+    Each chunk is a dict with start/end lines, text, a kind ("function",
+    "class", "template" or "block"), the symbol name where there is one and
+    the hook names registered inside it via add_action/add_filter (or
+    wp.hooks.addAction/addFilter in JavaScript).
+    """
+
+    MAX_CHUNK_LINES = 120
+    WINDOW_LINES = 40
+
+    PHP_FUNCTION_RE = re.compile(
+        r"^[ \t]*(?:(?:abstract|final|public|protected|private|static)\s+)*function\s+&?\s*([A-Za-z_]\w*)\s*\(",
+        re.MULTILINE)
+    PHP_CLASS_RE = re.compile(
+        r"^[ \t]*(?:(?:abstract|final|readonly)\s+)*(?:class|interface|trait|enum)\s+([A-Za-z_]\w*)",
+        re.MULTILINE)
+    JS_FUNCTION_RE = re.compile(
+        r"^[ \t]*(?:export\s+(?:default\s+)?)?(?:async\s+)?function\s*\*?\s*([A-Za-z_$][\w$]*)\s*\("
+        r"|^[ \t]*(?:export\s+)?(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*=\s*(?:async\s+)?"
+        r"(?:function\b|\([^)]*\)\s*=>|[A-Za-z_$][\w$]*\s*=>)",
+        re.MULTILINE)
+    JS_CLASS_RE = re.compile(
+        r"^[ \t]*(?:export\s+(?:default\s+)?)?class\s+([A-Za-z_$][\w$]*)",
+        re.MULTILINE)
+    HOOK_RE = re.compile(
+        r"\b(?:add_action|add_filter|addAction|addFilter)\s*\(\s*['\"]([^'\"]+)['\"]\s*,\s*"
+        r"(?:['\"]([A-Za-z_\\][\w\\:]*)['\"]|(?:array\s*\(|\[)\s*\$this\s*,\s*['\"](\w+)['\"])?")
+    TEMPLATE_RE = re.compile(r"\?>\s*<|get_header\s*\(|get_footer\s*\(|get_template_part\s*\(")
+
+    @classmethod
+    def chunk(cls, text, category):
+        if category == "php":
+            return cls.chunk_source(text, cls.PHP_FUNCTION_RE, cls.PHP_CLASS_RE, php=True)
+        if category == "js":
+            return cls.chunk_source(text, cls.JS_FUNCTION_RE, cls.JS_CLASS_RE, php=False)
+        return None
+
+    @staticmethod
+    def find_block_end(text, start, php):
+        """Index of the brace closing the first block opened at or after start, or -1.
+
+        Stops at a ';' before any '{' (abstract methods, arrow expressions).
+        Quoted strings and comments are skipped so braces inside them do not count.
+        """
+        depth = 0
+        i = start
+        length = len(text)
+        quotes = "'\"" if php else "'\"`"
+        while i < length:
+            ch = text[i]
+            if ch in quotes:
+                i += 1
+                while i < length and text[i] != ch:
+                    i += 2 if text[i] == '\\' else 1
+            elif text.startswith('//', i) or (php and ch == '#' and not text.startswith('#[', i)):
+                newline = text.find('\n', i)
+                i = length if newline == -1 else newline
+                continue
+            elif text.startswith('/*', i):
+                close = text.find('*/', i + 2)
+                i = length if close == -1 else close + 2
+                continue
+            elif ch == '{':
+                depth += 1
+            elif ch == '}':
+                depth -= 1
+                if depth == 0:
+                    return i
+            elif ch == ';' and depth == 0:
+                return -1
+            i += 1
+        return -1
+
+    @classmethod
+    def chunk_source(cls, text, function_re, class_re, php):
+        lines = text.split('\n')
+        line_starts = [0]
+        for line in lines[:-1]:
+            line_starts.append(line_starts[-1] + len(line) + 1)
+
+        def line_of(offset):
+            return bisect.bisect_right(line_starts, offset)  # 1-based
+
+        classes = []
+        for match in class_re.finditer(text):
+            end = cls.find_block_end(text, match.end(), php)
+            if end != -1:
+                classes.append((line_of(match.start()), line_of(end), match.group(1)))
+
+        functions = []
+        covered_until = 0
+        for match in function_re.finditer(text):
+            if match.start() < covered_until:
+                continue  # nested closure or inner function, part of the enclosing chunk
+            end = cls.find_block_end(text, match.end(), php)
+            first = line_of(match.start())
+            last = line_of(end) if end != -1 else first
+            name = next(group for group in match.groups() if group)
+            owner = next((c_name for c_start, c_end, c_name in classes if c_start <= first <= c_end), None)
+            functions.append((first, last, f"{owner}::{name}" if owner else name))
+            covered_until = end if end != -1 else match.end()
+
+        is_template = php and not functions and not classes and bool(cls.TEMPLATE_RE.search(text))
+        chunks = []
+        covered = set()
+        for first, last, name in functions:
+            chunks.extend(cls.window(lines, first, last, "function", name))
+            covered.update(range(first, last + 1))
+
+        # Everything outside function bodies: class headers/properties, top-level code, templates
+        def owner_of(number):
+            return next((c for c in classes if c[0] <= number <= c[1]), None)
+
+        run_start = None
+        run_owner = None
+        for number in range(1, len(lines) + 2):
+            outside = number <= len(lines) and number not in covered
+            owner = owner_of(number) if outside else None
+            if run_start is not None and (not outside or owner != run_owner):
+                if run_owner:
+                    kind, name = "class", run_owner[2]
+                else:
+                    kind, name = ("template" if is_template else "block"), None
+                chunks.extend(cls.window(lines, run_start, number - 1, kind, name))
+                run_start = None
+            if outside and run_start is None:
+                run_start, run_owner = number, owner
+
+        for chunk in chunks:
+            chunk["hooks"] = []
+            chunk["callbacks"] = []
+            for match in cls.HOOK_RE.finditer(chunk["text"]):
+                chunk["hooks"].append(match.group(1))
+                callback = match.group(2) or match.group(3)
+                if callback:
+                    chunk["callbacks"].append(callback.split('::')[-1].lstrip('\\'))
+        chunks.sort(key=lambda c: c["start"])
+        return [chunk for chunk in chunks if chunk["text"].strip()]
+
+    @classmethod
+    def window(cls, lines, first, last, kind, name):
+        """Emit lines first..last (1-based, inclusive), split when longer than MAX_CHUNK_LINES"""
+        size = cls.MAX_CHUNK_LINES if last - first + 1 > cls.MAX_CHUNK_LINES else last - first + 1
+        if kind in ("block", "template"):
+            size = min(size, cls.WINDOW_LINES)
+        chunks = []
+        for start in range(first, last + 1, max(size, 1)):
+            end = min(start + size - 1, last)
+            chunks.append({
+                "start": start, "end": end, "kind": kind, "name": name,
+                "text": '\n'.join(lines[start - 1:end])
+            })
+        return chunks
+
+class BM25Index:
+    """Incremental BM25 index over symbol-aware chunks of project files.
+
+    Files are re-chunked only when their (mtime, size) signature changes, and
+    document frequencies are adjusted as chunks are added or removed, so the
+    index follows the project without being rebuilt from scratch. PHP and JS
+    files are chunked by SymbolChunker, and inverted maps from hook names and
+    function names to chunks allow direct lookups such as "everything that
+    hooks init". The index can be saved to and loaded from disk.
+    """
+
+    VERSION = 1
+    K1 = 1.5
+    B = 0.75
+    CHUNK_LINES = 40
+    MAX_FILE_LINES = 4000
+    MAX_FILE_BYTES = 512 * 1024
+    TERM_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+    SPLIT_RE = re.compile(r"_+|(?<=[a-z0-9])(?=[A-Z])")
+    STOPWORDS = {
+        "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+        "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "should", "that",
+        "the", "this", "to", "what", "when", "where", "which", "why", "with", "you"
+    }
+
+    def __init__(self):
+        self.files = {}      # path -> (signature, [chunk ids], rel_path, category)
+        self.chunks = {}     # chunk id -> chunk dict
+        self.postings = {}   # term -> set of chunk ids
+        self.hooks = {}      # hook name -> set of chunk ids registering it
+        self.symbols = {}    # lower-cased function/class name -> set of chunk ids
+        self.truncated = set()  # paths indexed only up to MAX_FILE_LINES / MAX_FILE_BYTES
+        self.total_length = 0
+        self.next_id = 0
+
+    @classmethod
+    def tokenize(cls, text):
+        """Lower-cased identifiers plus their snake_case / camelCase parts"""
+        terms = []
+        for word in cls.TERM_RE.findall(text):
+            terms.append(word.lower())
+            parts = [part for part in cls.SPLIT_RE.split(word) if part]
+            if len(parts) > 1:
+                terms.extend(part.lower() for part in parts)
+        return terms
+
+    def chunk_text(self, text, rel_path, category):
+        """Split file text into chunk dicts (start, end, text, kind, name, hooks, callbacks)"""
+        chunks = SymbolChunker.chunk(text, category)
+        if chunks is not None:
+            return chunks
+        lines = text.split('\n')
+        chunks = []
+        for start in range(0, len(lines), self.CHUNK_LINES):
+            body = '\n'.join(lines[start:start + self.CHUNK_LINES])
+            if body.strip():
+                chunks.append({
+                    "start": start + 1, "end": min(start + self.CHUNK_LINES, len(lines)), "text": body,
+                    "kind": "block", "name": None, "hooks": [], "callbacks": []
+                })
+        return chunks
+
+    def sync(self, files, remove_missing=True):
+        """Bring the index in line with files, an iterable of (path, rel_path, category).
+
+        Indexed files not listed are removed unless remove_missing is False.
+        Returns the paths that were re-chunked or removed.
+        """
+        seen = set()
+        changed = []
+        for path, rel_path, category in files:
+            seen.add(path)
+            current = self.files.get(path)
+            if current and current[0] == ProjectContextCache.file_signature(path):
+                continue
+            self.refresh_file(path, rel_path, category)
+            changed.append(path)
+        if not remove_missing:
+            return changed
+        for path in [path for path in self.files if path not in seen]:
+            self.remove_file(path)
+            changed.append(path)
+        return changed
+
+    def refresh_file(self, path, rel_path, category):
+        self.remove_file(path)
+        signature = ProjectContextCache.file_signature(path)
+        if signature is None:
+            return
+        try:
+            if FileReader.is_binary(path):
+                self.files[path] = (signature, [], rel_path, category)
+                return
+            text, truncated = FileReader.read_head(path, self.MAX_FILE_LINES, self.MAX_FILE_BYTES)
+        except OSError:
+            return
+        self.add_chunks(path, rel_path, category, signature, self.chunk_text(text, rel_path, category))
+        if truncated:
+            self.truncated.add(path)
+
+    def add_chunks(self, path, rel_path, category, signature, chunks):
+        chunk_ids = []
+        for chunk in chunks:
+            term_freq = Counter(self.tokenize(chunk["text"] + ' ' + rel_path))
+            chunk_id = self.next_id
+            self.next_id += 1
+            self.chunks[chunk_id] = dict(
+                chunk, path=path, rel_path=rel_path, category=category,
+                tf=term_freq, length=sum(term_freq.values()), tokens=None
+            )
+            for term in term_freq:
+                self.postings.setdefault(term, set()).add(chunk_id)
+            for hook in chunk["hooks"]:
+                self.hooks.setdefault(hook, set()).add(chunk_id)
+            for name in self.symbol_names(chunk):
+                self.symbols.setdefault(name, set()).add(chunk_id)
+            self.total_length += self.chunks[chunk_id]["length"]
+            chunk_ids.append(chunk_id)
+        self.files[path] = (signature, chunk_ids, rel_path, category)
+
+    @staticmethod
+    def symbol_names(chunk):
+        """Names a chunk is reachable by: "Class::method" is indexed as both parts"""
+        if not chunk["name"] or chunk["kind"] not in ("function", "class"):
+            return set()
+        name = chunk["name"].lower()
+        return {name, name.split('::')[-1]}
+
+    def refresh_path(self, path):
+        """Re-chunk an already indexed file after it changed on disk"""
+        entry = self.files.get(path)
+        if entry:
+            self.refresh_file(path, entry[2], entry[3])
+
+    def remove_file(self, path):
+        self.truncated.discard(path)
+        entry = self.files.pop(path, None)
+        if not entry:
+            return
+        for chunk_id in entry[1]:
+            chunk = self.chunks.pop(chunk_id)
+            self.total_length -= chunk["length"]
+            for term in chunk["tf"]:
+                self.discard(self.postings, term, chunk_id)
+            for hook in chunk["hooks"]:
+                self.discard(self.hooks, hook, chunk_id)
+            for name in self.symbol_names(chunk):
+                self.discard(self.symbols, name, chunk_id)
+
+    @staticmethod
+    def discard(mapping, key, chunk_id):
+        ids = mapping.get(key)
+        if ids is not None:
+            ids.discard(chunk_id)
+            if not ids:
+                del mapping[key]
+
+    def lookup_hook(self, hook):
+        """Chunks registering hook, followed by the callbacks they register"""
+        found = []
+        for chunk_id in sorted(self.hooks.get(hook, ())):
+            chunk = self.chunks[chunk_id]
+            found.append(chunk)
+            for registered, callback in zip(chunk["hooks"], chunk["callbacks"]):
+                if registered == hook:
+                    found.extend(self.lookup_symbol(callback))
+        return found
+
+    def lookup_symbol(self, name):
+        return [self.chunks[chunk_id] for chunk_id in sorted(self.symbols.get(name.lower(), ()))]
+
+    def lookup(self, query, categories=None):
+        """Chunks for hook and function names mentioned verbatim in query"""
+        found = []
+        seen = set()
+        for word in set(re.findall(r"[A-Za-z_][\w.:/-]*[\w]", query)):
+            for chunk in self.lookup_hook(word) + self.lookup_symbol(word):
+                key = (chunk["path"], chunk["start"])
+                if key not in seen and (categories is None or chunk["category"] in categories):
+                    seen.add(key)
+                    found.append(chunk)
+        return found
+
+    def search(self, query, categories=None):
+        """Return (score, chunk) pairs for query, best first"""
+        if not self.chunks:
+            return []
+        terms = set(self.tokenize(query)) - self.STOPWORDS
+        total = len(self.chunks)
+        avg_length = self.total_length / total if total else 1
+        scores = Counter()
+        for term in terms:
+            ids = self.postings.get(term)
+            if not ids:
+                continue
+            idf = math.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+            for chunk_id in ids:
+                chunk = self.chunks[chunk_id]
+                if categories is not None and chunk["category"] not in categories:
+                    continue
+                freq = chunk["tf"][term]
+                norm = self.K1 * (1 - self.B + self.B * chunk["length"] / avg_length)
+                scores[chunk_id] += idf * freq * (self.K1 + 1) / (freq + norm)
+        return [(score, self.chunks[chunk_id]) for chunk_id, score in scores.most_common()]
+
+    def select(self, query, categories, token_budget, count_tokens):
+        """Pick exact hook/symbol matches first, then the highest ranked chunks, within token_budget"""
+        selected = []
+        seen = set()
+        used = 0
+        candidates = self.lookup(query, categories) + [chunk for _, chunk in self.search(query, categories)]
+        for chunk in candidates:
+            key = (chunk["path"], chunk["start"])
+            if key in seen:
+                continue
+            if chunk["tokens"] is None:
+                chunk["tokens"] = count_tokens(chunk["text"]) + 20  # header and fences
+            if used + chunk["tokens"] > token_budget:
+                continue
+            seen.add(key)
+            selected.append(chunk)
+            used += chunk["tokens"]
+        return selected
+
+    def hook_overview(self, limit=60):
+        """One line per registered hook listing where it is hooked, most used first"""
+        lines = []
+        for hook, ids in sorted(self.hooks.items(), key=lambda item: (-len(item[1]), item[0]))[:limit]:
+            sites = []
+            for chunk_id in sorted(ids):
+                chunk = self.chunks[chunk_id]
+                callbacks = [cb for registered, cb in zip(chunk["hooks"], chunk["callbacks"]) if registered == hook]
+                site = f"{chunk['rel_path']}:{chunk['start']}"
+                sites.append(f"{site} -> {', '.join(callbacks)}" if callbacks else site)
+            lines.append(f"- `{hook}`: {'; '.join(sites)}")
+        return lines
+
+    def snapshot(self):
+        """Copy of the file and chunk tables, to sync and save off the GUI thread.
+
+        Chunk dicts are shared rather than copied, as nothing but their token
+        count changes once they are indexed. Term statistics are left out, so
+        the copy cannot be searched.
+        """
+        copy = BM25Index()
+        copy.files = dict(self.files)
+        copy.chunks = dict(self.chunks)
+        copy.truncated = set(self.truncated)
+        copy.next_id = self.next_id
+        return copy
+
+    def save(self, index_path):
+        """Write chunk metadata and text to disk; term statistics are rebuilt on load"""
+        data = {"version": self.VERSION, "files": {}}
+        for path, (signature, chunk_ids, rel_path, category) in self.files.items():
+            data["files"][path] = {
+                "signature": list(signature), "rel_path": rel_path, "category": category,
+                "truncated": path in self.truncated,
+                "chunks": [
+                    {key: self.chunks[chunk_id][key]
+                     for key in ("start", "end", "text", "kind", "name", "hooks", "callbacks")}
+                    for chunk_id in chunk_ids
+                ]
+            }
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        temp_path = index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(temp_path, index_path)
+
+    def load(self, index_path):
+        """Replace the index contents with a saved index; returns False if none is usable"""
+        self.__init__()
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != self.VERSION:
+            return False
+        for path, entry in data["files"].items():
+            self.add_chunks(path, entry["rel_path"], entry["category"], tuple(entry["signature"]), entry["chunks"])
+            if entry.get("truncated"):
+                self.truncated.add(path)
+        return True
+
+class RetrievalIndexBuilder(QThread):
+    """Brings a project's chunk index up to date with the disk off the GUI thread.
+
+    Without a base index, the index saved in an earlier session is loaded and
+    synced. With one (a BM25Index.snapshot() of the open index), the snapshot
+    is synced instead, for the GUI to copy the changed files from. Either way
+    the result is saved here, so the GUI thread never stats the whole project
+    or writes the index file.
+    """
+    index_ready = pyqtSignal(str, object, object)  # project path, BM25Index, paths re-indexed or removed
+
+    def __init__(self, project_path, index_path, files, base=None, remove_missing=True, save=False, parent=None):
+        super().__init__(parent)
+        self.project_path = project_path
+        self.index_path = index_path
+        self.files = files
+        self.base = base
+        self.remove_missing = remove_missing
+        self.save = save  # the base has changes that were never saved
+
+    def run(self):
+        index = self.base
+        if index is None:
+            index = BM25Index()
+            index.load(self.index_path)
+        changed = index.sync(self.files, self.remove_missing)
+        if changed or self.save:
+            try:
+                index.save(self.index_path)
+            except OSError:
+                pass  # rebuilt from the files next session
+        self.index_ready.emit(self.project_path, index, changed)
+
+class ProjectAudit:
+    """Saved progress of a map-reduce evaluation of a whole project.
+
+    Small files are packed together into token-bounded batches, and files
+    over the token budget are split into parts along their chunks. Each batch
+    is reviewed on its own (map) and the partial findings are merged into one
+    report (reduce). Findings are saved after every batch, keyed by the files
+    in it and hashes of their contents, so an interrupted audit resumes where
+    it stopped, and editing one file only sends its batch for review again.
+    """
+
+    VERSION = 3
+    ANCHOR_EVERY = 8  # about one file in this many may close a half-full batch
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self.findings = {}  # batch key -> findings text
+        self.lock = threading.Lock()
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == self.VERSION:
+                self.findings = data["findings"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    @staticmethod
+    def digest(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def batch_key(batch):
+        """Hash of the sorted (file, content hash) pairs of a batch's chunks"""
+        texts = {}
+        for chunk in batch:
+            texts.setdefault(chunk["rel_path"], []).append(chunk["text"])
+        pairs = []
+        for rel_path, parts in sorted(texts.items()):
+            content = "\n".join(parts)
+            pairs.append(f"{rel_path}:{ProjectAudit.digest(content)}")
+        return ProjectAudit.digest("\n".join(pairs))
+
+    @staticmethod
+    def make_batches(chunks, batch_tokens, count_tokens):
+        """Pack chunks, ordered by file and line, into lists of at most batch_tokens.
+
+        Files are kept whole where they fit. A file whose path hashes to an
+        anchor also ends a batch that is at least half full, so a file that
+        grows or shrinks moves batch boundaries only up to the next anchor
+        instead of through the rest of the project.
+        """
+        files = {}
+        for chunk in sorted(chunks, key=lambda c: (c["rel_path"], c["start"])):
+            if chunk["tokens"] is None:
+                chunk["tokens"] = count_tokens(chunk["text"]) + 20  # header and fences
+            files.setdefault(chunk["rel_path"], []).append(chunk)
+
+        batches = []
+        current = []
+        used = 0
+        for rel_path, file_chunks in files.items():
+            size = sum(chunk["tokens"] for chunk in file_chunks)
+            if current and used + size > batch_tokens:
+                batches.append(current)
+                current = []
+                used = 0
+            if size > batch_tokens:
+                # Too large for any batch: split along chunks into parts of its own
+                for chunk in file_chunks:
+                    if current and used + chunk["tokens"] > batch_tokens:
+                        batches.append(current)
+                        current = []
+                        used = 0
+                    current.append(chunk)
+                    used += chunk["tokens"]
+                batches.append(current)
+                current = []
+                used = 0
+                continue
+            current.extend(file_chunks)
+            used += size
+            if used * 2 >= batch_tokens and int(ProjectAudit.digest(rel_path), 16) % ProjectAudit.ANCHOR_EVERY == 0:
+                batches.append(current)
+                current = []
+                used = 0
+        if current:
+            batches.append(current)
+        return batches
+
+    def record(self, key, findings):
+        """Store one batch's findings and write the state to disk"""
+        with self.lock:
+            self.findings[key] = findings
+            self.save()
+
+    def prune(self, keys):
+        """Forget findings of batches that are no longer part of the project"""
+        with self.lock:
+            self.findings = {key: self.findings[key] for key in keys if key in self.findings}
+            self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.VERSION, "findings": self.findings}, f)
+        os.replace(temp_path, self.state_path)
+
+class AuditWorker(QThread):
+    """Runs a ProjectAudit: reviews pending batches in parallel, then reduces the findings"""
+    progress = pyqtSignal(int, int)  # batches reviewed, total
+    report_ready = pyqtSignal(str)
+    error_occurred = pyqtSignal(str)
+
+    MAP_PROMPT = """
+    You are auditing one part of a WordPress project; other parts are reviewed separately.
+    List concrete problems in the code below as bullets of the form
+    `file:line - [security|performance|standards|quality|architecture] problem - suggested fix`.
+    Only report what the code shows. Reply "No issues found." if there are none.
+    """
+    REDUCE_PROMPT = """
+    You are given findings from reviews of every part of a WordPress project.
+    Merge them into one evaluation report with sections for Code Quality, WordPress Standards,
+    Security, Performance and Architecture. Deduplicate repeated findings, keep file references,
+    order each section by severity and give actionable recommendations with short code examples.
+    """
+    MERGE_PROMPT = """
+    Merge these WordPress project review findings into one deduplicated bullet list.
+    Keep every distinct problem with its file reference and category; drop repetition.
+    """
+
+    def __init__(self, api_key, audit, batches, parallelism, reduce_tokens, count_tokens, model="deepseek-coder",
+                 provider=None):
+        super().__init__()
+        self.api_key = api_key
+        self.audit = audit
+        self.batches = batches  # (ProjectAudit.batch_key, rendered batch text) pairs
+        self.parallelism = parallelism
+        self.reduce_tokens = reduce_tokens
+        self.count_tokens = count_tokens
+        self.model = model
+        self.cancelled = False
+        self.provider = provider or PROVIDERS["deepseek"]
+
+    def cancel(self):
+        self.cancelled = True
+
+    def complete(self, instructions, content, max_tokens):
+        """One blocking chat completion, retried with backoff on timeouts, rate limits and server errors"""
+        messages = [{"role": "system", "content": instructions}, {"role": "user", "content": content}]
+        for attempt in range(3):
+            try:
+                return self.provider.complete(self.api_key, self.model, messages, 0.3, max_tokens)
+            except (requests.exceptions.Timeout, ProviderError) as e:
+                status = getattr(e, "status", None)
+                # Bad requests, rejected keys and unknown models fail the same way every time
+                if attempt == 2 or (status is not None and status < 500 and status != 429):
+                    raise
+                time.sleep((10 if status == 429 else 2) * 2 ** attempt)
+
+    def run(self):
+        keys = [key for key, _ in self.batches]
+        total = len(keys)
+        pending = [(key, batch) for key, batch in self.batches if key not in self.audit.findings]
+        done = total - len(pending)
+        failures = []
+        self.progress.emit(done, total)
+
+        with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+            futures = {
+                pool.submit(self.complete, self.MAP_PROMPT, f"Part {index + 1} of {total}:\n{batch}", 1200): key
+                for index, (key, batch) in enumerate(pending)
+            }
+            for future in as_completed(futures):
+                if self.cancelled:
+                    for queued in futures:
+                        queued.cancel()
+                    return
+                try:
+                    self.audit.record(futures[future], future.result())
+                    done += 1
+                    self.progress.emit(done, total)
+                except Exception as e:
+                    failures.append(str(e))
+
+        if failures:
+            self.error_occurred.emit(
+                f"{len(failures)} of {total} batches could not be reviewed ({failures[0]}). "
+                "Run the audit again to retry them; finished batches are kept.")
+            return
+
+        self.audit.prune(keys)
+        try:
+            self.report_ready.emit(self.reduce([self.audit.findings[key] for key in keys]))
+        except Exception as e:
+            self.error_occurred.emit(f"Merging the findings failed: {str(e)}")
+
+    def reduce(self, findings):
+        """Merge findings in token-bounded groups, round by round, until one report remains"""
+        while True:
+            groups = []
+            current = []
+            used = 0
+            for text in findings:
+                tokens = self.count_tokens(text)
+                if current and used + tokens > self.reduce_tokens:
+                    groups.append(current)
+                    current = []
+                    used = 0
+                current.append(text)
+                used += tokens
+            groups.append(current)
+
+            # Findings too large to pair up can't shrink further, so go straight to the report
+            if len(groups) == 1 or len(groups) == len(findings):
+                return self.complete(self.REDUCE_PROMPT, "\n\n".join(findings), 4000)
+            if self.cancelled:
+                raise RuntimeError("audit cancelled")
+            with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+                findings = list(pool.map(
+                    lambda group: self.complete(self.MERGE_PROMPT, "\n\n".join(group), 2000), groups))
+
+class ConversationStore:
+    """Append-only SQLite log of conversation turns and their summaries.
+
+    Each exchange is written once, when its response arrives, so saving costs
+    the same however long the history gets. Startup only reads the turn list
+    (ids, timestamps and a prompt preview); message bodies are read when a
+    turn or conversation is opened. A replacement summary is appended and the
+    newest row per conversation wins. Prompts and responses are indexed with
+    FTS5 when the SQLite build has it; otherwise search falls back to LIKE.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS turns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id TEXT NOT NULL,
+        created REAL NOT NULL,
+        prompt TEXT NOT NULL,
+        response TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS turns_by_conversation ON turns (conversation_id, id);
+    CREATE TABLE IF NOT EXISTS summaries (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        conversation_id TEXT NOT NULL,
+        created REAL NOT NULL,
+        covers INTEGER NOT NULL,
+        content TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS summaries_by_conversation ON summaries (conversation_id, id);
+    """
+
+    FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE turns_fts USING fts5(prompt, response, content='turns', content_rowid='id');
+    CREATE TRIGGER turns_fts_insert AFTER INSERT ON turns BEGIN
+        INSERT INTO turns_fts (rowid, prompt, response) VALUES (new.id, new.prompt, new.response);
+    END;
+    CREATE TRIGGER turns_fts_delete AFTER DELETE ON turns BEGIN
+        INSERT INTO turns_fts (turns_fts, rowid, prompt, response) VALUES ('delete', old.id, old.prompt, old.response);
+    END;
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(self.SCHEMA)
+        self.fts = self.create_search_index()
+
+    def create_search_index(self):
+        if self.db.execute("SELECT 1 FROM sqlite_master WHERE name = 'turns_fts'").fetchone():
+            return True
+        try:
+            with self.db:
+                self.db.executescript(self.FTS_SCHEMA)
+                # Index turns written before the search index existed
+                self.db.execute("INSERT INTO turns_fts (turns_fts) VALUES ('rebuild')")
+            return True
+        except sqlite3.OperationalError:
+            return False  # SQLite built without FTS5
+
+    def is_empty(self):
+        return self.db.execute("SELECT 1 FROM turns LIMIT 1").fetchone() is None
+
+    def append_turn(self, conversation_id, prompt, response, created=None):
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT INTO turns (conversation_id, created, prompt, response) VALUES (?, ?, ?, ?)",
+                (conversation_id, created or datetime.now().timestamp(), prompt, response))
+        return cursor.lastrowid
+
+    def import_turns(self, rows):
+        """Bulk insert (conversation_id, created, prompt, response) rows in one transaction"""
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO turns (conversation_id, created, prompt, response) VALUES (?, ?, ?, ?)", rows)
+
+    def append_summary(self, conversation_id, content, covers):
+        with self.db:
+            self.db.execute(
+                "INSERT INTO summaries (conversation_id, created, covers, content) VALUES (?, ?, ?, ?)",
+                (conversation_id, datetime.now().timestamp(), covers, content))
+
+    def list_turns(self, limit=200, before_id=None, preview_chars=60):
+        """(id, conversation_id, created, prompt preview) of up to limit turns older than before_id, newest first"""
+        if before_id is None:
+            before_id = sys.maxsize
+        return self.db.execute(
+            "SELECT id, conversation_id, created, substr(prompt, 1, ?) FROM turns "
+            "WHERE id < ? ORDER BY id DESC LIMIT ?",
+            (preview_chars, before_id, limit)).fetchall()
+
+    def search(self, query, limit=200, offset=0, preview_chars=60):
+        """Turns whose prompt or response contains every word of query, best matches first"""
+        words = re.findall(r"\w+", query)
+        if not words:
+            return []
+        if self.fts:
+            # Quote each word so FTS syntax in the query is taken literally; prefix match the last one
+            match = " ".join(f'"{word}"' for word in words) + "*"
+            return self.db.execute(
+                "SELECT turns.id, turns.conversation_id, turns.created, substr(turns.prompt, 1, ?) "
+                "FROM turns_fts JOIN turns ON turns.id = turns_fts.rowid "
+                "WHERE turns_fts MATCH ? ORDER BY bm25(turns_fts) LIMIT ? OFFSET ?",
+                (preview_chars, match, limit, offset)).fetchall()
+        conditions = " AND ".join(["(prompt LIKE ? OR response LIKE ?)"] * len(words))
+        params = [pattern for word in words for pattern in (f"%{word}%",) * 2]
+        return self.db.execute(
+            f"SELECT id, conversation_id, created, substr(prompt, 1, ?) FROM turns "
+            f"WHERE {conditions} ORDER BY id DESC LIMIT ? OFFSET ?",
+            [preview_chars] + params + [limit, offset]).fetchall()
+
+    def get_turn(self, turn_id):
+        row = self.db.execute(
+            "SELECT id, conversation_id, created, prompt, response FROM turns WHERE id = ?",
+            (turn_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("id", "conversation_id", "timestamp", "prompt", "response"), row))
+
+    def conversation_messages(self, conversation_id):
+        """Chat messages of a conversation: its latest summary followed by every turn"""
+        messages = []
+        summary = self.db.execute(
+            "SELECT covers, content FROM summaries WHERE conversation_id = ? ORDER BY id DESC LIMIT 1",
+            (conversation_id,)).fetchone()
+        if summary:
+            messages.append({"role": "system", "kind": "summary", "covers": summary[0], "content": summary[1]})
+        for prompt, response in self.db.execute(
+                "SELECT prompt, response FROM turns WHERE conversation_id = ? ORDER BY id", (conversation_id,)):
+            messages.append({"role": "user", "content": prompt})
+            messages.append({"role": "assistant", "content": response})
+        return messages
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM turns")
+            self.db.execute("DELETE FROM summaries")
+
+class ConversationListModel(QAbstractListModel):
+    """History list rows read from the conversation store a page at a time.
+
+    Rows are newest first. The view pulls further pages through canFetchMore()
+    and fetchMore() as it is scrolled, so only what is visible gets loaded.
+    With a search query set, pages come from the store's full-text search.
+    """
+
+    PAGE_SIZE = 100
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.rows = []  # (turn id, label)
+        self.query = ""
+        self.exhausted = False
+
+    @staticmethod
+    def label(created, prompt):
+        timestamp = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M")
+        return f"[{timestamp}] {prompt[:30]}..."
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        turn_id, label = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return label
+        if role == Qt.ItemDataRole.UserRole:
+            return turn_id
+        return None
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent):
+        if parent.isValid() or self.exhausted:
+            return
+        if self.query:
+            page = self.store.search(self.query, limit=self.PAGE_SIZE, offset=len(self.rows))
+        else:
+            before_id = self.rows[-1][0] if self.rows else None
+            page = self.store.list_turns(limit=self.PAGE_SIZE, before_id=before_id)
+        self.exhausted = len(page) < self.PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend((turn_id, self.label(created, preview)) for turn_id, _, created, preview in page)
+            self.endInsertRows()
+
+    def reload(self, query=""):
+        """Drop loaded rows and start again from the first page of history or of query's results"""
+        self.beginResetModel()
+        self.rows = []
+        self.query = query
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def add_turn(self, turn_id, created, prompt):
+        """Show a newly recorded turn at the top, unless a search is active"""
+        if self.query:
+            return
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self.rows.insert(0, (turn_id, self.label(created, prompt)))
+        self.endInsertRows()
+
 class WordPressAssistant(QMainWindow):
     def __init__(self):
         super().__init__()
         self.api_key = None
-        self.conversation_history = []
+        self.conversation_store = ConversationStore(CONVERSATIONS_DB_PATH)
         self.current_conversation_id = None
-        self.conversation_context = {}
-        self.loaded_documents = {}
+        self.conversation_context = {}  # messages of conversations opened this session
+        self.loaded_documents = {}  # full path -> content
+        self.loaded_document_bytes = {}  # full path -> bytes counted against the limit
+        self.max_loaded_bytes = 32 * 1024 * 1024
+        self.document_loader = None
+        self.skipped_documents = []
         self.project_structure = {}
         self.current_project_path = None
         self.current_file_path = None
-        self.token_limit = 12000  # Increased token limit for more context
+        self.project_index = None
+        self.context_cache = ProjectContextCache()
+        self.retrieval_index = BM25Index()
+        self.retrieval_project = None
+        self.retrieval_builder = None
+        self.retrieval_dirty = False  # files re-indexed since the index was last saved
+        self.retrieval_reconcile_pending = False
+        self.context_token_budget = 6000  # tokens of file content per request
+        self.file_watcher = QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self.on_watched_file_changed)
+        self.file_watcher.directoryChanged.connect(self.on_watched_directory_changed)
+        self.changed_directories = set()
+        self.directory_timer = QTimer(self)
+        self.directory_timer.setSingleShot(True)
+        self.directory_timer.setInterval(300)
+        self.directory_timer.timeout.connect(self.rescan_changed_directories)
+        self.provider = PROVIDERS["deepseek"]
+        self.token_limit = min(12000, self.provider.max_context)  # Increased token limit for more context
         self.current_tokens = 0
-        self.encoder = tiktoken.get_encoding("cl100k_base")
+        self.token_counter = TokenCounter(self.provider.tokenizer)
+        self.context_packers = {}
+        self.response_reserve = 1000  # tokens kept free for the reply
+        self.summary_max_tokens = 400  # fixed size of the running summary of evicted turns
+        self.response_cache = ResponseCache()
+        self.summary_workers = {}
+        self.markdown_cache = MarkdownCache()
+        self.markdown_workers = {}  # cache key -> running MarkdownWorker
+        self.response_render_key = None
+        self.response_render_wrap = None
+        self.request_scheduler = RequestScheduler(self.start_request, parent=self)
+        self.audit_worker = None
+        self.audit_conversation_id = None
+        self.audit_truncated = []  # files the running audit reviews only in part
+        self.audit_parallelism = 4  # batches reviewed at once during a full audit
+        self.request_scheduler.queue_changed.connect(self.update_request_status)
+        self.stream_request = None  # request whose streamed response is on screen
+        self.stream_render_timer = QTimer(self)
+        self.stream_render_timer.setSingleShot(True)
+        self.stream_render_timer.setInterval(100)
+        self.stream_render_timer.timeout.connect(self.render_stream)
         
         self.initUI()
         self.load_settings()
@@ -190,7 +1700,7 @@ class WordPressAssistant(QMainWindow):
         QPushButton:hover { background-color: #00a0d2; }
         QPushButton:pressed { background-color: #005a87; }
         QComboBox { background-color: #32373c; color: #f1f1f1; border: 1px solid #0073aa; border-radius: 3px; padding: 5px; }
-        QListWidget { background-color: #32373c; color: #f1f1f1; border: 1px solid #0073aa; border-radius: 3px; }
+        QListWidget, QListView { background-color: #32373c; color: #f1f1f1; border: 1px solid #0073aa; border-radius: 3px; }
         QTabWidget::pane { border: 1px solid #0073aa; background-color: #23282d; }
         QTabBar::tab { background-color: #32373c; color: #f1f1f1; padding: 8px 16px; border: 1px solid #0073aa; }
         QTabBar::tab:selected { background-color: #0073aa; color: #ffffff; }
@@ -235,10 +1745,14 @@ class WordPressAssistant(QMainWindow):
         self.scan_project_btn.clicked.connect(self.scan_project_structure)
         self.evaluate_btn = QPushButton("Evaluate Project")
         self.evaluate_btn.clicked.connect(self.evaluate_project)
+        self.audit_btn = QPushButton("Full Audit")
+        self.audit_btn.setToolTip("Review every file of the project in batches and merge the findings")
+        self.audit_btn.clicked.connect(self.toggle_project_audit)
         
         project_buttons.addWidget(self.load_project_btn)
         project_buttons.addWidget(self.scan_project_btn)
         project_buttons.addWidget(self.evaluate_btn)
+        project_buttons.addWidget(self.audit_btn)
         left_layout.addLayout(project_buttons)
         
         # Context selector
@@ -254,8 +1768,21 @@ class WordPressAssistant(QMainWindow):
         chat_history_layout = QVBoxLayout(chat_history_widget)
         
         chat_history_layout.addWidget(QLabel("Conversation History:"))
-        self.conversation_list = QListWidget()
-        self.conversation_list.itemClicked.connect(self.show_conversation_item)
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search prompts and responses...")
+        self.history_search.setClearButtonEnabled(True)
+        # Search once typing pauses rather than on every keystroke
+        self.history_search_timer = QTimer(self)
+        self.history_search_timer.setSingleShot(True)
+        self.history_search_timer.setInterval(250)
+        self.history_search_timer.timeout.connect(self.search_conversation_history)
+        self.history_search.textChanged.connect(self.history_search_timer.start)
+        chat_history_layout.addWidget(self.history_search)
+        self.conversation_model = ConversationListModel(self.conversation_store, self)
+        self.conversation_list = QListView()
+        self.conversation_list.setUniformItemSizes(True)
+        self.conversation_list.setModel(self.conversation_model)
+        self.conversation_list.clicked.connect(self.show_conversation_item)
         chat_history_layout.addWidget(self.conversation_list)
         
         history_buttons = QHBoxLayout()
@@ -339,9 +1866,14 @@ class WordPressAssistant(QMainWindow):
         self.token_label = QLabel("Tokens: 0/12000")
         self.context_checkbox = QCheckBox("Maintain Context")
         self.context_checkbox.setChecked(True)
+        self.summary_checkbox = QCheckBox("Summarise Old Turns")
+        self.summary_checkbox.setChecked(True)
+        self.summary_checkbox.setToolTip("Fold turns that no longer fit the token budget into a running summary")
+        self.summary_checkbox.toggled.connect(self.save_settings)
         
         token_layout.addWidget(self.token_label)
         token_layout.addStretch()
+        token_layout.addWidget(self.summary_checkbox)
         token_layout.addWidget(self.context_checkbox)
         right_layout.addLayout(token_layout)
         
@@ -356,10 +1888,19 @@ class WordPressAssistant(QMainWindow):
         controls_layout = QHBoxLayout()
         self.ask_btn = QPushButton("Ask Assistant")
         self.ask_btn.clicked.connect(self.ask_assistant)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.setToolTip("Abort this conversation's running request and drop its queued prompts")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_requests)
+        self.skip_cache_cb = QCheckBox("Skip Cache")
+        self.skip_cache_cb.setToolTip("Ask the API even if an identical request has a cached answer")
+        self.skip_cache_cb.setVisible(False)
         self.clear_btn = QPushButton("Clear")
         self.clear_btn.clicked.connect(self.clear_chat)
         
         controls_layout.addWidget(self.ask_btn)
+        controls_layout.addWidget(self.cancel_btn)
+        controls_layout.addWidget(self.skip_cache_cb)
         controls_layout.addWidget(self.clear_btn)
         controls_layout.addStretch()
         right_layout.addLayout(controls_layout)
@@ -391,6 +1932,10 @@ class WordPressAssistant(QMainWindow):
         # Status bar
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.progress_bar.hide()
+        self.status_bar.addPermanentWidget(self.progress_bar)
         self.status_bar.showMessage("Ready for WordPress development")
         
         # Menu
@@ -398,6 +1943,15 @@ class WordPressAssistant(QMainWindow):
         settings_menu = menubar.addMenu("Settings")
         api_action = settings_menu.addAction("Set API Key")
         api_action.triggered.connect(self.set_api_key)
+        # Identical prompt and context (e.g. preset checks) can be answered from the shared cache
+        self.cache_action = settings_menu.addAction("Cache Responses")
+        self.cache_action.setCheckable(True)
+        self.cache_action.toggled.connect(self.skip_cache_cb.setVisible)
+        self.cache_action.toggled.connect(self.save_settings)
+        clear_cache_action = settings_menu.addAction("Clear Response Cache")
+        clear_cache_action.triggered.connect(self.clear_response_cache)
+        audit_action = settings_menu.addAction("Set Audit Parallelism")
+        audit_action.triggered.connect(self.set_audit_parallelism)
         
         # Start new conversation
         self.start_new_conversation()
@@ -420,21 +1974,28 @@ class WordPressAssistant(QMainWindow):
         # Scan the project structure
         self.scan_project_structure()
 
-        # Add project context to the current conversation
-        project_context = self.build_project_context_prompt()
+        # Pin project context to the current conversation so it is never trimmed
+        project_context, context_tokens = self.get_project_context()
         if project_context:
-            if self.current_conversation_id not in self.conversation_context:
-                self.conversation_context[self.current_conversation_id] = []
+            messages = self.conversation_messages(self.current_conversation_id)
+            packer = self.get_packer(self.current_conversation_id)
+
+            # Replace the context of a previously loaded project
+            for stale in packer.unpin_kind("project"):
+                messages.remove(stale)
+                self.current_tokens -= self.token_counter.message_tokens(stale)
 
-            # Add project context as system message
-            self.conversation_context[self.current_conversation_id].append({
+            context_message = {
                 "role": "system",
-                "content": project_context
-            })
+                "kind": "project",
+                "content": project_context,
+                "tokens": context_tokens + TokenCounter.MESSAGE_OVERHEAD
+            }
+            messages.append(context_message)
+            packer.pin(context_message)
 
             # Update token count
-            context_tokens = self.estimate_tokens(project_context)
-            self.current_tokens += context_tokens
+            self.current_tokens += context_message["tokens"]
             self.update_token_count()
         
     def scan_project_structure(self):
@@ -470,6 +2031,9 @@ class WordPressAssistant(QMainWindow):
             # Expand the root item
             self.project_tree.expandItem(root_item)
 
+            # Rebuild the file index used for context assembly
+            self.index_project_files()
+
             self.status_bar.showMessage(f"Project scanned successfully: {len(self.get_all_files())} files found")
 
         except Exception as e:
@@ -517,27 +2081,189 @@ class WordPressAssistant(QMainWindow):
             
     def get_all_files(self):
         """Get all files in the project for context building"""
-        all_files = []
-        if not self.current_project_path: 
-            return all_files
-            
-        for root, dirs, files in os.walk(self.current_project_path):
+        if not self.current_project_path:
+            return []
+        if self.project_index is None:
+            self.index_project_files()
+        return self.project_index["all_files"]
+
+    @staticmethod
+    def scan_project(project_path):
+        """Walk a project once: file lists by category, directories and WordPress layout details"""
+        index = {
+            "php": [], "js": [], "css": [], "other": [],
+            "all_files": [], "directories": [],
+            "has_wp_core": False, "themes": None, "plugins": None
+        }
+        if not project_path:
+            return index
+        WordPressAssistant.scan_tree(index, project_path, project_path)
+        WordPressAssistant.scan_layout(index, project_path)
+        return index
+
+    @staticmethod
+    def scan_tree(index, project_path, top):
+        """Add the directories and files under top to a scan_project() index"""
+        for root, dirs, files in os.walk(top):
+            index["directories"].append(root)
             for file in files:
+                file_path = os.path.join(root, file)
+                rel_path = os.path.relpath(file_path, project_path)
+
                 if file.lower().endswith(('.php', '.js', '.css', '.html', '.txt', '.md', '.json', '.xml')):
-                    all_files.append(os.path.join(root, file))
+                    index["all_files"].append(file_path)
+
+                if file.endswith('.php'):
+                    index["php"].append(rel_path)
+                elif file.endswith(('.js', '.ts')):
+                    index["js"].append(rel_path)
+                elif file.endswith('.css'):
+                    index["css"].append(rel_path)
+                elif file.endswith(('.json', '.xml', '.md', '.txt')):
+                    index["other"].append(rel_path)
+
+    @staticmethod
+    def scan_layout(index, project_path):
+        """Fill in the WordPress layout details of a scan_project() index"""
+        # Check if it's a standard WordPress installation
+        wp_core_files = ['wp-admin', 'wp-includes', 'wp-content']
+        index["has_wp_core"] = all(os.path.exists(os.path.join(project_path, f)) for f in wp_core_files)
+        if index["has_wp_core"]:
+            themes_path = os.path.join(project_path, 'wp-content', 'themes')
+            if os.path.exists(themes_path):
+                index["themes"] = [d for d in os.listdir(themes_path)
+                                   if os.path.isdir(os.path.join(themes_path, d)) and not d.startswith('.')]
+            plugins_path = os.path.join(project_path, 'wp-content', 'plugins')
+            if os.path.exists(plugins_path):
+                index["plugins"] = [d for d in os.listdir(plugins_path)
+                                    if os.path.isdir(os.path.join(plugins_path, d)) and not d.startswith('.')]
+
+    def index_project_files(self):
+        """Walk the project once and cache file lists and WordPress layout details"""
+        self.context_cache.invalidate()
+        self.directory_timer.stop()
+        self.changed_directories.clear()
+        if self.file_watcher.directories():
+            self.file_watcher.removePaths(self.file_watcher.directories())
+        if self.file_watcher.files():
+            self.file_watcher.removePaths(self.file_watcher.files())
+
+        index = self.project_index = self.scan_project(self.current_project_path)
+
+        # A new project's chunk index (saved in an earlier session, or built now) is prepared in the background
+        if self.current_project_path and self.retrieval_project != self.current_project_path:
+            self.retrieval_project = self.current_project_path
+            self.retrieval_index = BM25Index()
+            self.retrieval_builder = RetrievalIndexBuilder(
+                self.current_project_path, self.retrieval_index_path(), self.retrieval_files(), parent=self)
+            # Parented, so a builder for a project closed meanwhile can finish before it is deleted
+            self.retrieval_builder.finished.connect(self.retrieval_builder.deleteLater)
+            self.retrieval_builder.index_ready.connect(self.on_retrieval_index_ready)
+            self.retrieval_builder.start()
+            self.status_bar.showMessage("Indexing project files for context retrieval...")
+        elif self.current_project_path:
+            self.reconcile_retrieval_index()
+
+        # Directory watches tell us when files are added, removed or renamed
+        if index["directories"]:
+            self.file_watcher.addPaths(index["directories"])
+        return index
+
+    def on_watched_file_changed(self, path):
+        """Drop cached context for a file that changed on disk"""
+        # Metadata-only events (e.g. permission changes) leave the rendering valid
+        if self.context_cache.signature(path) != ProjectContextCache.file_signature(path):
+            self.context_cache.invalidate(path)
+        if path in self.retrieval_index.files:
+            self.retrieval_index.refresh_path(path)
+            self.retrieval_dirty = True  # saved by the next reconciliation, off the GUI thread
+            self.context_cache.prompts.clear()
+        # Editors often replace files on save, which removes the watch
+        if os.path.exists(path) and path not in self.file_watcher.files():
+            self.file_watcher.addPath(path)
+
+    def on_watched_directory_changed(self, path):
+        """Note a directory whose entries changed; bursts of events (atomic saves, git) are rescanned once"""
+        if self.current_project_path:
+            self.changed_directories.add(path)
+            self.directory_timer.start()
+
+    def indexed_paths(self, index):
+        """Absolute paths of the files in a scan_project() index"""
+        paths = set(index["all_files"])
+        for category in ("php", "js", "css", "other"):
+            paths.update(os.path.join(self.current_project_path, rel_path) for rel_path in index[category])
+        return paths
+
+    def rescan_changed_directories(self):
+        """Walk only the directories that changed, and drop the cached context of files added or removed there"""
+        changed, self.changed_directories = self.changed_directories, set()
+        if not self.current_project_path or self.project_index is None:
+            return
+        project_path = self.current_project_path
+        # Directories inside another changed directory are covered by its walk
+        tops = []
+        for path in sorted(changed):
+            if not any(path.startswith(top + os.sep) for top in tops):
+                tops.append(path)
+        under = lambda path: any(path == top or path.startswith(top + os.sep) for top in tops)
 
-        return all_files
+        index = self.project_index
+        old_paths = {path for path in self.indexed_paths(index) if under(path)}
+        old_directories = {path for path in index["directories"] if under(path)}
+        index["all_files"] = [path for path in index["all_files"] if not under(path)]
+        index["directories"] = [path for path in index["directories"] if not under(path)]
+        for category in ("php", "js", "css", "other"):
+            index[category] = [rel_path for rel_path in index[category]
+                               if not under(os.path.join(project_path, rel_path))]
+        rescanned = {key: [] for key in ("php", "js", "css", "other", "all_files", "directories")}
+        for top in tops:
+            if os.path.isdir(top):
+                self.scan_tree(rescanned, project_path, top)
+        for key, values in rescanned.items():
+            index[key].extend(values)
+        self.scan_layout(index, project_path)
+
+        new_paths = self.indexed_paths(rescanned)
+        removed = old_paths - new_paths
+        for path in removed:
+            self.context_cache.invalidate(path)
+            if path in self.retrieval_index.files:
+                self.retrieval_index.remove_file(path)
+                self.retrieval_dirty = True
+        if removed or new_paths - old_paths:
+            self.context_cache.prompts.clear()  # category listings include or omit these files
+
+        new_directories = set(rescanned["directories"])
+        watched = set(self.file_watcher.directories()) | set(self.file_watcher.files())
+        stale = [path for path in (old_directories - new_directories) | removed if path in watched]
+        if stale:
+            self.file_watcher.removePaths(stale)
+        new_watches = [path for path in new_directories if path not in watched]
+        if new_watches:
+            self.file_watcher.addPaths(new_watches)
+
+        # Files under the changed directories are re-chunked in the background if new or replaced
+        files = [entry for entry in self.retrieval_files() if under(entry[0])]
+        if files or self.retrieval_dirty:
+            self.reconcile_retrieval_index(files)
 
     def get_file_content(self, file_path, max_lines=100):
         """Get file content with line limit to avoid token overflow"""
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                
-            # If file is too large, only take the first max_lines
-            lines = content.split('\n')
-            if len(lines) > max_lines:
-                content = '\n'.join(lines[:max_lines]) + f"\n\n... [File truncated. Showing first {max_lines} lines only]"
+            if FileReader.is_binary(file_path):
+                size_kb = os.path.getsize(file_path) / 1024
+                return f"[Binary file omitted ({size_kb:.1f} KB)]"
+
+            content, truncated = FileReader.read_head(file_path, max_lines)
+            if truncated:
+                total_lines = self.context_cache.line_count(file_path)
+                if total_lines is not None:
+                    shown_lines = content.count('\n') + 1
+                    content += f"\n\n... [File truncated. Showing first {shown_lines} of {total_lines} lines only]"
+                else:
+                    size_mb = os.path.getsize(file_path) / (1024 * 1024)
+                    content += f"\n\n... [File truncated. Showing the beginning of a {size_mb:.1f} MB file only]"
                 
             return content
         except Exception as e:
@@ -578,11 +2304,171 @@ class WordPressAssistant(QMainWindow):
         5. Best practices for REST API in WordPress
         """)
         
-    def build_project_context_prompt(self):
+    def build_project_context_prompt(self, query=None):
         """Build a comprehensive context prompt based on the loaded WordPress project"""
+        return self.get_project_context(query)[0]
+
+    def selected_categories(self):
+        """Index categories whose file contents are requested in the context selector"""
+        categories = set()
+        if self.context_selector.php_files_cb.isChecked():
+            categories.add("php")
+        if self.context_selector.js_files_cb.isChecked():
+            categories.add("js")
+        if self.context_selector.css_files_cb.isChecked():
+            categories.add("css")
+        if self.context_selector.config_files_cb.isChecked():
+            categories.add("other")
+        return categories
+
+    def retrieval_index_path(self):
+        project_key = hashlib.sha1(os.path.abspath(self.current_project_path).encode("utf-8")).hexdigest()
+        return os.path.join(APP_DATA_DIR, "index", f"{project_key}.json")
+
+    def retrieval_files(self):
+        files = []
+        for category in ("php", "js", "css", "other"):
+            for rel_path in self.project_index[category]:
+                files.append((os.path.join(self.current_project_path, rel_path), rel_path, category))
+        return files
+
+    def reconcile_retrieval_index(self, files=None):
+        """Re-index changed project files in the background: files, or the whole project when None"""
+        if self.retrieval_builder is not None:
+            # One builder at a time; the whole project is checked once this one is done
+            self.retrieval_reconcile_pending = True
+            return
+        self.retrieval_builder = RetrievalIndexBuilder(
+            self.current_project_path, self.retrieval_index_path(),
+            self.retrieval_files() if files is None else files,
+            base=self.retrieval_index.snapshot(), remove_missing=files is None,
+            save=self.retrieval_dirty, parent=self)
+        self.retrieval_dirty = False
+        self.retrieval_builder.finished.connect(self.retrieval_builder.deleteLater)
+        self.retrieval_builder.index_ready.connect(self.on_retrieval_index_ready)
+        self.retrieval_builder.start()
+
+    def on_retrieval_index_ready(self, project_path, index, changed):
+        builder = self.sender()
+        if builder is self.retrieval_builder:
+            self.retrieval_builder = None
+        if project_path != self.current_project_path:
+            return  # another project was opened meanwhile
+        if builder.base is None:
+            self.retrieval_index = index
+            self.context_cache.prompts.clear()
+            self.status_bar.showMessage(f"Retrieval index ready ({len(changed)} files re-indexed)")
+        elif changed:
+            for path in changed:
+                self.context_cache.invalidate(path)
+                self.apply_retrieval_change(path, index)
+            self.context_cache.prompts.clear()  # other files' chunks may now rank differently
+            self.status_bar.showMessage(f"Retrieval index updated ({len(changed)} files re-indexed)")
+        # Edits in place are then picked up one file at a time by on_watched_file_changed
+        watched = set(self.file_watcher.files())
+        new_watches = [path for path in self.retrieval_index.files if path not in watched]
+        if new_watches:
+            self.file_watcher.addPaths(new_watches)
+        if self.retrieval_reconcile_pending and self.retrieval_builder is None:
+            self.retrieval_reconcile_pending = False
+            self.reconcile_retrieval_index()
+
+    def apply_retrieval_change(self, path, synced):
+        """Copy a file's chunks from a synced snapshot, unless the file changed again meanwhile"""
+        entry = synced.files.get(path)
+        signature = ProjectContextCache.file_signature(path)
+        if entry is not None and entry[0] == signature:
+            self.retrieval_index.remove_file(path)
+            self.retrieval_index.add_chunks(path, entry[2], entry[3], entry[0],
+                                            [synced.chunks[chunk_id] for chunk_id in entry[1]])
+            if path in synced.truncated:
+                self.retrieval_index.truncated.add(path)
+        elif signature is None:
+            self.retrieval_index.remove_file(path)
+        elif entry is not None:
+            self.retrieval_index.refresh_file(path, entry[2], entry[3])
+        else:
+            self.retrieval_index.refresh_path(path)
+
+    def retrieval_index_ready(self):
+        """False while the first build of the chunk index is still running.
+
+        The index is kept current without touching the disk here: edited files
+        through on_watched_file_changed, added and removed files through
+        reconcile_retrieval_index().
+        """
+        if self.retrieval_builder is not None and self.retrieval_builder.base is None:
+            self.status_bar.showMessage("Still indexing project files; using the file listing for now")
+            return False
+        return True
+
+    def retrieve_file_sections(self, query, categories, included_paths):
+        """Render the chunks most relevant to query, grouped by file, within the token budget"""
+        # Chunks keep their own counts, so don't let them evict cached system prompts
+        chunks = self.retrieval_index.select(query, categories, self.context_token_budget,
+                                             lambda text: self.token_counter.count(text, remember=False))
+        return self.render_chunks(chunks, included_paths)
+
+    def render_chunks(self, chunks, included_paths):
+        languages = {"php": "php", "js": "javascript", "css": "css", "other": ""}
+        sections = []
+        for chunk in sorted(chunks, key=lambda c: (c["rel_path"], c["start"])):
+            if chunk["path"] not in included_paths:
+                included_paths.append(chunk["path"])
+            label = f"{chunk['kind']} `{chunk['name']}`, " if chunk["name"] else ""
+            sections.append(
+                f"\n**{chunk['rel_path']}** ({label}lines {chunk['start']}-{chunk['end']}):\n"
+                f"```{languages[chunk['category']]}\n{chunk['text']}\n```"
+            )
+        return sections
+
+    def hook_overview(self):
+        """Summary of every add_action/add_filter registration in the project"""
         if not self.current_project_path:
             return ""
-            
+        if self.project_index is None:
+            self.index_project_files()
+        if not self.retrieval_index_ready():
+            return ""
+        lines = self.retrieval_index.hook_overview()
+        if not lines:
+            return ""
+        return "### Registered Hooks (file:line -> callback):\n" + "\n".join(lines)
+
+    def get_project_context(self, query=None):
+        """Return the project context prompt and its token count, served from cache when unchanged"""
+        if not self.current_project_path:
+            return "", 0
+        if self.project_index is None:
+            self.index_project_files()
+
+        selection = self.context_selector.selection_key()
+        current_file = self.current_file_path if self.context_selector.current_file_cb.isChecked() else None
+        categories = self.selected_categories()
+        # Rank file chunks against the question when there is one to rank against
+        use_retrieval = bool(query and categories and set(BM25Index.tokenize(query)) - BM25Index.STOPWORDS)
+        if use_retrieval and not self.retrieval_index_ready():
+            use_retrieval = False
+        cache_key = (selection, current_file, query if use_retrieval else None)
+        cached = self.context_cache.get_prompt(cache_key)
+        if cached:
+            return cached[0], cached[1]
+
+        index = self.project_index
+        php_files = index["php"]
+        js_files = index["js"]
+        css_files = index["css"]
+        other_files = index["other"]
+        included_paths = []
+
+        def file_section(rel_path, language):
+            full_path = os.path.join(self.current_project_path, rel_path)
+            included_paths.append(full_path)
+            return self.context_cache.get_section(
+                full_path, language or "config",
+                lambda path: f"\n**{rel_path}**:\n```{language}\n{self.get_file_content(path)}\n```"
+            )
+
         prompt_lines = []
         prompt_lines.append("## WordPress Project Context\n")
         prompt_lines.append(f"Project: {os.path.basename(self.current_project_path)}")
@@ -590,56 +2476,30 @@ class WordPressAssistant(QMainWindow):
         
         # Add information about the project structure
         prompt_lines.append("### Project Structure:")
-        
-        # Count files by type
-        php_files = []
-        js_files = []
-        css_files = []
-        other_files = []
-        
-        for root, dirs, files in os.walk(self.current_project_path):
-            for file in files:
-                file_path = os.path.join(root, file)
-                rel_path = os.path.relpath(file_path, self.current_project_path)
-                
-                if file.endswith('.php'):
-                    php_files.append(rel_path)
-                elif file.endswith(('.js', '.ts')):
-                    js_files.append(rel_path)
-                elif file.endswith('.css'):
-                    css_files.append(rel_path)
-                elif file.endswith(('.json', '.xml', '.md', '.txt')):
-                    other_files.append(rel_path)
-        
         prompt_lines.append(f"- PHP Files: {len(php_files)}")
         prompt_lines.append(f"- JavaScript Files: {len(js_files)}")
         prompt_lines.append(f"- CSS Files: {len(css_files)}")
         prompt_lines.append(f"- Other Files (json, xml, md, txt): {len(other_files)}")
         prompt_lines.append("")
         
-        # Check if it's a standard WordPress installation
-        wp_core_files = ['wp-admin', 'wp-includes', 'wp-content']
-        has_wp_core = all(os.path.exists(os.path.join(self.current_project_path, f)) for f in wp_core_files)
-        
-        if has_wp_core:
+        if index["has_wp_core"]:
             prompt_lines.append("This appears to be a standard WordPress installation.")
             
-            # Check for themes
-            themes_path = os.path.join(self.current_project_path, 'wp-content', 'themes')
-            if os.path.exists(themes_path):
-                themes = [d for d in os.listdir(themes_path) 
-                         if os.path.isdir(os.path.join(themes_path, d)) and not d.startswith('.')]
+            themes = index["themes"]
+            if themes is not None:
                 prompt_lines.append(f"Themes: {', '.join(themes) if themes else 'None found'}")
             
-            # Check for plugins
-            plugins_path = os.path.join(self.current_project_path, 'wp-content', 'plugins')
-            if os.path.exists(plugins_path):
-                plugins = [d for d in os.listdir(plugins_path) 
-                          if os.path.isdir(os.path.join(plugins_path, d)) and not d.startswith('.')]
+            plugins = index["plugins"]
+            if plugins is not None:
                 prompt_lines.append(f"Plugins: {', '.join(plugins) if plugins else 'None found'}")
         
         # Add selected file contents based on context selection
-        if (self.context_selector.php_files_cb.isChecked() and php_files) or \
+        retrieved = self.retrieve_file_sections(query, categories, included_paths) if use_retrieval else []
+        if retrieved:
+            prompt_lines.append("")
+            prompt_lines.append("### Relevant File Excerpts:")
+            prompt_lines.extend(retrieved)
+        elif (self.context_selector.php_files_cb.isChecked() and php_files) or \
            (self.context_selector.js_files_cb.isChecked() and js_files) or \
            (self.context_selector.css_files_cb.isChecked() and css_files) or \
            (self.context_selector.config_files_cb.isChecked() and other_files):
@@ -650,47 +2510,52 @@ class WordPressAssistant(QMainWindow):
             # PHP files
             if self.context_selector.php_files_cb.isChecked() and php_files:
                 prompt_lines.append("\n#### PHP Files:")
-                for i, file_path in enumerate(php_files[:5]):  # Limit to 5 files
-                    full_path = os.path.join(self.current_project_path, file_path)
-                    content = self.get_file_content(full_path)
-                    prompt_lines.append(f"\n**{file_path}**:\n```php\n{content}\n```")
+                for file_path in php_files[:5]:  # Limit to 5 files
+                    prompt_lines.append(file_section(file_path, "php"))
             
             # JavaScript files
             if self.context_selector.js_files_cb.isChecked() and js_files:
                 prompt_lines.append("\n#### JavaScript Files:")
-                for i, file_path in enumerate(js_files[:3]):  # Limit to 3 files
-                    full_path = os.path.join(self.current_project_path, file_path)
-                    content = self.get_file_content(full_path)
-                    prompt_lines.append(f"\n**{file_path}**:\n```javascript\n{content}\n```")
+                for file_path in js_files[:3]:  # Limit to 3 files
+                    prompt_lines.append(file_section(file_path, "javascript"))
             
             # CSS files
             if self.context_selector.css_files_cb.isChecked() and css_files:
                 prompt_lines.append("\n#### CSS Files:")
-                for i, file_path in enumerate(css_files[:3]):  # Limit to 3 files
-                    full_path = os.path.join(self.current_project_path, file_path)
-                    content = self.get_file_content(full_path)
-                    prompt_lines.append(f"\n**{file_path}**:\n```css\n{content}\n```")
+                for file_path in css_files[:3]:  # Limit to 3 files
+                    prompt_lines.append(file_section(file_path, "css"))
             
             # Config files
             if self.context_selector.config_files_cb.isChecked() and other_files:
                 prompt_lines.append("\n#### Config Files:")
-                for i, file_path in enumerate(other_files[:2]):  # Limit to 2 files
-                    full_path = os.path.join(self.current_project_path, file_path)
-                    content = self.get_file_content(full_path)
-                    prompt_lines.append(f"\n**{file_path}**:\n```\n{content}\n```")
+                for file_path in other_files[:2]:  # Limit to 2 files
+                    prompt_lines.append(file_section(file_path, ""))
         
         # Add currently selected file if requested
-        if self.context_selector.current_file_cb.isChecked() and self.current_file_path:
+        if current_file:
             prompt_lines.append("")
             prompt_lines.append("### Currently Selected File:")
-            content = self.get_file_content(self.current_file_path)
-            filename = os.path.basename(self.current_file_path)
-            prompt_lines.append(f"\n**{filename}**:\n```\n{content}\n```")
+            filename = os.path.basename(current_file)
+            included_paths.append(current_file)
+            prompt_lines.append(self.context_cache.get_section(
+                current_file, "current",
+                lambda path: f"\n**{filename}**:\n```\n{self.get_file_content(path)}\n```"
+            ))
         
         prompt_lines.append("")
         prompt_lines.append("Please use this project context when answering questions.")
         
-        return "\n".join(prompt_lines)
+        prompt = "\n".join(prompt_lines)
+        tokens = self.estimate_tokens(prompt)
+
+        # Watch included files so edits invalidate their cached sections
+        watched = set(self.file_watcher.files())
+        new_watches = [path for path in included_paths if path not in watched and os.path.exists(path)]
+        if new_watches:
+            self.file_watcher.addPaths(new_watches)
+
+        self.context_cache.store_prompt(cache_key, prompt, tokens, included_paths)
+        return prompt, tokens
         
     def evaluate_project(self):
         """Perform a comprehensive evaluation of the entire project"""
@@ -742,11 +2607,96 @@ class WordPressAssistant(QMainWindow):
         self.prompt_input.setPlainText(evaluation_prompt)
         self.ask_assistant()
         
+    def toggle_project_audit(self):
+        if self.audit_worker is not None:
+            self.audit_worker.cancel()
+            self.audit_btn.setEnabled(False)
+            self.status_bar.showMessage("Stopping audit after the batches in flight...")
+            return
+        self.start_project_audit()
+
+    def start_project_audit(self):
+        """Review the whole project batch by batch (map), then merge the findings into a report (reduce)"""
+        if not self.current_project_path:
+            QMessageBox.warning(self, "No Project", "Please load a WordPress project first.")
+            return
+        if not self.api_key:
+            QMessageBox.warning(self, "API Key Required", "Please set your DeepSeek API key first.")
+            return
+        if self.project_index is None:
+            self.index_project_files()
+        if not self.retrieval_index_ready():
+            QMessageBox.information(self, "Full Audit", "The project is still being indexed. Please try again shortly.")
+            return
+
+        count_tokens = lambda text: self.token_counter.count(text, remember=False)
+        batches = []
+        for batch in ProjectAudit.make_batches(self.retrieval_index.chunks.values(),
+                                               self.context_token_budget, count_tokens):
+            text = "\n".join(self.render_chunks(batch, []))
+            batches.append((ProjectAudit.batch_key(batch), text))
+        if not batches:
+            QMessageBox.information(self, "Full Audit", "No source files were found to audit.")
+            return
+
+        project_key = hashlib.sha1(os.path.abspath(self.current_project_path).encode("utf-8")).hexdigest()
+        audit = ProjectAudit(os.path.join(APP_DATA_DIR, "audits", f"{project_key}.json"))
+        self.audit_conversation_id = self.current_conversation_id
+        index = self.retrieval_index
+        self.audit_truncated = sorted(index.files[path][2] for path in index.truncated if path in index.files)
+        self.audit_worker = AuditWorker(self.api_key, audit, batches, self.audit_parallelism,
+                                        self.context_token_budget, count_tokens, provider=self.provider)
+        self.audit_worker.progress.connect(self.on_audit_progress)
+        self.audit_worker.report_ready.connect(self.on_audit_report)
+        self.audit_worker.error_occurred.connect(self.on_audit_error)
+        self.audit_worker.finished.connect(self.on_audit_finished)
+        self.audit_btn.setText("Stop Audit")
+        self.progress_bar.setRange(0, len(batches))
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.audit_worker.start()
+
+    def on_audit_progress(self, done, total):
+        self.progress_bar.setValue(done)
+        if done < total:
+            self.status_bar.showMessage(f"Auditing project: {done} of {total} batches reviewed")
+        else:
+            self.status_bar.showMessage(f"Auditing project: merging findings from {total} batches...")
+
+    def on_audit_report(self, report):
+        prompt = f"Full audit of {os.path.basename(self.current_project_path)}"
+        if self.audit_truncated:
+            report += (
+                f"\n\n---\n**Reviewed in part:** only the first {BM25Index.MAX_FILE_LINES} lines "
+                f"({BM25Index.MAX_FILE_BYTES // 1024} KB at most) of these files were audited:\n"
+                + "\n".join(f"- `{rel_path}`" for rel_path in self.audit_truncated)
+            )
+        conversation_id = self.audit_conversation_id
+        turn_tokens = self.record_turn(conversation_id, prompt, report)
+        if conversation_id == self.current_conversation_id:
+            self.current_tokens += turn_tokens
+            self.update_token_count()
+            self.display_markdown(report, self.response_frame)
+        if self.audit_truncated:
+            self.status_bar.showMessage(f"Project audit complete ({len(self.audit_truncated)} files reviewed in part)")
+        else:
+            self.status_bar.showMessage("Project audit complete")
+
+    def on_audit_error(self, error_msg):
+        QMessageBox.warning(self, "Full Audit", error_msg)
+        self.status_bar.showMessage("Project audit incomplete")
+
+    def on_audit_finished(self):
+        if self.audit_worker.cancelled:
+            self.status_bar.showMessage("Audit stopped; reviewed batches are kept for the next run")
+        self.audit_worker = None
+        self.audit_btn.setText("Full Audit")
+        self.audit_btn.setEnabled(True)
+        self.progress_bar.hide()
+
     def estimate_tokens(self, text):
         """More accurate token estimation using tiktoken"""
-        if not text:
-            return 0
-        return len(self.encoder.encode(text))
+        return self.token_counter.count(text)
         
     def update_token_count(self):
         self.token_label.setText(f"Tokens: {self.current_tokens}/{self.token_limit}")
@@ -757,40 +2707,103 @@ class WordPressAssistant(QMainWindow):
         else:
             self.token_label.setStyleSheet("color: #f1f1f1;")
             
-    def manage_token_usage(self, prompt_content, system_messages=[]):
-        # Calculate tokens for the new prompt and system messages
-        prompt_tokens = self.estimate_tokens(prompt_content)
-        system_tokens = sum(self.estimate_tokens(msg.get("content", "")) for msg in system_messages)
-
-        # Estimate response tokens
-        estimated_response_tokens = 1000
-
-        # Total estimated tokens for this request + response
-        total_estimated_tokens = prompt_tokens + system_tokens + estimated_response_tokens
-
-        # If we're over limit, remove oldest context messages until we have space
-        available_tokens = self.token_limit - self.current_tokens
-
-        while (total_estimated_tokens > available_tokens and
-               self.conversation_context.get(self.current_conversation_id, [])):
-
-            # Remove the oldest message pair (user + assistant)
-            if len(self.conversation_context[self.current_conversation_id]) >= 2:
-                # Remove user message
-                if self.conversation_context[self.current_conversation_id]:
-                    removed = self.conversation_context[self.current_conversation_id].pop(0)
-                    removed_tokens = self.estimate_tokens(removed.get("content", ""))
-                    self.current_tokens -= removed_tokens
-                    available_tokens += removed_tokens
-
-                # Remove assistant message
-                if self.conversation_context[self.current_conversation_id]:
-                    removed = self.conversation_context[self.current_conversation_id].pop(0)
-                    removed_tokens = self.estimate_tokens(removed.get("content", ""))
-                    self.current_tokens -= removed_tokens
-                    available_tokens += removed_tokens
+    def conversation_messages(self, conversation_id):
+        """Messages of a conversation, read from the store the first time it is used"""
+        messages = self.conversation_context.get(conversation_id)
+        if messages is None:
+            messages = self.conversation_store.conversation_messages(conversation_id)
+            self.conversation_context[conversation_id] = messages
+        return messages
 
-        self.update_token_count()
+    def get_packer(self, conversation_id):
+        """Context packer for a conversation, rebuilt from its stored messages on first use"""
+        packer = self.context_packers.get(conversation_id)
+        if packer is None:
+            messages = self.conversation_messages(conversation_id)
+            packer = ContextPacker.from_messages(messages, self.token_counter)
+            self.context_packers[conversation_id] = packer
+        return packer
+
+    def build_request_messages(self, prompt, system_messages, conversation_id, include_history=True):
+        """Pack system context, pinned context, history and the prompt into the token budget"""
+        packer = self.get_packer(conversation_id)
+        # A freshly built project context supersedes the one pinned when the project was loaded
+        has_project_context = any(message.get("kind") == "project" for message in system_messages)
+        messages, tokens = packer.pack(
+            system_messages + [{"role": "user", "content": prompt}],
+            self.token_limit,
+            reserve=self.response_reserve,
+            include_history=include_history,
+            exclude_kinds={"project"} if has_project_context else ()
+        )
+
+        if conversation_id == self.current_conversation_id:
+            self.current_tokens = tokens
+            self.update_token_count()
+        if tokens + self.response_reserve > self.token_limit:
+            self.status_bar.showMessage(
+                f"Warning: request needs ~{tokens} tokens, over the {self.token_limit} budget. "
+                "Consider unticking some context options.")
+        if include_history:
+            self.summarize_evicted_turns(conversation_id, packer)
+        return messages
+
+    def summarize_evicted_turns(self, conversation_id, packer):
+        """Fold turns evicted by the last pack into the conversation's running summary.
+
+        Uses the API in the background when a key is set and falls back to the
+        local extractive summary when offline or when the request fails.
+        """
+        covered = packer.summarized_until()
+        worker = self.summary_workers.get(conversation_id)
+        if (not self.summary_checkbox.isChecked() or packer.first_included <= covered or
+                (worker is not None and worker.isRunning())):
+            return
+
+        covers = packer.first_included
+        turns = packer.turns[covered:covers]
+        previous = packer.summary["content"] if packer.summary else ""
+
+        def summarize_locally(*_):
+            summary = ExtractiveSummarizer.summarize(
+                turns, previous, self.summary_max_tokens, self.token_counter.count)
+            self.store_summary(conversation_id, summary, covers)
+
+        if not self.api_key:
+            summarize_locally()
+            return
+
+        transcript = "\n\n".join(
+            f"{message['role'].title()}: {ExtractiveSummarizer.CODE_RE.sub('[code omitted]', message['content'])[:1500]}"
+            for turn in turns for message in turn)
+        messages = [
+            {"role": "system", "content": (
+                f"Condense the conversation below into a running summary of at most "
+                f"{self.summary_max_tokens * 3 // 4} words, as a bulleted list. Merge it with the "
+                "existing summary. Keep requirements, decisions, file, function and hook names; omit code.")},
+            {"role": "user", "content": f"Existing summary:\n{previous or '(none)'}\n\nConversation:\n{transcript}"}
+        ]
+        worker = DeepSeekWorker(self.api_key, messages, "deepseek-chat", conversation_id,
+                                max_tokens=self.summary_max_tokens, provider=self.provider)
+        worker.response_received.connect(
+            lambda text, conv_id: self.store_summary(
+                conv_id, f"{ExtractiveSummarizer.HEADER}\n{text.strip()}", covers))
+        worker.error_occurred.connect(summarize_locally)
+        self.summary_workers[conversation_id] = worker
+        worker.start()
+
+    def store_summary(self, conversation_id, content, covers):
+        """Replace the conversation's summary message with one covering its first covers turns"""
+        packer = self.get_packer(conversation_id)
+        if covers <= packer.summarized_until():
+            return
+        summary = {"role": "system", "kind": "summary", "covers": covers, "content": content}
+        messages = self.conversation_messages(conversation_id)
+        messages[:] = [message for message in messages if message.get("kind") != "summary"]
+        messages.insert(0, summary)
+        packer.summary = summary
+        self.conversation_store.append_summary(conversation_id, content, covers)
+        self.status_bar.showMessage(f"Summarised {covers} earlier turn(s) to stay within the token budget")
         
     def create_wp_plugin(self):
         self.prompt_input.setPlainText("""
@@ -860,24 +2873,49 @@ class WordPressAssistant(QMainWindow):
         
         if not file_paths:
             return
-            
-        for file_path in file_paths:
-            try:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
-                    
-                filename = os.path.basename(file_path)
-                self.loaded_documents[filename] = content
-                
-                # Add to list widget
-                self.docsListWidget.addItem(filename)
-                self.status_bar.showMessage(f"Loaded: {filename}")
-                
-            except Exception as e:
-                QMessageBox.warning(self, "Error", f"Could not load {file_path}: {str(e)}")
+
+        # Files being reloaded give back what they currently hold
+        selected = set(file_paths)
+        used = sum(size for path, size in self.loaded_document_bytes.items() if path not in selected)
+
+        self.load_doc_btn.setEnabled(False)
+        self.progress_bar.setRange(0, len(file_paths))
+        self.progress_bar.setValue(0)
+        self.progress_bar.show()
+        self.skipped_documents = []
+
+        self.document_loader = DocumentLoader(file_paths, self.max_loaded_bytes - used)
+        self.document_loader.document_loaded.connect(self.on_document_loaded)
+        self.document_loader.document_skipped.connect(
+            lambda path, reason: self.skipped_documents.append(f"{path}: {reason}"))
+        self.document_loader.progress.connect(self.on_document_progress)
+        self.document_loader.finished.connect(self.on_documents_finished)
+        self.document_loader.start()
+
+    def on_document_loaded(self, path, content, size):
+        if path not in self.loaded_documents:
+            item = QListWidgetItem(os.path.basename(path))
+            item.setToolTip(path)
+            item.setData(Qt.ItemDataRole.UserRole, path)
+            self.docsListWidget.addItem(item)
+        self.loaded_documents[path] = content
+        self.loaded_document_bytes[path] = size
+
+    def on_document_progress(self, done, total):
+        self.progress_bar.setValue(done)
+        self.status_bar.showMessage(f"Loading files... {done}/{total}")
+
+    def on_documents_finished(self):
+        self.progress_bar.hide()
+        self.load_doc_btn.setEnabled(True)
+        used_mb = sum(self.loaded_document_bytes.values()) / (1024 * 1024)
+        self.status_bar.showMessage(f"{len(self.loaded_documents)} file(s) loaded ({used_mb:.1f} MB)")
+        if self.skipped_documents:
+            QMessageBox.warning(self, "Some Files Skipped", "\n".join(self.skipped_documents))
                 
     def clear_documents(self):
         self.loaded_documents.clear()
+        self.loaded_document_bytes.clear()
         self.docsListWidget.clear()
         self.code_editor.clear()
         self.status_bar.showMessage("Documents cleared")
@@ -887,41 +2925,62 @@ class WordPressAssistant(QMainWindow):
         self.conversation_context[self.current_conversation_id] = []
         self.current_tokens = 0
         self.update_token_count()
+        self.stream_render_timer.stop()
+        self.stream_request = None
+        self.response_render_key = None
         self.response_area.clear()
         self.prompt_input.clear()
+        self.update_request_status()
         self.status_bar.showMessage("New conversation started")
         
-    def show_conversation_item(self, item):
-        # Find the conversation by timestamp in the item text
-        timestamp_str = item.text().split(']')[0][1:]
-        try:
-            timestamp = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M")
-            for conv in self.conversation_history:
-                if datetime.fromtimestamp(conv["timestamp"]).strftime("%Y-%m-%d %H:%M") == timestamp_str:
-                    # Display the conversation
-                    html_content = f"""
-                    <div style="background-color: #32373c; color: #f1f1f1; padding: 12px; border-radius: 5px; margin-bottom: 10px;">
-                        <strong>You ({timestamp_str}):</strong><br>
-                        {html.escape(conv['prompt']).replace('\n', '<br>')}
-                    </div>
-                    <div style="background-color: #2c3338; color: #f1f1f1; padding: 12px; border-radius: 5px;">
-                        <strong>Assistant:</strong><br>
-                        {markdown.markdown(conv['response'])}
-                    </div>
-                    """
-                    self.response_area.setHtml(html_content)
-                    break
-        except ValueError:
-            self.status_bar.showMessage("Could not parse conversation timestamp")
-            
+    def show_conversation_item(self, index):
+        conv = self.conversation_store.get_turn(index.data(Qt.ItemDataRole.UserRole))
+        if conv is None:
+            self.status_bar.showMessage("Conversation not found in history")
+            return
+
+        timestamp_str = datetime.fromtimestamp(conv["timestamp"]).strftime("%Y-%m-%d %H:%M")
+        prompt_html = html.escape(conv['prompt']).replace('\n', '<br>')
+
+        def wrap(response_html):
+            return f"""
+            <div style="background-color: #32373c; color: #f1f1f1; padding: 12px; border-radius: 5px; margin-bottom: 10px;">
+                <strong>You ({timestamp_str}):</strong><br>
+                {prompt_html}
+            </div>
+            <div style="background-color: #2c3338; color: #f1f1f1; padding: 12px; border-radius: 5px;">
+                <strong>Assistant:</strong><br>
+                {response_html}
+            </div>
+            """
+        self.display_markdown(conv['response'], wrap)
+
+        # Follow-up questions continue the conversation this turn belongs to
+        self.stream_render_timer.stop()
+        self.stream_request = None
+        if conv["conversation_id"] != self.current_conversation_id:
+            self.current_conversation_id = conv["conversation_id"]
+            self.update_request_status()
+            self.status_bar.showMessage(f"Switched to conversation {self.current_conversation_id}")
+
+    def search_conversation_history(self):
+        """Show the turns matching the search box, or the full history when it is empty"""
+        query = self.history_search.text().strip()
+        self.conversation_model.reload(query)
+        if query:
+            count = self.conversation_model.rowCount()
+            more = "+" if self.conversation_model.canFetchMore(QModelIndex()) else ""
+            self.status_bar.showMessage(f"{count}{more} matching conversation(s)")
+
     def clear_conversation_history(self):
         reply = QMessageBox.question(self, "Clear History", 
                                     "Are you sure you want to clear all conversation history?",
                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            self.conversation_history = []
+            self.conversation_store.clear()
             self.conversation_context = {}
-            self.conversation_list.clear()
+            self.context_packers = {}
+            self.conversation_model.reload()
             self.start_new_conversation()
             self.status_bar.showMessage("Conversation history cleared")
             
@@ -990,9 +3049,9 @@ class WordPressAssistant(QMainWindow):
             self.context_selector.config_files_cb.isChecked() or
             self.context_selector.current_file_cb.isChecked()):
             
-            project_context = self.build_project_context_prompt()
+            project_context = self.build_project_context_prompt(prompt)
             if project_context:
-                system_messages.append({"role": "system", "content": project_context})
+                system_messages.append({"role": "system", "kind": "project", "content": project_context})
 
         # For evaluation mode, add specific instructions
         if self.context_selector.evaluation_mode_cb.isChecked():
@@ -1001,86 +3060,178 @@ class WordPressAssistant(QMainWindow):
             Focus on actionable recommendations with code examples. Structure your response with clear sections
             for code quality, WordPress standards, security, performance, and architecture.
             """
+            hooks = self.hook_overview()
+            if hooks:
+                evaluation_context += "\n" + hooks
             system_messages.append({"role": "system", "content": evaluation_context})
 
-        # Manage token usage (this will trim context if needed)
-        self.manage_token_usage(prompt, system_messages)
+        evaluation = self.context_selector.evaluation_mode_cb.isChecked()
+        request = ChatRequest(
+            self.current_conversation_id, prompt, system_messages,
+            include_history=self.context_checkbox.isChecked(),
+            priority=RequestScheduler.PRIORITY_BACKGROUND if evaluation else RequestScheduler.PRIORITY_INTERACTIVE,
+            use_cache=self.cache_action.isChecked() and not self.skip_cache_cb.isChecked()
+        )
+
+        # The prompt is queued now, so the input is free for the next one
+        self.prompt_input.clear()
 
-        self.status_bar.showMessage("Processing your question...")
-        self.ask_btn.setEnabled(False)
+        # Reset evaluation mode once it has been applied
+        if evaluation:
+            self.context_selector.evaluation_mode_cb.setChecked(False)
 
-        # Prepare messages for the API
-        messages = []
-        messages.extend(system_messages)
-
-        # Add conversation history if context is enabled
-        if self.context_checkbox.isChecked():
-            context_key = self.current_conversation_id
-            if context_key in self.conversation_context:
-                context_messages = self.conversation_context[context_key]
-                messages.extend(context_messages)
-
-        # Add current prompt
-        messages.append({"role": "user", "content": prompt})
-
-        self.worker = DeepSeekWorker(self.api_key, messages, "deepseek-coder", self.current_conversation_id)
-        self.worker.response_received.connect(self.handle_response)
-        self.worker.error_occurred.connect(self.handle_error)
-        self.worker.start()
-        
-    def handle_response(self, response, conversation_id):
-        self.ask_btn.setEnabled(True)
-        self.status_bar.showMessage("Response received")
-        
-        # Update conversation context
-        if conversation_id in self.conversation_context:
-            prompt = self.prompt_input.toPlainText()
-
-            # Add the user message and assistant response
-            self.conversation_context[conversation_id].append({"role": "user", "content": prompt})
-            self.conversation_context[conversation_id].append({"role": "assistant", "content": response})
-            
-            # Update token count with both prompt and response
-            prompt_tokens = self.estimate_tokens(prompt)
-            response_tokens = self.estimate_tokens(response)
-            self.current_tokens += prompt_tokens + response_tokens
+        self.request_scheduler.submit(request)
+
+    def start_request(self, request):
+        """Pack a scheduled request's messages and start its worker"""
+        # Packed when it starts rather than when queued, so earlier answers are in its history
+        messages = self.build_request_messages(
+            request.prompt, request.system_messages, request.conversation_id, request.include_history)
+
+        if request.conversation_id == self.current_conversation_id:
+            self.stream_render_timer.stop()
+            self.stream_request = request
+            self.response_render_key = None
+
+        worker = DeepSeekWorker(self.api_key, ContextPacker.api_messages(messages), "deepseek-coder",
+                                request.conversation_id, stream=True,
+                                cache=self.response_cache if request.use_cache else None, provider=self.provider)
+        worker.chunk_received.connect(lambda delta, _: self.handle_response_chunk(request, delta))
+        worker.response_received.connect(lambda response, _: self.handle_response(request, response))
+        worker.error_occurred.connect(lambda error: self.handle_error(request, error))
+        worker.start()
+        return worker
+
+    def cancel_requests(self):
+        count = self.request_scheduler.cancel(self.current_conversation_id)
+        if self.stream_request is not None and self.stream_request.cancelled:
+            self.stream_render_timer.stop()
+            self.render_stream()
+            self.stream_request = None
+        self.status_bar.showMessage(f"Cancelled {count} request(s)")
+
+    def update_request_status(self):
+        conversation_id = self.current_conversation_id
+        busy = self.request_scheduler.is_busy(conversation_id)
+        queued = self.request_scheduler.queued(conversation_id)
+        self.cancel_btn.setEnabled(busy or queued > 0)
+        if busy:
+            waiting = f" ({queued} queued)" if queued else ""
+            self.status_bar.showMessage(f"Processing your question...{waiting}")
+
+    def handle_response(self, request, response):
+        if request.cancelled:
+            self.request_scheduler.finish(request)
+            return
+
+        prompt = request.prompt
+        conversation_id = request.conversation_id
+
+        turn_tokens = self.record_turn(conversation_id, prompt, response)
+
+        if conversation_id == self.current_conversation_id:
+            # The prompt was already counted when the request was packed
+            self.current_tokens += turn_tokens - self.token_counter.message_tokens(
+                {"role": "user", "content": prompt})
             self.update_token_count()
+            self.status_bar.showMessage("Response received")
 
-        # Convert markdown to HTML with WordPress styling
-        html_response = markdown.markdown(response)
-        
-        formatted_html = f"""
+            # Replace the streamed preview with the full render, done off the GUI thread
+            if request is self.stream_request:
+                self.stream_render_timer.stop()
+                self.stream_request = None
+            self.display_markdown(response, self.response_frame, placeholder=not request.stream_text)
+        else:
+            self.status_bar.showMessage(f"Response received in conversation {conversation_id}")
+
+        # Starts the conversation's next queued prompt, now that this turn is in its history
+        self.request_scheduler.finish(request)
+
+    def record_turn(self, conversation_id, prompt, response):
+        """Add a prompt and its response to the conversation and its saved history; returns the turn's tokens"""
+        user_message = {"role": "user", "content": prompt}
+        assistant_message = {"role": "assistant", "content": response}
+        messages = self.conversation_messages(conversation_id)
+        messages.append(user_message)
+        messages.append(assistant_message)
+        turn_tokens = self.get_packer(conversation_id).add_turn(user_message, assistant_message)
+
+        created = datetime.now().timestamp()
+        turn_id = self.conversation_store.append_turn(conversation_id, prompt, response, created)
+        self.conversation_model.add_turn(turn_id, created, prompt)
+        return turn_tokens
+
+    def handle_response_chunk(self, request, delta):
+        request.stream_text += delta
+        if request is self.stream_request and not self.stream_render_timer.isActive():
+            self.stream_render_timer.start()
+
+    def render_stream(self):
+        """Show the streamed response so far, rendering blocks once they are complete"""
+        request = self.stream_request
+        if request is None:
+            return
+        blocks, consumed = MarkdownCache.split_blocks(request.stream_text[request.stream_offset:])
+        request.stream_blocks.extend(self.markdown_cache.render(block) for block in blocks)
+        request.stream_offset += consumed
+        tail = html.escape(request.stream_text[request.stream_offset:])
+        self.response_area.setHtml(self.response_frame(
+            "".join(request.stream_blocks) + f'<pre style="white-space: pre-wrap;">{tail}</pre>'))
+        self.response_area.moveCursor(QTextCursor.MoveOperation.End)
+
+    def response_frame(self, response_html):
+        """Response HTML with WordPress styling"""
+        return f"""
         <div style="background-color: #2c3338; color: #f1f1f1; padding: 15px; border-radius: 5px; border: 1px solid #0073aa;">
-            {html_response}
+            {response_html}
         </div>
         """
-        self.response_area.setHtml(formatted_html)
-        
-        # Save to conversation history
-        self.conversation_history.append({
-            "timestamp": datetime.now().timestamp(),
-            "conversation_id": conversation_id,
-            "prompt": self.prompt_input.toPlainText(),
-            "response": response
-        })
-        
-        # Update conversation list
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-        self.conversation_list.addItem(f"[{timestamp}] {self.prompt_input.toPlainText()[:30]}...")
-        
-        # Clear the prompt input
-        self.prompt_input.clear()
-        
-        # Reset evaluation mode after response
-        if self.context_selector.evaluation_mode_cb.isChecked():
-            self.context_selector.evaluation_mode_cb.setChecked(False)
-        
-    def handle_error(self, error_msg):
-        self.ask_btn.setEnabled(True)
-        self.status_bar.showMessage("Error occurred")
-        self.response_area.setPlainText(f"Error: {error_msg}")
+
+    def display_markdown(self, text, wrap, placeholder=True):
+        """Show wrap(markdown of text) in the response area; cache misses are rendered by a worker.
+
+        Until the worker finishes the text is shown unrendered, or the current
+        view is kept when placeholder is False.
+        """
+        key = MarkdownCache.key(text)
+        self.response_render_key = key
+        self.response_render_wrap = wrap
+        rendered = self.markdown_cache.get(key)
+        if rendered is not None:
+            self.response_area.setHtml(wrap(rendered))
+            return
+
+        if placeholder:
+            self.response_area.setHtml(wrap(f'<pre style="white-space: pre-wrap;">{html.escape(text)}</pre>'))
+        # Drop finished workers; one already rendering this text will deliver it
+        self.markdown_workers = {k: w for k, w in self.markdown_workers.items() if not w.isFinished()}
+        if key not in self.markdown_workers:
+            worker = MarkdownWorker(key, text)
+            worker.rendered.connect(self.on_markdown_rendered)
+            self.markdown_workers[key] = worker
+            worker.start()
+
+    def on_markdown_rendered(self, key, rendered):
+        self.markdown_cache.put(key, rendered)
+        # Ignore renders for responses that are no longer on screen
+        if key == self.response_render_key:
+            self.response_area.setHtml(self.response_render_wrap(rendered))
+
+    def handle_error(self, request, error_msg):
+        if not request.cancelled:
+            if request.conversation_id == self.current_conversation_id:
+                self.status_bar.showMessage("Error occurred")
+                if request is self.stream_request:
+                    self.stream_render_timer.stop()
+                    self.stream_request = None
+                self.response_render_key = None
+                self.response_area.setPlainText(f"Error: {error_msg}")
+            else:
+                self.status_bar.showMessage(f"Error in conversation {request.conversation_id}: {error_msg}")
+        self.request_scheduler.finish(request)
         
     def clear_chat(self):
+        self.response_render_key = None
         self.response_area.clear()
         self.prompt_input.clear()
         
@@ -1091,32 +3242,80 @@ class WordPressAssistant(QMainWindow):
             self.save_settings()
             self.status_bar.showMessage("API key set successfully")
             
+    def set_audit_parallelism(self):
+        value, ok = QInputDialog.getInt(self, "Audit Parallelism",
+                                        "Batches reviewed at the same time during a full audit:",
+                                        self.audit_parallelism, 1, 16)
+        if ok:
+            self.audit_parallelism = value
+            self.save_settings()
+            self.status_bar.showMessage(f"Full audits will review {value} batches at a time")
+
+    def clear_response_cache(self):
+        self.response_cache.clear()
+        self.status_bar.showMessage("Response cache cleared")
+
     def load_settings(self):
+        settings = {}
         try:
-            if os.path.exists("wp_assistant_settings.json"):
-                with open("wp_assistant_settings.json", "r") as f:
+            if os.path.exists(SETTINGS_PATH):
+                with open(SETTINGS_PATH, "r") as f:
                     settings = json.load(f)
-                    self.api_key = settings.get("api_key")
-                    self.conversation_history = settings.get("conversation_history", [])
-                    self.conversation_context = settings.get("conversation_context", {})
-                    
-                    # Update conversation list
-                    for conv in self.conversation_history:
-                        timestamp = datetime.fromtimestamp(conv["timestamp"]).strftime("%Y-%m-%d %H:%M")
-                        self.conversation_list.addItem(f"[{timestamp}] {conv['prompt'][:30]}...")
-        except:
-            self.api_key = None
-            self.conversation_history = []
-            self.conversation_context = {}
-            
+            elif os.path.exists(LEGACY_SETTINGS_PATH):
+                settings = self.migrate_legacy_settings()
+        except Exception as e:
+            self.status_bar.showMessage(f"Error loading settings: {e}")
+
+        self.api_key = settings.get("api_key")
+        self.audit_parallelism = settings.get("audit_parallelism", self.audit_parallelism)
+        # Both widgets save the settings when toggled; don't write back a half-loaded state
+        for widget, value in ((self.summary_checkbox, settings.get("summarize_history", True)),
+                              (self.cache_action, settings.get("cache_responses", False))):
+            widget.blockSignals(True)
+            widget.setChecked(value)
+            widget.blockSignals(False)
+        self.skip_cache_cb.setVisible(self.cache_action.isChecked())
+
+        # Only the first page of turn metadata is read here; the list loads more as it scrolls
+        self.conversation_model.reload()
+
+    def migrate_legacy_settings(self):
+        """Move history from wp_assistant_settings.json into the store and split off the settings"""
+        with open(LEGACY_SETTINGS_PATH, "r") as f:
+            legacy = json.load(f)
+
+        if self.conversation_store.is_empty():
+            self.conversation_store.import_turns([
+                (conv.get("conversation_id") or "legacy", conv["timestamp"], conv["prompt"], conv["response"])
+                for conv in legacy.get("conversation_history", [])
+            ])
+            for conversation_id, messages in legacy.get("conversation_context", {}).items():
+                for message in messages:
+                    if message.get("kind") == "summary":
+                        self.conversation_store.append_summary(
+                            conversation_id, message["content"], message.get("covers", 0))
+
+        settings = {
+            "api_key": legacy.get("api_key"),
+            "summarize_history": legacy.get("summarize_history", True)
+        }
+        self.write_settings(settings)
+        self.status_bar.showMessage(f"Imported conversation history from {LEGACY_SETTINGS_PATH}")
+        return settings
+
     def save_settings(self):
+        self.write_settings({
+            "api_key": self.api_key,
+            "summarize_history": self.summary_checkbox.isChecked(),
+            "cache_responses": self.cache_action.isChecked(),
+            "audit_parallelism": self.audit_parallelism
+        })
+
+    def write_settings(self, settings):
         try:
-            with open("wp_assistant_settings.json", "w") as f:
-                json.dump({
-                    "api_key": self.api_key,
-                    "conversation_history": self.conversation_history,
-                    "conversation_context": self.conversation_context
-                }, f)
+            os.makedirs(APP_DATA_DIR, exist_ok=True)
+            with open(SETTINGS_PATH, "w") as f:
+                json.dump(settings, f)
         except Exception as e:
             print(f"Error saving settings: {e}")
 